@@ -0,0 +1,197 @@
+"""
+Parquet snapshot of the cleaned transactions and a DuckDB engine that
+serves the sales_rollup reads in models.py from it (ANALYTICS_BACKEND =
+"duckdb" in config.py).
+
+The snapshot holds only what the sales aggregations read,
+(processed_epoch, amount_cents, reporting_cents; NULL when the row has no
+FX rate), partitioned by UTC day as
+utc_day=<days since 1970-01-01>/part-<uuid>.parquet. A query opens just the
+partitions its range touches and DuckDB reads just those columns.
+"""
+
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+
+import duckdb
+import pandas as pd
+
+from config import SALES_ROLLUP_BUCKET_SECONDS
+
+DAY_SECONDS = 86400
+
+# Rows read from SQLite and written per COPY while building the snapshot
+SNAPSHOT_BATCH_ROWS = 1_000_000
+
+# Written last by every snapshot update; holds the SQLite data version
+VERSION_FILE = "_version"
+
+SNAPSHOT_SELECT = """
+SELECT processed_epoch, CAST(ROUND(amount * 100) AS INTEGER),
+       CAST(ROUND(amount_reporting * 100) AS INTEGER)
+FROM transactions
+WHERE processed_epoch IS NOT NULL
+"""
+
+EMPTY_ROLLUP = """
+(SELECT CAST(NULL AS BIGINT) AS bucket_start, CAST(NULL AS BIGINT) AS sales_cents,
+        CAST(NULL AS BIGINT) AS transaction_count, CAST(NULL AS BIGINT) AS reporting_cents,
+        CAST(NULL AS BIGINT) AS unconverted_count
+ WHERE false) AS sales_rollup
+"""
+
+
+def write_parquet_snapshot(conn, snapshot_dir, days=None):
+    """
+    Mirror the transactions committed on `conn` into the snapshot. With
+    `days` (UTC day numbers), only those partitions are rewritten; otherwise,
+    or when there is no snapshot yet, the whole snapshot is rebuilt next to
+    the old one and swapped in.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if days is None or not os.path.isdir(snapshot_dir):
+        staging = f"{snapshot_dir}.tmp-{uuid.uuid4().hex}"
+        _write_partitions(conn.execute(f"{SNAPSHOT_SELECT} ORDER BY processed_epoch"), staging)
+        _write_version(staging, version)
+        _replace_dir(staging, snapshot_dir)
+        return
+
+    for day in sorted(set(days)):
+        staging = os.path.join(snapshot_dir, f".tmp-{uuid.uuid4().hex}")
+        cursor = conn.execute(
+            f"{SNAPSHOT_SELECT} AND processed_epoch >= ? AND processed_epoch < ?",
+            (day * DAY_SECONDS, (day + 1) * DAY_SECONDS),
+        )
+        _write_partitions(cursor, staging)
+        partition = f"utc_day={day}"
+        if os.path.isdir(os.path.join(staging, partition)):
+            _replace_dir(os.path.join(staging, partition), os.path.join(snapshot_dir, partition))
+        else:
+            shutil.rmtree(os.path.join(snapshot_dir, partition), ignore_errors=True)
+        shutil.rmtree(staging, ignore_errors=True)
+    _write_version(snapshot_dir, version)
+
+
+def _write_partitions(cursor, root):
+    os.makedirs(root, exist_ok=True)
+    writer = duckdb.connect()
+    while True:
+        rows = cursor.fetchmany(SNAPSHOT_BATCH_ROWS)
+        if not rows:
+            break
+        batch = pd.DataFrame(rows, columns=["processed_epoch", "amount_cents", "reporting_cents"])
+        batch = batch.astype({"processed_epoch": "int64", "amount_cents": "int64", "reporting_cents": "Int64"})
+        writer.register("batch", batch)
+        writer.execute(f"""
+        COPY (SELECT processed_epoch, amount_cents, reporting_cents, processed_epoch // {DAY_SECONDS} AS utc_day FROM batch)
+        TO '{_sql_string(root)}' (FORMAT PARQUET, PARTITION_BY (utc_day), APPEND, FILENAME_PATTERN 'part-{{uuid}}')
+        """)
+        writer.unregister("batch")
+    writer.close()
+
+
+def _write_version(root, version):
+    path = os.path.join(root, VERSION_FILE)
+    with open(f"{path}.tmp", "w") as f:
+        f.write(str(version))
+    os.replace(f"{path}.tmp", path)
+
+
+def _replace_dir(src, dst):
+    old = None
+    if os.path.exists(dst):
+        old = f"{dst}.old-{uuid.uuid4().hex}"
+        os.rename(dst, old)
+    os.rename(src, dst)
+    if old:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def _sql_string(value):
+    return str(value).replace("'", "''")
+
+
+class ParquetSalesEngine:
+    """
+    Answers sales_rollup reads from the Parquet snapshot. Each thread gets
+    its own cursor on one in-memory DuckDB database.
+    """
+
+    def __init__(self, snapshot_dir):
+        self.snapshot_dir = snapshot_dir
+        self._db = duckdb.connect()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._partitions = (None, {})  # (version file identity, {utc_day: [parquet paths]})
+
+    def version(self):
+        """Data version of the snapshot, or None when there is none."""
+        try:
+            with open(os.path.join(self.snapshot_dir, VERSION_FILE)) as f:
+                return int(f.read())
+        except (OSError, ValueError):
+            return None
+
+    @contextmanager
+    def connection(self):
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            cursor = self._local.cursor = self._db.cursor()
+        yield cursor
+
+    def rollup_relation(self, lo, hi):
+        """
+        SQL for a relation named sales_rollup, with the table's columns, that
+        holds at least the buckets starting in [lo, hi) (epoch seconds), and
+        its parameters. Only the partitions of the days involved are read.
+        """
+        # Rows of every bucket that starts in the range, whatever its alignment
+        lo -= SALES_ROLLUP_BUCKET_SECONDS
+        hi += SALES_ROLLUP_BUCKET_SECONDS
+        partitions = self._partition_files()
+        files = [
+            path
+            for day in range(lo // DAY_SECONDS, (hi - 1) // DAY_SECONDS + 1)
+            for path in partitions.get(day, ())
+        ]
+        if not files:
+            return EMPTY_ROLLUP, []
+
+        bucket = SALES_ROLLUP_BUCKET_SECONDS
+        relation = f"""
+        (SELECT processed_epoch - ((processed_epoch % {bucket}) + {bucket}) % {bucket} AS bucket_start,
+                SUM(amount_cents) AS sales_cents,
+                COUNT(*) AS transaction_count,
+                COALESCE(SUM(reporting_cents), 0) AS reporting_cents,
+                COUNT(*) - COUNT(reporting_cents) AS unconverted_count
+         FROM read_parquet(?, hive_partitioning = false)
+         WHERE processed_epoch >= ? AND processed_epoch < ?
+         GROUP BY 1) AS sales_rollup
+        """
+        return relation, [files, lo, hi]
+
+    def _partition_files(self):
+        # Every snapshot update replaces the version file, giving it a new inode
+        try:
+            stat = os.stat(os.path.join(self.snapshot_dir, VERSION_FILE))
+            generation = (stat.st_ino, stat.st_mtime_ns)
+        except OSError:
+            generation = None
+        with self._lock:
+            if generation is not None and self._partitions[0] == generation:
+                return self._partitions[1]
+        partitions = {}
+        if os.path.isdir(self.snapshot_dir):
+            for entry in os.scandir(self.snapshot_dir):
+                if entry.is_dir() and entry.name.startswith("utc_day="):
+                    files = sorted(
+                        os.path.join(entry.path, name)
+                        for name in os.listdir(entry.path) if name.endswith(".parquet")
+                    )
+                    partitions[int(entry.name.split("=", 1)[1])] = files
+        with self._lock:
+            self._partitions = (generation, partitions)
+        return partitions
@@ -1,8 +1,36 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, g, request, jsonify
+from flask.json.provider import JSONProvider
 from datetime import datetime
 from flask_cors import CORS
-from config import DEFAULT_TIMEZONE
-from models import get_daily_sales_summary, get_hourly_sales_summary, get_period_comparison, get_data_quality_report
+from itertools import chain
+from config import DAILY_PAGE_DEFAULT_LIMIT, DEBUG, DEFAULT_TIMEZONE, HOST, LOG_LEVEL, PORT
+from date_utils import PERIOD_GRANULARITIES
+from metrics import registry
+from params import PERIOD_FORMATS, csv_param, cube_filters, currency_param, page_limit
+import logging
+import orjson
+import time
+from models import (
+    InvalidCubeQuery, InvalidCursor, ReportingCurrencyMismatch, UnknownCurrency, get_daily_sales_page, get_sales_cube, get_daily_sales_summary, get_hourly_sales_summary, get_period_comparison,
+    get_period_trend, get_data_quality_report, iter_daily_sales, result_cache
+)
+
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+class OrjsonProvider(JSONProvider):
+    """jsonify() through orjson; NaN is written as null and numpy scalars as numbers."""
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=str, option=ORJSON_OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, default=str, option=ORJSON_OPTIONS),
+                                        mimetype="application/json")
 
 def error_response(message, code=400, error="Bad Request"):
     return jsonify({
@@ -12,59 +40,146 @@ def error_response(message, code=400, error="Bad Request"):
         "timestamp": datetime.utcnow().isoformat() + "Z"
     }), code
 
-# Initialize the app
-app = Flask(__name__)
-CORS(app)
+api = Blueprint("api", __name__)
 
 # Define routes
-@app.route("/api/sales/daily", methods=["GET"])
+DAILY_CSV_COLUMNS = ["date", "total_sales", "transaction_count", "average_order_value"]
+
+
+def _unknown_currency(currency):
+    return error_response(f"No exchange rates for currency {currency}", code=400, error="Invalid currency")
+
+
+def _currency_mismatch(e):
+    return error_response(str(e), code=500, error="Reporting currency mismatch")
+
+
+def _stream_daily(start_date, end_date, timezone, fmt, currency):
+    """Stream the per-day records as NDJSON or CSV as the DB cursor yields them."""
+    records = iter_daily_sales(start_date, end_date, timezone, currency=currency)
+    first = next(records, None)  # invalid input raises here, before the response starts
+    records = chain([first], records) if first is not None else iter(())
+    if fmt == "ndjson":
+        body = (orjson.dumps(record, option=ORJSON_OPTIONS) + b"\n" for record in records)
+        return Response(body, mimetype="application/x-ndjson")
+    lines = (",".join(str(record[column]) for column in DAILY_CSV_COLUMNS) + "\n" for record in records)
+    return Response(chain([",".join(DAILY_CSV_COLUMNS) + "\n"], lines), mimetype="text/csv")
+
+
+@api.route("/api/sales/daily", methods=["GET"])
 def sales_daily():
     start_date = request.args.get("start_date")
     end_date = request.args.get("end_date")
     timezone = request.args.get("timezone", DEFAULT_TIMEZONE)
+    fmt = request.args.get("format", "json")
+    limit = request.args.get("limit")
+    cursor = request.args.get("cursor")
+    currency = currency_param(request.args)
 
     if not start_date or not end_date:
         return error_response("start_date and end_date are required", code=400, error="Missing query parameters")
+    if fmt not in ("json", "ndjson", "csv"):
+        return error_response("format must be one of json, ndjson, csv", code=400, error="Invalid format")
+    if fmt != "json" and (limit or cursor):
+        return error_response("limit and cursor apply to format=json only", code=400, error="Invalid parameters")
+    try:
+        limit = page_limit(limit)
+    except ValueError as e:
+        return error_response(str(e), code=400, error="Invalid limit")
 
     try:
-        result = get_daily_sales_summary(start_date, end_date, timezone)
+        if fmt != "json":
+            return _stream_daily(start_date, end_date, timezone, fmt, currency)
+        if limit or cursor:
+            result = get_daily_sales_page(start_date, end_date, timezone, limit or DAILY_PAGE_DEFAULT_LIMIT, cursor,
+                                          currency)
+        else:
+            result = get_daily_sales_summary(start_date, end_date, timezone, currency)
         return jsonify(result)
+    except InvalidCursor:
+        return error_response("cursor does not belong to this date range", code=400, error="Invalid cursor")
+    except UnknownCurrency:
+        return _unknown_currency(currency)
+    except ReportingCurrencyMismatch as e:
+        return _currency_mismatch(e)
     except Exception as e:
         return error_response("start_date must be in YYYY-MM-DD format", code=400, error="Invalid date format")
 
 
-@app.route("/api/sales/hourly", methods=["GET"])
+@api.route("/api/sales/hourly", methods=["GET"])
 def sales_hourly():
     date = request.args.get("date")
     timezone = request.args.get("timezone", DEFAULT_TIMEZONE)
+    currency = currency_param(request.args)
 
     if not date:
         return jsonify({"error": "date is required"}), 400
 
     try:
-        result = get_hourly_sales_summary(date, timezone)
+        result = get_hourly_sales_summary(date, timezone, currency)
         return jsonify(result)
+    except UnknownCurrency:
+        return _unknown_currency(currency)
+    except ReportingCurrencyMismatch as e:
+        return _currency_mismatch(e)
     except Exception as e:
         return error_response("date must be in YYYY-MM-DD format", code=400, error="Invalid date format")
 
 
-@app.route("/api/sales/compare", methods=["GET"])
+@api.route("/api/sales/compare", methods=["GET"])
 def sales_compare():
-    period1 = request.args.get("period1")  # Format: YYYY-MM
+    period1 = request.args.get("period1")  # Format: YYYY-MM (or per granularity)
     period2 = request.args.get("period2")
+    periods = request.args.get("periods")  # Comma-separated, for trends
+    granularity = request.args.get("granularity", "month")
+    timezone = request.args.get("timezone", DEFAULT_TIMEZONE)
+    currency = currency_param(request.args)
+
+    if granularity not in PERIOD_GRANULARITIES:
+        return error_response(f"granularity must be one of {', '.join(PERIOD_GRANULARITIES)}", code=400, error="Invalid granularity")
+    if not periods and (not period1 or not period2):
+        return jsonify({"error": "period1 and period2 (or periods) are required"}), 400
+
+    try:
+        if periods:
+            result = get_period_trend(periods.split(","), timezone, granularity, currency)
+        else:
+            result = get_period_comparison(period1, period2, timezone, granularity, currency)
+        return jsonify(result)
+    except UnknownCurrency:
+        return _unknown_currency(currency)
+    except ReportingCurrencyMismatch as e:
+        return _currency_mismatch(e)
+    except Exception as e:
+        return error_response(PERIOD_FORMATS[granularity], code=400, error="Invalid period format")
+
+
+@api.route("/api/sales/cube", methods=["GET"])
+def sales_cube():
+    start_date = request.args.get("start_date")
+    end_date = request.args.get("end_date")
     timezone = request.args.get("timezone", DEFAULT_TIMEZONE)
+    group_by = csv_param(request.args, "group_by")  # e.g. category,status,month
+    filters = cube_filters(request.args)
+    currency = currency_param(request.args)
 
-    if not period1 or not period2:
-        return jsonify({"error": "period1 and period2 are required"}), 400
+    if not start_date or not end_date:
+        return error_response("start_date and end_date are required", code=400, error="Missing query parameters")
 
     try:
-        result = get_period_comparison(period1, period2, timezone)
+        result = get_sales_cube(start_date, end_date, timezone, group_by, filters, currency)
         return jsonify(result)
+    except InvalidCubeQuery as e:
+        return error_response(str(e), code=400, error="Invalid cube query")
+    except UnknownCurrency:
+        return _unknown_currency(currency)
+    except ReportingCurrencyMismatch as e:
+        return _currency_mismatch(e)
     except Exception as e:
-        return error_response("period1 and period2 must be in YYYY-MM format", code=400, error="Invalid period format")
+        return error_response("start_date must be in YYYY-MM-DD format", code=400, error="Invalid date format")
 
 
-@app.route("/api/data-quality", methods=["GET"])
+@api.route("/api/data-quality", methods=["GET"])
 def data_quality():
     try:
         result = get_data_quality_report()
@@ -72,6 +187,41 @@ def data_quality():
     except Exception as e:
         return error_response("Failed to retrieve data quality report", code=500, error="Internal Server Error")
 
-# App entry point
+@api.route("/api/cache/stats", methods=["GET"])
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+@api.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+def _start_timer():
+    g.request_start = time.perf_counter()
+
+def _record_request(response):
+    # Label by route pattern, not path, so the number of series stays fixed
+    endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+    registry.inc("http_requests_total", endpoint=endpoint, status=response.status_code)
+    registry.observe("http_request_seconds", time.perf_counter() - g.request_start, endpoint=endpoint)
+    return response
+
+def create_app(config=None):
+    """Build the Flask app; `config` overrides entries of app.config."""
+    app = Flask(__name__)
+    app.json = OrjsonProvider(app)
+    app.config["DEBUG"] = DEBUG
+    if config:
+        app.config.update(config)
+    CORS(app)
+    app.register_blueprint(api)
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+    return app
+
+
+app = create_app()
+
+# Development entry point; production runs gunicorn (see gunicorn.conf.py)
 if __name__ == "__main__":
-    app.run(debug=True)
\ No newline at end of file
+    logging.basicConfig(level=LOG_LEVEL)
+    app.run(host=HOST, port=PORT, debug=DEBUG)
@@ -0,0 +1,290 @@
+"""
+Async (FastAPI) variant of the API in app.py, sharing models.py.
+
+Query functions run on bounded thread pools: requests for long daily
+ranges and multi-period trends get their own lane, so they cannot occupy
+every thread while short hourly/compare/daily calls wait. Each request is
+limited to REQUEST_TIMEOUT_SECONDS, and a request whose client disconnects
+or times out has its running SQLite statement interrupted.
+
+    uvicorn asgi:app --workers 4
+    GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker gunicorn -c gunicorn.conf.py "asgi:create_app()"
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse
+
+import models
+from config import (
+    ASYNC_LONG_QUERY_DAYS, ASYNC_LONG_QUERY_THREADS, ASYNC_QUERY_THREADS, DAILY_PAGE_DEFAULT_LIMIT,
+    DEFAULT_TIMEZONE, REQUEST_TIMEOUT_SECONDS
+)
+from date_utils import PERIOD_GRANULARITIES
+from metrics import registry
+from params import PERIOD_FORMATS, csv_param, cube_filters, currency_param, page_limit
+
+# Seconds between checks for a disconnected client while a query runs
+DISCONNECT_POLL_SECONDS = 0.05
+
+executors = {
+    "short": ThreadPoolExecutor(ASYNC_QUERY_THREADS, thread_name_prefix="query"),
+    "long": ThreadPoolExecutor(ASYNC_LONG_QUERY_THREADS, thread_name_prefix="long-query"),
+}
+
+
+class QueryAborted(Exception):
+    """The client went away or the request ran out of time."""
+
+    def __init__(self, timed_out):
+        super().__init__("timed out" if timed_out else "client disconnected")
+        self.timed_out = timed_out
+
+
+class _Job:
+    """A query call that can be interrupted from the event loop while it runs."""
+
+    def __init__(self, fn, args):
+        self.fn = fn
+        self.args = args
+        self.thread = None
+        self.cancelled = False
+        self._lock = threading.Lock()
+
+    def run(self):
+        with self._lock:
+            if self.cancelled:
+                return None
+            self.thread = threading.get_ident()
+        try:
+            return self.fn(*self.args)
+        finally:
+            with self._lock:
+                self.thread = None
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            if self.thread is not None:
+                models.read_pool.interrupt(self.thread)
+
+
+async def _wait_for_disconnect(request):
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+
+async def run_query(request, lane, fn, *args):
+    """Run fn(*args) on the lane's thread pool, aborting it on timeout or disconnect."""
+    job = _Job(fn, args)
+    query = asyncio.ensure_future(asyncio.get_running_loop().run_in_executor(executors[lane], job.run))
+    disconnect = asyncio.ensure_future(_wait_for_disconnect(request))
+    try:
+        done, _ = await asyncio.wait(
+            {query, disconnect}, timeout=REQUEST_TIMEOUT_SECONDS, return_when=asyncio.FIRST_COMPLETED
+        )
+    finally:
+        disconnect.cancel()
+    if query in done:
+        return query.result()
+
+    job.cancel()
+    query.cancel()
+    raise QueryAborted(timed_out=disconnect not in done)
+
+
+def error_response(message, code=400, error="Bad Request"):
+    return JSONResponse({
+        "error": error,
+        "message": message,
+        "code": code,
+        "timestamp": datetime.utcnow().isoformat() + "Z"
+    }, status_code=code)
+
+
+def _unknown_currency(currency):
+    return error_response(f"No exchange rates for currency {currency}", code=400, error="Invalid currency")
+
+
+def _currency_mismatch(e):
+    return error_response(str(e), code=500, error="Reporting currency mismatch")
+
+
+def _daily_lane(start_date, end_date):
+    try:
+        days = (date.fromisoformat(end_date) - date.fromisoformat(start_date)).days
+    except ValueError:
+        return "short"
+    return "long" if days > ASYNC_LONG_QUERY_DAYS else "short"
+
+
+async def sales_daily(request: Request):
+    start_date = request.query_params.get("start_date")
+    end_date = request.query_params.get("end_date")
+    timezone = request.query_params.get("timezone", DEFAULT_TIMEZONE)
+    limit = request.query_params.get("limit")
+    cursor = request.query_params.get("cursor")
+    currency = currency_param(request.query_params)
+
+    if not start_date or not end_date:
+        return error_response("start_date and end_date are required", code=400, error="Missing query parameters")
+    if request.query_params.get("format", "json") != "json":
+        # Streamed NDJSON/CSV reads one cursor on one thread; only app.py serves it
+        return error_response("format must be json", code=400, error="Invalid format")
+    try:
+        limit = page_limit(limit)
+    except ValueError as e:
+        return error_response(str(e), code=400, error="Invalid limit")
+
+    try:
+        if limit or cursor:
+            return await run_query(request, "short", models.get_daily_sales_page, start_date, end_date, timezone,
+                                   limit or DAILY_PAGE_DEFAULT_LIMIT, cursor, currency)
+        lane = _daily_lane(start_date, end_date)
+        return await run_query(request, lane, models.get_daily_sales_summary, start_date, end_date, timezone, currency)
+    except QueryAborted:
+        raise
+    except models.InvalidCursor:
+        return error_response("cursor does not belong to this date range", code=400, error="Invalid cursor")
+    except models.UnknownCurrency:
+        return _unknown_currency(currency)
+    except models.ReportingCurrencyMismatch as e:
+        return _currency_mismatch(e)
+    except Exception as e:
+        return error_response("start_date must be in YYYY-MM-DD format", code=400, error="Invalid date format")
+
+
+async def sales_hourly(request: Request):
+    date_str = request.query_params.get("date")
+    timezone = request.query_params.get("timezone", DEFAULT_TIMEZONE)
+    currency = currency_param(request.query_params)
+
+    if not date_str:
+        return JSONResponse({"error": "date is required"}, status_code=400)
+
+    try:
+        return await run_query(request, "short", models.get_hourly_sales_summary, date_str, timezone, currency)
+    except QueryAborted:
+        raise
+    except models.UnknownCurrency:
+        return _unknown_currency(currency)
+    except models.ReportingCurrencyMismatch as e:
+        return _currency_mismatch(e)
+    except Exception as e:
+        return error_response("date must be in YYYY-MM-DD format", code=400, error="Invalid date format")
+
+
+async def sales_compare(request: Request):
+    period1 = request.query_params.get("period1")
+    period2 = request.query_params.get("period2")
+    periods = request.query_params.get("periods")
+    granularity = request.query_params.get("granularity", "month")
+    timezone = request.query_params.get("timezone", DEFAULT_TIMEZONE)
+    currency = currency_param(request.query_params)
+
+    if granularity not in PERIOD_GRANULARITIES:
+        return error_response(f"granularity must be one of {', '.join(PERIOD_GRANULARITIES)}", code=400, error="Invalid granularity")
+    if not periods and (not period1 or not period2):
+        return JSONResponse({"error": "period1 and period2 (or periods) are required"}, status_code=400)
+
+    try:
+        if periods:
+            return await run_query(request, "long", models.get_period_trend, periods.split(","), timezone, granularity,
+                                   currency)
+        return await run_query(request, "short", models.get_period_comparison, period1, period2, timezone, granularity,
+                               currency)
+    except QueryAborted:
+        raise
+    except models.UnknownCurrency:
+        return _unknown_currency(currency)
+    except models.ReportingCurrencyMismatch as e:
+        return _currency_mismatch(e)
+    except Exception as e:
+        return error_response(PERIOD_FORMATS[granularity], code=400, error="Invalid period format")
+
+
+async def sales_cube(request: Request):
+    start_date = request.query_params.get("start_date")
+    end_date = request.query_params.get("end_date")
+    timezone = request.query_params.get("timezone", DEFAULT_TIMEZONE)
+    group_by = csv_param(request.query_params, "group_by")
+    filters = cube_filters(request.query_params)
+    currency = currency_param(request.query_params)
+
+    if not start_date or not end_date:
+        return error_response("start_date and end_date are required", code=400, error="Missing query parameters")
+
+    try:
+        # Month and coarser buckets read a few cells however long the range
+        lane = _daily_lane(start_date, end_date) if {"hour", "day", "week"} & set(group_by) else "short"
+        return await run_query(request, lane, models.get_sales_cube, start_date, end_date, timezone, group_by, filters,
+                               currency)
+    except QueryAborted:
+        raise
+    except models.InvalidCubeQuery as e:
+        return error_response(str(e), code=400, error="Invalid cube query")
+    except models.UnknownCurrency:
+        return _unknown_currency(currency)
+    except models.ReportingCurrencyMismatch as e:
+        return _currency_mismatch(e)
+    except Exception as e:
+        return error_response("start_date must be in YYYY-MM-DD format", code=400, error="Invalid date format")
+
+
+async def data_quality(request: Request):
+    try:
+        return await run_query(request, "short", models.get_data_quality_report)
+    except QueryAborted:
+        raise
+    except Exception as e:
+        return error_response("Failed to retrieve data quality report", code=500, error="Internal Server Error")
+
+
+async def cache_stats():
+    return models.result_cache.stats()
+
+
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+async def record_request(request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Label by route pattern, not path, so the number of series stays fixed
+    route = request.scope.get("route")
+    endpoint = route.path if route is not None else "unmatched"
+    registry.inc("http_requests_total", endpoint=endpoint, status=response.status_code)
+    registry.observe("http_request_seconds", time.perf_counter() - start, endpoint=endpoint)
+    return response
+
+
+async def query_aborted(request, exc):
+    if exc.timed_out:
+        return error_response(f"Request exceeded {REQUEST_TIMEOUT_SECONDS:g}s", code=504, error="Request timed out")
+    # Nobody is listening; the status only shows up in access logs
+    return JSONResponse({"error": "Client disconnected"}, status_code=499)
+
+
+def create_app():
+    app = FastAPI(title="E-commerce Analytics API", default_response_class=ORJSONResponse)
+    app.add_middleware(CORSMiddleware, allow_origins=["*"])
+    app.add_api_route("/api/sales/daily", sales_daily, methods=["GET"])
+    app.add_api_route("/api/sales/hourly", sales_hourly, methods=["GET"])
+    app.add_api_route("/api/sales/compare", sales_compare, methods=["GET"])
+    app.add_api_route("/api/sales/cube", sales_cube, methods=["GET"])
+    app.add_api_route("/api/data-quality", data_quality, methods=["GET"])
+    app.add_api_route("/api/cache/stats", cache_stats, methods=["GET"])
+    app.add_api_route("/metrics", metrics, methods=["GET"])
+    app.middleware("http")(record_request)
+    app.add_exception_handler(QueryAborted, query_aborted)
+    return app
+
+
+app = create_app()
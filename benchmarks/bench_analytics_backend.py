@@ -0,0 +1,64 @@
+"""
+Uncached latency of the daily, hourly and compare summaries on the SQLite
+backend (sales_rollup table) and the DuckDB backend (Parquet snapshot),
+plus the time to write the snapshot.
+
+    python -m benchmarks.bench_analytics_backend --rows 1000000 10000000 100000000
+"""
+
+import argparse
+import io
+import os
+import sqlite3
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+import models
+from analytics import ParquetSalesEngine, write_parquet_snapshot
+from benchmarks.bench_daily_sales import time_call
+from benchmarks.synthetic import build_processed_db
+
+CALLS = [
+    ("daily 1 day", models.get_daily_sales_summary, ("2023-06-01", "2023-06-01")),
+    ("daily quarter", models.get_daily_sales_summary, ("2023-04-01", "2023-06-30")),
+    ("daily 365 days", models.get_daily_sales_summary, ("2023-01-01", "2023-12-31")),
+    ("hourly", models.get_hourly_sales_summary, ("2023-06-01",)),
+    ("compare", models.get_period_comparison, ("2023-05", "2023-06")),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    parser.add_argument("--timezone", default="America/New_York")
+    args = parser.parse_args()
+    models.result_cache.clear()
+    models.result_cache.max_entries = 0  # time the queries, not the cache
+
+    print(f"{'rows':>11}  {'call':<16} {'sqlite ms':>10} {'duckdb ms':>10}")
+    for n_rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "bench.db")
+            snapshot_dir = os.path.join(tmp, "snapshot")
+            with redirect_stdout(io.StringIO()):
+                build_processed_db(db_path, n_rows)
+            conn = sqlite3.connect(db_path)
+            start = time.perf_counter()
+            write_parquet_snapshot(conn, snapshot_dir)
+            print(f"{n_rows:>11}  {'write snapshot':<16} {'':>10} {(time.perf_counter() - start) * 1000:>10.0f}")
+            conn.close()
+
+            models.DATABASE_PATH = db_path
+            models.parquet_engine = ParquetSalesEngine(snapshot_dir)
+            for label, fn, call_args in CALLS:
+                timings = []
+                for backend in ("sqlite", "duckdb"):
+                    models.ANALYTICS_BACKEND = backend
+                    timings.append(time_call(fn, *call_args, args.timezone))
+                print(f"{n_rows:>11}  {label:<16} {timings[0] * 1000:>10.2f} {timings[1] * 1000:>10.2f}")
+            models.read_pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
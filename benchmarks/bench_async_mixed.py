@@ -0,0 +1,86 @@
+"""
+Mixed workload against the async API (asgi.py): clients issuing long
+daily/trend requests run alongside clients issuing short hourly/compare
+requests, and the short requests' p50/p99 are reported with separate
+short/long thread-pool lanes and with a single shared pool. The result
+cache is disabled.
+
+    python -m benchmarks.bench_async_mixed --rows 1000000 --long-clients 4 --short-clients 4
+"""
+
+import argparse
+import asyncio
+import io
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+import httpx
+
+import asgi
+import models
+from benchmarks.bench_concurrent_reads import percentile
+from benchmarks.synthetic import build_processed_db
+
+LONG_PATHS = [
+    "/api/sales/daily?start_date=2023-01-01&end_date=2023-12-31&timezone=America/New_York",
+    "/api/sales/compare?periods=" + ",".join(f"2023-{m:02d}" for m in range(1, 13)),
+]
+SHORT_PATHS = [
+    "/api/sales/hourly?date=2023-06-01&timezone=America/New_York",
+    "/api/sales/compare?period1=2023-05&period2=2023-06",
+]
+
+
+async def client(http, paths, deadline, latencies):
+    i = 0
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        response = await http.get(paths[i % len(paths)])
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+        i += 1
+
+
+async def run(long_clients, short_clients, seconds):
+    transport = httpx.ASGITransport(app=asgi.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+        deadline = time.monotonic() + seconds
+        long_latencies, short_latencies = [], []
+        await asyncio.gather(
+            *(client(http, LONG_PATHS, deadline, long_latencies) for _ in range(long_clients)),
+            *(client(http, SHORT_PATHS, deadline, short_latencies) for _ in range(short_clients)),
+        )
+    return sorted(long_latencies), sorted(short_latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--long-clients", type=int, default=4)
+    parser.add_argument("--short-clients", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+    models.result_cache.max_entries = 0
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        with redirect_stdout(io.StringIO()):
+            build_processed_db(db_path, args.rows)
+        models.DATABASE_PATH = db_path
+
+        lanes = dict(asgi.executors)
+        print(f"{'pools':<8} {'short p50':>10} {'short p99':>10} {'long p50':>10} {'short req':>10}")
+        for label, executors in (("shared", {"short": lanes["short"], "long": lanes["short"]}), ("lanes", lanes)):
+            asgi.executors = executors
+            long_latencies, short_latencies = asyncio.run(run(args.long_clients, args.short_clients, args.seconds))
+            print(
+                f"{label:<8} {percentile(short_latencies, 50) * 1000:>10.2f} {percentile(short_latencies, 99) * 1000:>10.2f}"
+                f" {percentile(long_latencies, 50) * 1000:>10.2f} {len(short_latencies):>10}"
+            )
+        asgi.executors = lanes
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Throughput of insert_clean_data_into_db with and without bulk_load.
+
+Each mode replaces a table already holding the same rows, so the DELETE
+and index maintenance are part of the cost.
+
+    python -m benchmarks.bench_bulk_load --rows 100000 1000000
+"""
+
+import argparse
+import io
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+import utils
+from benchmarks.synthetic import write_raw_csv
+from setup_db import setup_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'mode':>8} {'seconds':>9} {'rows/s':>9}")
+    for n_rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = os.path.join(tmp, "transactions.csv")
+            db_path = os.path.join(tmp, "bench.db")
+            write_raw_csv(csv_path, n_rows)
+            df = utils.clean_and_enrich_transactions(utils.load_transaction_data(csv_path))
+            with redirect_stdout(io.StringIO()):
+                setup_database(db_path)
+                utils.DATABASE_PATH = db_path
+                utils.insert_clean_data_into_db(df.copy())
+
+            for bulk in (False, True):
+                start = time.perf_counter()
+                with redirect_stdout(io.StringIO()):
+                    utils.insert_clean_data_into_db(df.copy(), bulk=bulk)
+                seconds = time.perf_counter() - start
+                mode = "bulk" if bulk else "default"
+                print(f"{n_rows:>10} {mode:>8} {seconds:>9.2f} {n_rows / seconds:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+p50/p99 latency of the query functions under concurrent clients, with the
+result cache disabled, comparing pooled read-only connections against a
+fresh connection per call.
+
+    python -m benchmarks.bench_concurrent_reads --rows 1000000 --clients 1 4 16
+"""
+
+import argparse
+import io
+import os
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+
+import models
+from benchmarks.bench_sales_summaries import CALLS
+from benchmarks.synthetic import build_processed_db
+from config import READ_POOL_MMAP_SIZE
+from db import ReadConnectionPool
+
+
+def percentile(sorted_values, pct):
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_clients(n_clients, requests_per_client, timezone):
+    latencies = []
+    lock = threading.Lock()
+
+    def client(offset):
+        timings = []
+        for i in range(requests_per_client):
+            _, fn, call_args = CALLS[(offset + i) % len(CALLS)]
+            start = time.perf_counter()
+            fn(*call_args, timezone)
+            timings.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(timings)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(n_clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return percentile(latencies, 50), percentile(latencies, 99), len(latencies) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=50, help="requests per client")
+    parser.add_argument("--timezone", default="America/New_York")
+    args = parser.parse_args()
+    models.result_cache.clear()
+    models.result_cache.max_entries = 0  # time the queries, not the cache
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        with redirect_stdout(io.StringIO()):
+            build_processed_db(db_path, args.rows)
+        models.DATABASE_PATH = db_path
+
+        print(f"{'clients':>8}  {'connections':<12} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>9}")
+        for n_clients in args.clients:
+            for label, pooled in (("per call", False), ("pooled", True)):
+                models.read_pool = ReadConnectionPool(mmap_size=READ_POOL_MMAP_SIZE, pooled=pooled)
+                p50, p99, throughput = run_clients(n_clients, args.requests, args.timezone)
+                models.read_pool.close_all()
+                print(f"{n_clients:>8}  {label:<12} {p50 * 1000:>9.2f} {p99 * 1000:>9.2f} {throughput:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Latency of /api/sales/daily as a function of table size and range width.
+
+With the range predicate on sales_rollup.bucket_start, latency should track
+the number of days requested and stay roughly flat as the table grows.
+
+    python -m benchmarks.bench_daily_sales --rows 100000 1000000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import io
+from contextlib import redirect_stdout
+
+import models
+from benchmarks.synthetic import build_processed_db
+
+RANGES = [
+    ("2023-06-01", "2023-06-01"),
+    ("2023-06-01", "2023-06-07"),
+    ("2023-06-01", "2023-06-30"),
+    ("2023-01-01", "2023-12-31"),
+]
+
+
+def time_call(fn, *args, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--timezone", default="America/New_York")
+    args = parser.parse_args()
+    models.result_cache.clear()
+    models.result_cache.max_entries = 0  # time the queries, not the cache
+
+    print(f"{'rows':>10}  {'range':<25} {'ms':>9}")
+    for n_rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "bench.db")
+            with redirect_stdout(io.StringIO()):
+                build_processed_db(db_path, n_rows)
+            models.DATABASE_PATH = db_path
+            for start, end in RANGES:
+                seconds = time_call(models.get_daily_sales_summary, start, end, args.timezone)
+                print(f"{n_rows:>10}  {start + ' to ' + end:<25} {seconds * 1000:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
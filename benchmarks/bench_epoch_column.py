@@ -0,0 +1,72 @@
+"""
+processed_timestamp (text) vs processed_epoch (integer) for range scans.
+
+For each table size, reports the on-disk size of an index on either
+column and the time to load one day of (timestamp, amount) rows as UTC
+datetimes: text rows go through pd.to_datetime, epoch rows are a plain
+int64 array.
+
+    python -m benchmarks.bench_epoch_column --rows 100000 1000000
+"""
+
+import argparse
+import io
+import os
+import sqlite3
+import tempfile
+from contextlib import redirect_stdout
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_daily_sales import time_call
+from benchmarks.synthetic import build_processed_db
+
+DAY = ("2023-06-01 00:00:00", "2023-06-02 00:00:00")
+
+
+def load_day_text(conn):
+    rows = conn.execute(
+        "SELECT processed_timestamp, amount FROM transactions "
+        "WHERE processed_timestamp >= ? AND processed_timestamp < ?", DAY
+    ).fetchall()
+    return pd.to_datetime([ts for ts, _ in rows], utc=True)
+
+
+def load_day_epoch(conn):
+    lo, hi = (int(pd.Timestamp(bound).timestamp()) for bound in DAY)
+    rows = conn.execute(
+        "SELECT processed_epoch, amount FROM transactions "
+        "WHERE processed_epoch >= ? AND processed_epoch < ?", (lo, hi)
+    ).fetchall()
+    return pd.to_datetime(np.fromiter((epoch for epoch, _ in rows), dtype=np.int64, count=len(rows)),
+                          unit="s", utc=True)
+
+
+def index_bytes(conn, name):
+    return conn.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = ?", (name,)).fetchone()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'text idx MB':>12} {'epoch idx MB':>13} {'text ms':>9} {'epoch ms':>9}")
+    for n_rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "bench.db")
+            with redirect_stdout(io.StringIO()):
+                build_processed_db(db_path, n_rows)
+            conn = sqlite3.connect(db_path)
+            conn.execute("CREATE INDEX idx_processed_timestamp ON transactions(processed_timestamp)")
+            text_mb = index_bytes(conn, "idx_processed_timestamp") / 2**20
+            epoch_mb = index_bytes(conn, "idx_processed_epoch") / 2**20
+            text_ms = time_call(load_day_text, conn) * 1000
+            epoch_ms = time_call(load_day_epoch, conn) * 1000
+            conn.close()
+            print(f"{n_rows:>10} {text_mb:>12.1f} {epoch_mb:>13.1f} {text_ms:>9.2f} {epoch_ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
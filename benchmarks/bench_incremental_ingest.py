@@ -0,0 +1,44 @@
+"""
+Time to merge a fixed-size batch with utils.ingest_incremental as the
+existing table grows. It should depend on the batch, not the table.
+
+    python -m benchmarks.bench_incremental_ingest --rows 100000 1000000 --batch 5000
+"""
+
+import argparse
+import io
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+import utils
+from benchmarks.synthetic import build_processed_db, write_raw_csv
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--batch", type=int, default=5_000)
+    args = parser.parse_args()
+
+    print(f"{'table rows':>11} {'batch':>7} {'seconds':>9}")
+    for n_rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "bench.db")
+            csv_path = os.path.join(tmp, "batch.csv")
+            with redirect_stdout(io.StringIO()):
+                build_processed_db(db_path, n_rows, start="2024-01-01", days=90)
+            write_raw_csv(csv_path, args.batch, start="2024-03-01", days=1, seed=1)
+            batch = utils.load_transaction_data(csv_path)
+            batch["transaction_id"] = "NEW-" + batch["transaction_id"]
+
+            utils.DATABASE_PATH = db_path
+            start = time.perf_counter()
+            with redirect_stdout(io.StringIO()):
+                utils.ingest_incremental(batch)
+            print(f"{n_rows:>11} {args.batch:>7} {time.perf_counter() - start:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+HTTP load test of the gunicorn deployment at several worker counts.
+
+For each worker count a server is started with gunicorn.conf.py against
+the given database, then N client threads issue a fixed mix of daily,
+hourly and compare requests over keep-alive connections. Reports
+throughput and p50/p99 latency. The result cache is disabled unless
+--cache is given, so the numbers reflect query work.
+
+    python -m benchmarks.bench_load_test --workers 1 2 4 --clients 16 --seconds 10
+
+Pass --url to load-test an already running server instead.
+"""
+
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from benchmarks.bench_concurrent_reads import percentile
+from config import DATABASE_PATH
+
+PATHS = [
+    "/api/sales/daily?start_date=2024-01-01&end_date=2024-01-31&timezone=America/New_York",
+    "/api/sales/daily?start_date=2024-01-01&end_date=2024-12-31&timezone=Asia/Tokyo",
+    "/api/sales/hourly?date=2024-03-10&timezone=America/New_York",
+    "/api/sales/compare?period1=2024-01&period2=2024-02&timezone=Europe/London",
+]
+
+
+def wait_for_port(host, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"server on {host}:{port} did not start")
+
+
+def run_clients(host, port, n_clients, seconds):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def client(offset):
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        timings, failed, i = [], 0, offset
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                conn.request("GET", PATHS[i % len(PATHS)])
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    failed += 1
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=30)
+            timings.append(time.perf_counter() - start)
+            i += 1
+        conn.close()
+        with lock:
+            latencies.extend(timings)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(n_clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return len(latencies) / seconds, percentile(latencies, 50), percentile(latencies, 99), errors[0]
+
+
+def start_server(workers, threads, port, db_path, cache):
+    env = dict(
+        os.environ,
+        WEB_CONCURRENCY=str(workers),
+        GUNICORN_THREADS=str(threads),
+        HOST="127.0.0.1",
+        PORT=str(port),
+        DATABASE_PATH=db_path,
+        GUNICORN_ACCESS_LOG="",
+    )
+    if not cache:
+        env["RESULT_CACHE_MAX_ENTRIES"] = "0"
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:create_app()"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, default=1, help="threads per worker")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--port", type=int, default=5099)
+    parser.add_argument("--db", default=DATABASE_PATH)
+    parser.add_argument("--cache", action="store_true", help="leave the result cache enabled")
+    parser.add_argument("--url", help="load-test this running server instead")
+    args = parser.parse_args()
+
+    print(f"{'workers':>8}  {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    if args.url:
+        target = urlsplit(args.url)
+        throughput, p50, p99, errors = run_clients(target.hostname, target.port or 80, args.clients, args.seconds)
+        print(f"{'-':>8}  {throughput:>9.0f} {p50 * 1000:>9.2f} {p99 * 1000:>9.2f} {errors:>7}")
+        return
+
+    for workers in args.workers:
+        server = start_server(workers, args.threads, args.port, os.path.abspath(args.db), args.cache)
+        try:
+            wait_for_port("127.0.0.1", args.port)
+            throughput, p50, p99, errors = run_clients("127.0.0.1", args.port, args.clients, args.seconds)
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{workers:>8}  {throughput:>9.0f} {p50 * 1000:>9.2f} {p99 * 1000:>9.2f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    main()
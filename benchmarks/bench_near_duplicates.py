@@ -0,0 +1,55 @@
+"""
+Time and peak memory of utils.detect_near_duplicates on synthetic rows.
+
+    python -m benchmarks.bench_near_duplicates --rows 1000000 10000000
+"""
+
+import argparse
+import io
+import resource
+import time
+from contextlib import redirect_stdout
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import CATEGORIES, STATUSES
+from utils import detect_near_duplicates
+
+
+def synthetic_frame(n_rows, duplicate_rate=0.02, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "customer_id": pd.Categorical.from_codes(rng.integers(0, 9000, n_rows),
+                                                 [f"CUST-{i}" for i in range(1000, 10000)]),
+        "amount": np.round(rng.uniform(5.99, 999.99, n_rows), 2),
+        "status": pd.Categorical.from_codes(rng.integers(0, len(STATUSES), n_rows), STATUSES),
+        "product_category": pd.Categorical.from_codes(rng.integers(0, len(CATEGORIES), n_rows), CATEGORIES),
+        "processed_timestamp": pd.to_datetime(
+            1_704_067_200 + rng.integers(0, 365 * 86400, n_rows), unit="s", utc=True),
+    })
+    # Re-send a few rows a couple of seconds later
+    dupes = rng.choice(n_rows, int(n_rows * duplicate_rate), replace=False)
+    copies = df.iloc[dupes].copy()
+    copies["processed_timestamp"] += pd.to_timedelta(rng.integers(1, 6, len(copies)), unit="s")
+    return pd.concat([df, copies], ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'rows':>11} {'seconds':>9} {'duplicates':>11} {'peak RSS MB':>12}")
+    for n_rows in args.rows:
+        df = synthetic_frame(n_rows)
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            duplicates = detect_near_duplicates(df)
+        seconds = time.perf_counter() - start
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"{len(df):>11} {seconds:>9.2f} {len(duplicates):>11} {peak_mb:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
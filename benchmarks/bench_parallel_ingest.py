@@ -0,0 +1,60 @@
+"""
+Speedup of utils.ingest_csv_parallel over the single-process streaming
+ingest as workers are added.
+
+Cleaning scales with the workers; reading the CSV, near-duplicate
+detection and the inserts stay in the parent, which bounds the speedup.
+
+    python -m benchmarks.bench_parallel_ingest --rows 10000000 --workers 1 2 4 8
+"""
+
+import argparse
+import io
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+import utils
+from benchmarks.synthetic import write_raw_csv
+from setup_db import setup_database
+
+
+def run(csv_path, db_path, workers, chunksize):
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    with redirect_stdout(io.StringIO()):
+        setup_database(db_path)
+        utils.DATABASE_PATH = db_path
+        start = time.perf_counter()
+        if workers == 0:
+            rows = utils.ingest_csv_streaming(csv_path, chunksize=chunksize)
+        else:
+            rows = utils.ingest_csv_parallel(csv_path, workers=workers, chunksize=chunksize)
+    return rows, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "transactions.csv")
+        db_path = os.path.join(tmp, "bench.db")
+        write_raw_csv(csv_path, args.rows)
+
+        print(f"{os.cpu_count()} CPUs, {args.rows} rows")
+        print(f"{'workers':>9} {'seconds':>9} {'rows/s':>9} {'speedup':>8}")
+        rows, baseline = run(csv_path, db_path, 0, args.chunksize)
+        print(f"{'stream':>9} {baseline:>9.2f} {rows / baseline:>9.0f} {1:>8.2f}")
+        for workers in args.workers:
+            rows, seconds = run(csv_path, db_path, workers, args.chunksize)
+            print(f"{workers:>9} {seconds:>9.2f} {rows / seconds:>9.0f} {baseline / seconds:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
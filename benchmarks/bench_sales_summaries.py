@@ -0,0 +1,52 @@
+"""
+Latency of the daily, hourly and compare summaries served from sales_rollup.
+
+Each call reads at most a few thousand 15-minute buckets, so uncached
+latency should stay flat as the transactions table grows; repeated calls
+are answered from the result cache.
+
+    python -m benchmarks.bench_sales_summaries --rows 100000 1000000
+"""
+
+import argparse
+import io
+import os
+import tempfile
+from contextlib import redirect_stdout
+
+import models
+from benchmarks.bench_daily_sales import time_call
+from benchmarks.synthetic import build_processed_db
+
+CALLS = [
+    ("daily 1 day", models.get_daily_sales_summary, ("2023-06-01", "2023-06-01")),
+    ("daily 30 days", models.get_daily_sales_summary, ("2023-06-01", "2023-06-30")),
+    ("daily 365 days", models.get_daily_sales_summary, ("2023-01-01", "2023-12-31")),
+    ("hourly", models.get_hourly_sales_summary, ("2023-06-01",)),
+    ("compare", models.get_period_comparison, ("2023-05", "2023-06")),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--timezone", default="America/New_York")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10}  {'call':<16} {'ms':>9} {'cached ms':>10}")
+    for n_rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "bench.db")
+            with redirect_stdout(io.StringIO()):
+                build_processed_db(db_path, n_rows)
+            models.DATABASE_PATH = db_path
+            for label, fn, call_args in CALLS:
+                models.result_cache.max_entries = 0
+                seconds = time_call(fn, *call_args, args.timezone)
+                models.result_cache.max_entries = 1024
+                cached_seconds = time_call(fn, *call_args, args.timezone)
+                print(f"{n_rows:>10}  {label:<16} {seconds * 1000:>9.2f} {cached_seconds * 1000:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Peak RSS and throughput of utils.ingest_csv_streaming as the input grows.
+
+Each size runs in a fresh interpreter so its peak RSS is measured alone;
+with streaming it should stay flat while the file size grows.
+
+    python -m benchmarks.bench_streaming_ingest --rows 10000 1000000 --chunksize 50000
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.synthetic import write_raw_csv
+
+CHILD = """
+import io, resource, sys, time
+from contextlib import redirect_stdout
+import utils
+from setup_db import setup_database
+csv_path, db_path, chunksize = sys.argv[1], sys.argv[2], int(sys.argv[3])
+with redirect_stdout(io.StringIO()):
+    setup_database(db_path)
+utils.DATABASE_PATH = db_path
+start = time.perf_counter()
+with redirect_stdout(io.StringIO()):
+    rows = utils.ingest_csv_streaming(csv_path, chunksize=chunksize)
+seconds = time.perf_counter() - start
+try:
+    # ru_maxrss survives fork+exec from the parent; VmHWM does not
+    with open("/proc/self/status") as status:
+        peak_kb = next(int(line.split()[1]) for line in status if line.startswith("VmHWM"))
+except OSError:
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(rows, seconds, peak_kb / 1024)
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    args = parser.parse_args()
+
+    print(f"{'rows':>11} {'CSV MB':>8} {'seconds':>9} {'rows/s':>9} {'peak RSS MB':>12}")
+    for n_rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = os.path.join(tmp, "transactions.csv")
+            db_path = os.path.join(tmp, "bench.db")
+            write_raw_csv(csv_path, n_rows)
+            out = subprocess.run(
+                [sys.executable, "-c", CHILD, csv_path, db_path, str(args.chunksize)],
+                check=True, capture_output=True, text=True,
+            ).stdout.split()
+            rows, seconds, peak_mb = int(out[0]), float(out[1]), float(out[2])
+            csv_mb = os.path.getsize(csv_path) / 2**20
+            print(f"{rows:>11} {csv_mb:>8.1f} {seconds:>9.2f} {rows / seconds:>9.0f} {peak_mb:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Regression suite on seeded synthetic data: each ingest mode with its
+stage timings and peak RSS, and every endpoint in app.py across range
+widths and timezones with its latency and peak traced memory.
+
+Results go to benchmarks/results/<commit>.json; --compare prints the
+change from an earlier result (and with --fail-on-regression exits 1 when
+a case got slower than --threshold allows). Compare results taken on the
+same machine with the same --rows/--ingest-rows.
+
+    python -m benchmarks.bench_suite --rows 1000000 --ingest-rows 200000
+    python -m benchmarks.bench_suite --compare benchmarks/results/<commit>.json
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+import models
+from app import create_app
+from benchmarks.synthetic import build_processed_db, write_transactions
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# Cases faster than this are reported but never counted as regressions;
+# their timings are mostly noise
+MIN_COMPARED_SECONDS = 0.005
+
+TIMEZONES = ["UTC", "America/New_York", "Asia/Kolkata"]
+
+# (name, start, end) daily ranges inside build_processed_db's 2023 data
+DAILY_RANGES = [
+    ("1d", "2023-06-01", "2023-06-01"),
+    ("7d", "2023-06-01", "2023-06-07"),
+    ("31d", "2023-06-01", "2023-07-01"),
+    ("365d", "2023-01-01", "2023-12-31"),
+]
+
+INGEST_CHILD = """
+import json, resource, sys, time
+import utils
+from metrics import ingest_report, last_ingest_report
+from setup_db import setup_database
+mode, csv_path, db_path, chunksize = sys.argv[1], sys.argv[2], sys.argv[3], int(sys.argv[4])
+setup_database(db_path)
+utils.DATABASE_PATH = db_path
+start = time.perf_counter()
+if mode == "full":
+    with ingest_report("full"):
+        utils.insert_clean_data_into_db(utils.clean_and_enrich_transactions(utils.load_transaction_data(csv_path)))
+elif mode == "streaming":
+    utils.ingest_csv_streaming(csv_path, chunksize=chunksize)
+else:
+    utils.ingest_csv_parallel(csv_path, chunksize=chunksize)
+seconds = time.perf_counter() - start
+try:
+    with open("/proc/self/status") as status:
+        peak_kb = next(int(line.split()[1]) for line in status if line.startswith("VmHWM"))
+except OSError:
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"seconds": seconds, "peak_mb": peak_kb / 1024, "report": last_ingest_report().as_dict()}))
+"""
+
+
+def endpoint_cases():
+    """(case name, URL) for every endpoint of app.py."""
+    cases = []
+    for tz in TIMEZONES:
+        for width, start, end in DAILY_RANGES:
+            cases.append((f"daily {width} {tz}", f"/api/sales/daily?start_date={start}&end_date={end}&timezone={tz}"))
+        cases.append((f"hourly {tz}", f"/api/sales/hourly?date=2023-06-15&timezone={tz}"))
+        cases.append((f"compare month {tz}", f"/api/sales/compare?period1=2023-05&period2=2023-06&timezone={tz}"))
+        months = ",".join(f"2023-{m:02d}" for m in range(1, 13))
+        cases.append((f"trend 12 months {tz}", f"/api/sales/compare?periods={months}&timezone={tz}"))
+        cases.append((f"trend 52 weeks {tz}", "/api/sales/compare?granularity=week&periods="
+                      + ",".join(f"2023-W{w:02d}" for w in range(1, 53)) + f"&timezone={tz}"))
+        for group_by in ("category", "month,category,status", "week,currency", "day,category"):
+            cases.append((f"cube 365d {group_by} {tz}", "/api/sales/cube?start_date=2023-01-01&end_date=2023-12-31"
+                          f"&group_by={group_by}&timezone={tz}"))
+        # Totals converted per UTC day into a currency other than the reporting one
+        cases.append((f"daily 365d EUR {tz}", "/api/sales/daily?start_date=2023-01-01&end_date=2023-12-31"
+                      f"&timezone={tz}&currency=EUR"))
+        cases.append((f"trend 12 months EUR {tz}", f"/api/sales/compare?periods={months}&timezone={tz}&currency=EUR"))
+        cases.append((f"cube 365d month,category EUR {tz}", "/api/sales/cube?start_date=2023-01-01"
+                      f"&end_date=2023-12-31&group_by=month,category&timezone={tz}&currency=EUR"))
+    cases.append(("hourly dst fall back", "/api/sales/hourly?date=2023-11-05&timezone=America/New_York"))
+    cases.append(("data-quality", "/api/data-quality"))
+    cases.append(("cache stats", "/api/cache/stats"))
+    cases.append(("metrics", "/metrics"))
+    return cases
+
+
+def run_endpoints(n_rows, repeat):
+    results = {}
+    models.result_cache.clear()
+    models.result_cache.max_entries = 0  # time the queries, not the cache
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        with redirect_stdout(io.StringIO()):
+            build_processed_db(db_path, n_rows)
+        models.DATABASE_PATH = db_path
+        client = create_app({"TESTING": True}).test_client()
+        for name, url in endpoint_cases():
+            assert client.get(url).status_code == 200, url  # warm up
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                client.get(url)
+                timings.append(time.perf_counter() - start)
+            tracemalloc.start()
+            client.get(url)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results[f"endpoint:{name}"] = {
+                "seconds": min(timings),
+                "median_seconds": statistics.median(timings),
+                "peak_mb": peak / 2**20,
+            }
+            print(f"  {name:<40} {min(timings) * 1000:>9.2f} ms {peak / 2**20:>8.2f} MB")
+        models.read_pool.close_all()
+    return results
+
+
+def run_ingest(n_rows, modes, chunksize, seed):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "transactions.csv")
+        write_transactions(csv_path, n_rows, seed=seed)
+        for mode in modes:
+            db_path = os.path.join(tmp, f"{mode}.db")
+            out = subprocess.run(
+                [sys.executable, "-c", INGEST_CHILD, mode, csv_path, db_path, str(chunksize)],
+                check=True, capture_output=True, text=True,
+            ).stdout.splitlines()[-1]
+            run = json.loads(out)
+            results[f"ingest:{mode}"] = {"seconds": run["seconds"], "peak_mb": run["peak_mb"],
+                                         "rows_per_second": n_rows / run["seconds"]}
+            for stage, seconds in run["report"]["stages"].items():
+                results[f"ingest:{mode}:{stage}"] = {"seconds": seconds}
+            print(f"  {mode:<40} {run['seconds']:>9.2f} s  {run['peak_mb']:>8.0f} MB  "
+                  + " ".join(f"{stage}={seconds:.2f}" for stage, seconds in run["report"]["stages"].items()))
+    return results
+
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def metadata(args):
+    commit = _git("rev-parse", "--short", "HEAD") or "unknown"
+    dirty = bool(_git("status", "--porcelain", "--untracked-files=no"))
+    return {
+        "commit": commit + ("-dirty" if dirty else ""),
+        "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+        "rows": args.rows,
+        "ingest_rows": args.ingest_rows,
+        "seed": args.seed,
+        "repeat": args.repeat,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Print each case's change from the baseline; return the regressed case names."""
+    regressions = []
+    print(f"\n{'case':<52} {'before':>10} {'after':>10} {'change':>8}")
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None or not before["seconds"]:
+            continue
+        ratio = result["seconds"] / before["seconds"]
+        marker = ""
+        if ratio > 1 + threshold and before["seconds"] >= MIN_COMPARED_SECONDS:
+            marker = "  slower"
+            regressions.append(name)
+        elif ratio < 1 / (1 + threshold):
+            marker = "  faster"
+        print(f"{name:<52} {before['seconds'] * 1000:>8.1f}ms {result['seconds'] * 1000:>8.1f}ms "
+              f"{(ratio - 1) * 100:>+7.1f}%{marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="rows in the database the endpoints query")
+    parser.add_argument("--ingest-rows", type=int, default=200_000, help="rows in the CSV each ingest mode loads")
+    parser.add_argument("--ingest-modes", nargs="+", default=["full", "streaming"],
+                        choices=["full", "streaming", "parallel"])
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skip-ingest", action="store_true")
+    parser.add_argument("--output", help="result file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="slowdown counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    current = {"meta": metadata(args), "results": {}}
+    if not args.skip_ingest:
+        print(f"Ingest ({args.ingest_rows:,} rows)")
+        current["results"].update(run_ingest(args.ingest_rows, args.ingest_modes, args.chunksize, args.seed))
+    print(f"Endpoints ({args.rows:,} rows)")
+    current["results"].update(run_endpoints(args.rows, args.repeat))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{current['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(current, f, indent=2, sort_keys=True)
+    print(f"\nWrote {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(current, json.load(f), args.threshold)
+        if regressions and args.fail_on_regression:
+            print(f"\n{len(regressions)} case(s) slower than the baseline by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
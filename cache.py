@@ -0,0 +1,118 @@
+"""
+In-process LRU/TTL cache for the query results served by the API.
+
+Entries are dropped wholesale whenever the data version reported for the
+database changes, so a new load is visible on the next request.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+
+class ResultCache:
+    """
+    Bounded by entry count and by the approximate JSON size of the cached
+    results. Cached values are shared between callers and must not be
+    mutated.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=64 * 1024 * 1024, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def get(self, key, version):
+        """Return (True, value) on a hit and (False, None) otherwise."""
+        with self._lock:
+            if version != self._version:
+                if self._entries:
+                    self._stats["invalidations"] += 1
+                self._clear()
+                self._version = version
+
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] < time.monotonic():
+                self._remove(key)
+                self._stats["expirations"] += 1
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return True, entry[0]
+
+    def put(self, key, version, value):
+        size = len(json.dumps(value, default=str))
+        with self._lock:
+            # Computed against data that has since been replaced
+            if version != self._version or size > self.max_bytes or self.max_entries <= 0:
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + self.ttl_seconds)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else None
+            }
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+
+def _normalize(value):
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _normalize(v)) for k, v in value.items()))
+    return value
+
+
+def cached(cache, endpoint, version_fn):
+    """
+    Cache fn's results in `cache`, keyed on `endpoint` and the normalized
+    call arguments, under the data version returned by version_fn().
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = (endpoint, _normalize(args), tuple(sorted((k, _normalize(v)) for k, v in kwargs.items())))
+            version = version_fn()
+            hit, value = cache.get(key, version)
+            if hit:
+                return value
+            value = fn(*args, **kwargs)
+            cache.put(key, version, value)
+            return value
+        return wrapper
+    return decorator
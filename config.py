@@ -1,4 +1,89 @@
-DATABASE_PATH = "data/ecommerce.db"
-CSV_PATH = "data/transactions.csv"
-DEFAULT_TIMEZONE = "UTC"
-DEBUG = True
\ No newline at end of file
+import os
+
+
+def _env_bool(name, default):
+    return os.environ.get(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+DATABASE_PATH = os.environ.get("DATABASE_PATH", "data/ecommerce.db")
+CSV_PATH = os.environ.get("CSV_PATH", "data/transactions.csv")
+DEFAULT_TIMEZONE = os.environ.get("DEFAULT_TIMEZONE", "UTC")
+
+# Flask debug mode (debugger and reloader); only for `python app.py`
+DEBUG = _env_bool("DEBUG", False)
+
+# Address for the development server and gunicorn
+HOST = os.environ.get("HOST", "127.0.0.1")
+PORT = int(os.environ.get("PORT", 5000))
+
+# Width of the UTC buckets in the sales_rollup table. Every current UTC
+# offset is a multiple of 15 minutes, so local days and hours are exact
+# unions of these buckets.
+SALES_ROLLUP_BUCKET_SECONDS = 900
+
+# /api/sales/daily pagination (limit/cursor) page sizes, and the
+# sales_rollup buckets read per fetch when streaming (format=ndjson/csv)
+DAILY_PAGE_DEFAULT_LIMIT = 100
+DAILY_PAGE_MAX_LIMIT = 1000
+DAILY_STREAM_BATCH_BUCKETS = 10_000
+
+# Timezones whose local days and months are kept in sales_cube_daily and
+# sales_cube_monthly (UTC always is). /api/sales/cube answers day, week,
+# month and quarter buckets in these timezones from those cells alone;
+# elsewhere it corrects whole UTC days with the 15-minute cells at each end.
+# Each one adds a day of cells per day of data.
+SALES_CUBE_TIMEZONES = list(dict.fromkeys(
+    tz for tz in ["UTC"] + os.environ.get("SALES_CUBE_TIMEZONES", DEFAULT_TIMEZONE).split(",") if tz
+))
+
+# Upper bound on the time buckets a single /api/sales/cube call may span
+# (a leap year of hours fits; each bucket binds two query parameters)
+CUBE_MAX_PERIODS = 9000
+
+# Currency transactions.amount_reporting and the rollups' reporting_cents
+# are kept in, and the CSV of exchange rates (date,currency,rate: units of
+# REPORTING_CURRENCY per unit of currency) an ingest loads into the fx_rates
+# table when that is empty. `python fx.py` loads new rates.
+REPORTING_CURRENCY = os.environ.get("REPORTING_CURRENCY", "USD")
+FX_RATES_PATH = os.environ.get("FX_RATES_PATH", "data/fx_rates.csv")
+
+# Upper bound on the number of periods a single /api/sales/compare call
+# may request (each period adds two bound parameters to the query).
+MAX_COMPARE_PERIODS = 1000
+
+# In-process result cache for the API (see cache.py). Entries are also
+# dropped whenever a load bumps the database's data version.
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", 1024))
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+RESULT_CACHE_TTL_SECONDS = int(os.environ.get("RESULT_CACHE_TTL_SECONDS", 300))
+
+# Worker processes for utils.ingest_csv_parallel (None: one per CPU)
+INGEST_WORKERS = None
+
+# Rows per executemany call when loading transactions
+INSERT_BATCH_SIZE = 50_000
+
+# Read-only connections used by models.py (see db.py). mmap lets threads
+# and processes share database pages through the OS page cache.
+READ_POOL_MMAP_SIZE = 256 * 1024 * 1024
+READ_POOL_SHARED_CACHE = False
+READ_POOL_HEALTH_CHECK_SECONDS = 30
+
+# Async API (asgi.py): threads running queries for the short and long
+# lanes, the daily range (in days) above which a request uses the long
+# lane, and the per-request time limit.
+ASYNC_QUERY_THREADS = int(os.environ.get("ASYNC_QUERY_THREADS", 4))
+ASYNC_LONG_QUERY_THREADS = int(os.environ.get("ASYNC_LONG_QUERY_THREADS", 2))
+ASYNC_LONG_QUERY_DAYS = int(os.environ.get("ASYNC_LONG_QUERY_DAYS", 31))
+REQUEST_TIMEOUT_SECONDS = float(os.environ.get("REQUEST_TIMEOUT_SECONDS", 30))
+
+# Level for the application's loggers, set by the entry points (app.py,
+# testing.py, gunicorn.conf.py); ingest reports are logged at INFO
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+
+# Engine for the sales aggregations in models.py: "sqlite" reads the
+# sales_rollup table; "duckdb" reads a Parquet snapshot of the cleaned
+# transactions (see analytics.py; needs the duckdb package), which every
+# ingest then keeps up to date.
+ANALYTICS_BACKEND = os.environ.get("ANALYTICS_BACKEND", "sqlite")
+PARQUET_SNAPSHOT_DIR = os.environ.get("PARQUET_SNAPSHOT_DIR", "data/transactions_parquet")
@@ -1,11 +1,153 @@
 import pytz
+import numpy as np
+import pandas as pd
 from dateutil import parser
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, time
+from collections import Counter
+from functools import lru_cache
 import logging
+import re
+import string
 
-# Setup logger
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.DEBUG)
+
+# Format of processed_timestamp as stored in the transactions table
+DB_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Raw timezone values that mean "no timezone" (a blank CSV cell reads as "nan")
+MISSING_TIMEZONE_VALUES = ("", "nan", "NaN")
+
+# Known layouts from data/schema.md. Where day and month can be swapped, the
+# day-first variant is listed first: that is how parser.parse(dayfirst=True)
+# resolves them, so a template hit gives the same value as parse_timestamp.
+TIMESTAMP_FORMATS = [
+    "%Y-%d-%m %H:%M:%S",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%d-%m %H:%M:%S.%f",
+    "%Y-%m-%d %H:%M:%S.%f",
+    "%Y-%d-%mT%H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%d-%mT%H:%M:%SZ",
+    "%Y-%m-%dT%H:%M:%SZ",
+    "%Y-%d-%m",
+    "%Y-%m-%d",
+    "%d/%m/%y %I:%M %p",
+    "%m/%d/%y %I:%M %p",
+    "%d/%m/%Y %I:%M %p",
+    "%m/%d/%Y %I:%M %p",
+    "%d-%b-%Y %H:%M",
+]
+
+# Shape of a timestamp string: digits become "9" and letters "a", so every
+# value of one layout shares a shape, e.g. "9999-99-99a99:99:99a".
+_SHAPE_TABLE = str.maketrans(string.digits + string.ascii_letters, "9" * 10 + "a" * 52)
+
+_DIRECTIVE_SHAPES = {
+    "%Y": "9{4}", "%y": "9{2}", "%m": "9{1,2}", "%d": "9{1,2}", "%H": "9{1,2}",
+    "%I": "9{1,2}", "%M": "9{1,2}", "%S": "9{1,2}", "%f": "9{1,9}", "%b": "a{3}", "%p": "a{2}",
+}
+
+
+def _format_shape_pattern(fmt):
+    """Regex matching the shapes of strings that `fmt` could parse."""
+    pattern = ""
+    for token in re.split(r"(%[a-zA-Z])", fmt):
+        pattern += _DIRECTIVE_SHAPES.get(token) or re.escape(token.translate(_SHAPE_TABLE))
+    return re.compile(pattern)
+
+
+_FORMAT_SHAPE_PATTERNS = {fmt: _format_shape_pattern(fmt) for fmt in TIMESTAMP_FORMATS}
+
+# Candidate templates per shape seen so far, in TIMESTAMP_FORMATS order.
+# Shapes with no candidate go straight to dateutil.
+_SHAPE_FORMATS = {}
+_SHAPE_CACHE_SIZE = 4096
+
+# Row and cache counters for the parsing stages, see parse_cache_stats()
+_PARSE_COUNTERS = Counter()
+
+
+def _formats_for_shape(shape):
+    """Templates in TIMESTAMP_FORMATS that can match strings of `shape` (memoized)."""
+    formats = _SHAPE_FORMATS.get(shape)
+    if formats is not None:
+        _PARSE_COUNTERS["shape_hits"] += 1
+        return formats
+    _PARSE_COUNTERS["shape_misses"] += 1
+    if len(_SHAPE_FORMATS) >= _SHAPE_CACHE_SIZE:
+        _SHAPE_FORMATS.clear()
+    formats = tuple(fmt for fmt in TIMESTAMP_FORMATS if _FORMAT_SHAPE_PATTERNS[fmt].fullmatch(shape))
+    _SHAPE_FORMATS[shape] = formats
+    return formats
+
+
+@lru_cache(maxsize=4096)
+def resolve_timezone(timezone_str):
+    """
+    Map a raw timezone string to a pytz zone. Blank values resolve to UTC;
+    unknown names fall back to the first zone containing them. Returns None
+    when nothing matches.
+
+    Results are memoized, unresolvable strings included, so the fuzzy scan
+    over pytz.all_timezones runs once per distinct string.
+    """
+    if not timezone_str or timezone_str.strip() == "":
+        return pytz.UTC
+    try:
+        return pytz.timezone(timezone_str)
+    except Exception:
+        # Try forgiving match
+        _PARSE_COUNTERS["timezone_fuzzy_scans"] += 1
+        possible = [z for z in pytz.all_timezones if timezone_str.lower() in z.lower()]
+        if possible:
+            return pytz.timezone(possible[0])
+        return None
+
+
+@lru_cache(maxsize=4096)
+def is_fuzzy_timezone(timezone_str):
+    """
+    True when resolve_timezone only finds timezone_str as part of a zone
+    name. Missing timezones (MISSING_TIMEZONE_VALUES) never count, even
+    though "nan" is found inside a zone name.
+    """
+    if not timezone_str or timezone_str.strip() in MISSING_TIMEZONE_VALUES:
+        return False
+    try:
+        pytz.timezone(timezone_str)
+        return False
+    except Exception:
+        return resolve_timezone(timezone_str) is not None
+
+
+def parse_cache_stats():
+    """
+    Hit/miss counts of the timezone, shape and dateutil caches, plus how
+    many rows each parsing stage handled since the last reset.
+    """
+    timezone_info = resolve_timezone.cache_info()
+    dateutil_info = _parse_with_dateutil.cache_info()
+    return {
+        "timezone": {"hits": timezone_info.hits, "misses": timezone_info.misses,
+                     "fuzzy_scans": _PARSE_COUNTERS["timezone_fuzzy_scans"],
+                     "size": timezone_info.currsize},
+        "shape": {"hits": _PARSE_COUNTERS["shape_hits"], "misses": _PARSE_COUNTERS["shape_misses"],
+                  "size": len(_SHAPE_FORMATS)},
+        "dateutil": {"hits": dateutil_info.hits, "misses": dateutil_info.misses,
+                     "size": dateutil_info.currsize},
+        "rows": {"template": _PARSE_COUNTERS["template_rows"], "dateutil": _PARSE_COUNTERS["dateutil_rows"],
+                 "unparsed": _PARSE_COUNTERS["unparsed_rows"],
+                 "localize_fallback": _PARSE_COUNTERS["localize_fallback_rows"]},
+    }
+
+
+def reset_parse_caches():
+    """Empty the parsing caches and zero their counters."""
+    resolve_timezone.cache_clear()
+    is_fuzzy_timezone.cache_clear()
+    _parse_with_dateutil.cache_clear()
+    _SHAPE_FORMATS.clear()
+    _PARSE_COUNTERS.clear()
 
 def parse_timestamp(timestamp_str, timezone_str):
     try:
@@ -13,25 +155,14 @@ def parse_timestamp(timestamp_str, timezone_str):
             return None
 
         # Try parsing timestamp (handle ambiguous formats like UK)
-        try:
-            dt = parser.parse(timestamp_str, dayfirst=True)
-        except Exception:
-            dt = parser.parse(timestamp_str)  # fallback if dayfirst fails
+        dt = _parse_with_dateutil(timestamp_str)
+        if dt is None:
+            return None
 
         # Handle timezone fallback if needed
-        tz = None
-        if not timezone_str or timezone_str.strip() == "":
-            tz = pytz.UTC
-        else:
-            try:
-                tz = pytz.timezone(timezone_str)
-            except Exception:
-                # Try forgiving match
-                possible = [z for z in pytz.all_timezones if timezone_str.lower() in z.lower()]
-                if possible:
-                    tz = pytz.timezone(possible[0])
-                else:
-                    return None  # unresolvable
+        tz = resolve_timezone(timezone_str)
+        if tz is None:
+            return None  # unresolvable
 
         # If timestamp is naive, localize it
         if dt.tzinfo is None:
@@ -39,12 +170,12 @@ def parse_timestamp(timestamp_str, timezone_str):
                 localized = tz.localize(dt, is_dst=True)
             except pytz.NonExistentTimeError:
                 # Spring forward: shift by 1 hour
-                logger.warning(f"Spring forward ambiguity: {timestamp_str} — jumping forward 1 hour")
+                logger.warning("Spring forward ambiguity: %s — jumping forward 1 hour", timestamp_str)
                 dt += timedelta(hours=1)
                 localized = tz.localize(dt, is_dst=True)
             except pytz.AmbiguousTimeError:
                 # Fall back: assume DST is still on
-                logger.warning(f"Fall back ambiguity: {timestamp_str} — using first occurrence")
+                logger.warning("Fall back ambiguity: %s — using first occurrence", timestamp_str)
                 localized = tz.localize(dt, is_dst=True)
         else:
             localized = dt.astimezone(tz)
@@ -52,19 +183,211 @@ def parse_timestamp(timestamp_str, timezone_str):
         return localized.astimezone(pytz.UTC)
 
     except Exception as e:
-        logger.warning(f"⚠️ Failed to parse timestamp '{timestamp_str}' with timezone '{timezone_str}': {e}")
+        logger.warning("⚠️ Failed to parse timestamp '%s' with timezone '%s': %s", timestamp_str, timezone_str, e)
         return None
 
 
+def _dateutil_year(two_digit_year):
+    """Century dateutil assigns to a two-digit year (within 50 years of now)."""
+    this_year = datetime.now().year
+    year = two_digit_year + this_year // 100 * 100
+    return np.where(year >= this_year + 50, year - 100,
+                    np.where(year < this_year - 50, year + 100, year))
+
+
+@lru_cache(maxsize=65536)
+def _parse_with_dateutil(timestamp_str):
+    """parser.parse, day-first when possible; None if unparseable (memoized)."""
+    try:
+        try:
+            return parser.parse(timestamp_str, dayfirst=True)
+        except Exception:
+            return parser.parse(timestamp_str)
+    except Exception as e:
+        logger.warning("⚠️ Failed to parse timestamp '%s': %s", timestamp_str, e)
+        return None
+
+
+def parse_timestamps(timestamps, timezones, return_issues=False):
+    """
+    Vectorized parse_timestamp over two aligned Series of stripped strings.
+
+    Each layout in TIMESTAMP_FORMATS is tried with one pd.to_datetime pass
+    over the rows still unparsed; only strings no layout matches go through
+    dateutil, once per distinct value. Naive values are then localized in
+    bulk per timezone, with ambiguous and nonexistent local times resolved
+    row by row exactly as parse_timestamp does.
+
+    Returns a datetime64[ns, UTC] Series with NaT wherever parse_timestamp
+    would return None. With return_issues=True, also returns boolean arrays
+    marking the rows with an ambiguous or nonexistent local time and those
+    whose timezone was only matched fuzzily:
+    {"ambiguous_dst": ..., "nonexistent_dst": ..., "fuzzy_timezone_match": ...}.
+    """
+    values = timestamps.to_numpy(dtype=object)
+    n = len(values)
+    naive = np.full(n, np.datetime64("NaT"), dtype="datetime64[ns]")
+    instant = naive.copy()  # values that already carry a UTC offset
+    strings = pd.Series(values)
+    shape_codes, shapes = pd.factorize(strings.str.translate(_SHAPE_TABLE))
+    pending = np.ones(n, dtype=bool)
+    # Years outside the datetime64[ns] range would silently overflow in the
+    # template passes; leave them to dateutil, which rejects them below.
+    in_range = np.ones(n, dtype=bool)
+
+    for code, positions in pd.Series(np.arange(n)).groupby(shape_codes).indices.items():
+        shape = shapes[code]
+        if shape in ("", "aaa", "aaaa"):
+            pending[positions] = ~strings.iloc[positions].str.lower().isin(["", "nan", "none"]).to_numpy()
+        year_at = shape.find("9999")
+        if year_at >= 0:
+            years = strings.iloc[positions].str.slice(year_at, year_at + 4).astype(int)
+            in_range[positions] = years.between(1678, 2261).to_numpy()
+
+    shape_formats = [_formats_for_shape(shape) for shape in shapes]
+    for fmt in TIMESTAMP_FORMATS:
+        fits = [code for code, formats in enumerate(shape_formats) if fmt in formats]
+        positions = np.flatnonzero(pending & in_range & np.isin(shape_codes, fits))
+        if not len(positions):
+            continue
+        parsed = pd.to_datetime(pd.Series(values[positions]), format=fmt, errors="coerce")
+        hit = parsed.notna().to_numpy()
+        if "%y" in fmt:
+            years = parsed.dt.year.fillna(0).astype(int).to_numpy()
+            hit &= years == _dateutil_year(years % 100)
+        if "%f" in fmt:
+            # dateutil keeps microseconds only
+            hit &= (parsed.dt.nanosecond.fillna(0) == 0).to_numpy()
+        target = instant if fmt.endswith("Z") else naive
+        target[positions[hit]] = parsed.to_numpy()[hit]
+        pending[positions[hit]] = False
+        _PARSE_COUNTERS["template_rows"] += int(hit.sum())
+
+    # Leftover layouts go through dateutil
+    leftovers = np.flatnonzero(pending)
+    _PARSE_COUNTERS["dateutil_rows"] += len(leftovers)
+    fallback = {value: _parse_with_dateutil(value) for value in pd.unique(values[leftovers])}
+    for position in leftovers:
+        dt = fallback[values[position]]
+        if dt is None:
+            _PARSE_COUNTERS["unparsed_rows"] += 1
+            continue
+        try:
+            ts = pd.Timestamp(dt).as_unit("ns")
+            if dt.tzinfo is None:
+                naive[position] = ts.to_datetime64()
+            else:
+                instant[position] = ts.tz_convert("UTC").tz_localize(None).to_datetime64()
+        except (OverflowError, ValueError) as e:
+            logger.warning("⚠️ Timestamp out of range '%s': %s", values[position], e)
+
+    # Localize per timezone group
+    result = np.full(n, np.datetime64("NaT"), dtype="datetime64[ns]")
+    issues = {name: np.zeros(n, dtype=bool) for name in ("ambiguous_dst", "nonexistent_dst", "fuzzy_timezone_match")}
+    codes, zones = pd.factorize(timezones.to_numpy(dtype=object))
+    groups = pd.Series(np.arange(n)).groupby(codes).indices
+    for code, positions in groups.items():
+        zone = zones[code] if code >= 0 else None
+        try:
+            tz = resolve_timezone(zone)
+        except Exception:
+            tz = None
+        if tz is None:
+            continue  # unresolvable
+        issues["fuzzy_timezone_match"][positions] = is_fuzzy_timezone(zone)
+
+        result[positions] = instant[positions]
+        local = positions[~np.isnat(naive[positions])]
+        localized = (
+            pd.DatetimeIndex(naive[local])
+            .tz_localize(tz, ambiguous="NaT", nonexistent="NaT")
+            .tz_convert("UTC")
+            .tz_localize(None)
+            .to_numpy()
+        )
+        result[local] = localized
+        unresolved = local[np.isnat(localized)]
+        _PARSE_COUNTERS["localize_fallback_rows"] += len(unresolved)
+        if len(unresolved):
+            # Times that still fail once skipped-over times are shifted are the ambiguous ones
+            ambiguous = pd.DatetimeIndex(naive[unresolved]).tz_localize(
+                tz, ambiguous="NaT", nonexistent="shift_forward").isna()
+            issues["ambiguous_dst"][unresolved[ambiguous]] = True
+            issues["nonexistent_dst"][unresolved[~ambiguous]] = True
+        for position in unresolved:
+            dt = pd.Timestamp(naive[position]).to_pydatetime()
+            utc_dt = tz.localize(dt, is_dst=True).astimezone(pytz.UTC)
+            result[position] = pd.Timestamp(utc_dt).tz_localize(None).to_datetime64()
+
+    parsed = pd.Series(result, index=timestamps.index).dt.tz_localize("UTC")
+    if return_issues:
+        return parsed, issues
+    return parsed
+
+
 def convert_utc_to_timezone(utc_dt, tz_str):
     try:
         tz = pytz.timezone(tz_str)
         local_dt = utc_dt.astimezone(tz)
         return local_dt.strftime("%Y-%m-%d %H:%M:%S")
     except Exception as e:
-        logger.warning(f"Timezone conversion error: {e}")
+        logger.warning("Timezone conversion error: %s", e)
         return utc_dt.strftime("%Y-%m-%d %H:%M:%S")
 
+def local_date_range_to_utc(start_date, end_date, timezone_str):
+    """
+    Return the UTC [start, end) strings covering the local dates
+    start_date..end_date (inclusive) in timezone_str.
+
+    Bounds are padded outward when local midnight is ambiguous or
+    nonexistent, so callers should still filter on the local date.
+    """
+    tz = pytz.timezone(timezone_str)
+    start = tz.localize(datetime.combine(start_date, time.min), is_dst=True)
+    end = tz.localize(datetime.combine(end_date + timedelta(days=1), time.min), is_dst=False)
+    return (
+        start.astimezone(pytz.UTC).strftime(DB_TIMESTAMP_FORMAT),
+        end.astimezone(pytz.UTC).strftime(DB_TIMESTAMP_FORMAT),
+    )
+
+def local_midnight_to_utc(day, timezone_str):
+    """
+    Return the UTC string for the first instant of local date `day` in
+    timezone_str. An ambiguous midnight resolves to its first occurrence and
+    a nonexistent one to the moment the clocks jump, so consecutive days
+    tile the timeline exactly.
+    """
+    local = pd.Timestamp(day).tz_localize(timezone_str, ambiguous=True, nonexistent="shift_forward")
+    return local.tz_convert("UTC").strftime(DB_TIMESTAMP_FORMAT)
+
+
+PERIOD_GRANULARITIES = ("day", "week", "month", "quarter")
+
+
+def parse_period(period_str, granularity="month"):
+    """
+    Return the first and last date of a calendar period:
+    day "YYYY-MM-DD", week "YYYY-Www" (ISO), month "YYYY-MM", quarter "YYYY-Qn".
+    Raises ValueError for anything else.
+    """
+    if granularity == "day":
+        start = datetime.strptime(period_str, "%Y-%m-%d").date()
+        return start, start
+    if granularity == "week":
+        start = datetime.strptime(period_str + "-1", "%G-W%V-%u").date()
+        return start, start + timedelta(days=6)
+    if granularity == "month":
+        year, month = map(int, period_str.split("-"))
+        start = datetime(year, month, 1).date()
+        return start, (pd.Timestamp(start) + pd.offsets.MonthEnd(0)).date()
+    if granularity == "quarter":
+        year, quarter = period_str.split("-Q")
+        if quarter not in ("1", "2", "3", "4"):
+            raise ValueError(f"Invalid quarter: {period_str}")
+        start = datetime(int(year), 3 * int(quarter) - 2, 1).date()
+        return start, (pd.Timestamp(start) + pd.offsets.QuarterEnd(0)).date()
+    raise ValueError(f"Unknown granularity: {granularity}")
+
 def is_valid_datetime(timestamp_str):
     try:
         parser.parse(timestamp_str)
@@ -0,0 +1,136 @@
+"""
+Read-only SQLite connections for the query layer.
+
+Each thread keeps one connection per database path, opened read-only
+(mode=ro, query_only) with memory-mapped I/O, so the schema and page cache
+survive across requests. A connection is reopened when the file at its
+path is replaced (e.g. an ingest swapped in a new database) or when it
+fails a periodic health check.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ReadConnectionPool:
+    """
+    Per-thread read-only connections keyed by database path. With
+    pooled=False every connection() call opens and closes its own
+    connection, as the query layer used to.
+    """
+
+    def __init__(self, mmap_size=0, shared_cache=False, health_check_seconds=30, pooled=True):
+        self.mmap_size = mmap_size
+        self.shared_cache = shared_cache
+        self.health_check_seconds = health_check_seconds
+        self.pooled = pooled
+        self._local = threading.local()
+        self._all = []  # every pooled connection, for close_all()
+        self._by_thread = {}  # thread ident -> that thread's {path: entry}, for interrupt()
+        self._lock = threading.Lock()
+        self._stats = {"opened": 0, "reused": 0, "reopened_after_swap": 0, "failed_health_checks": 0}
+
+    @contextmanager
+    def connection(self, db_path):
+        if not self.pooled:
+            conn = self._open(db_path)
+            try:
+                yield conn
+            finally:
+                conn.close()
+            return
+        yield self._acquire(db_path)
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "open": len(self._all)}
+
+    def close_all(self):
+        """Close every pooled connection, in any thread."""
+        with self._lock:
+            conns, self._all = self._all, []
+            self._by_thread = {}
+        for conn in conns:
+            conn.close()
+        self._local = threading.local()
+
+    def interrupt(self, thread_id):
+        """Abort the statement running on thread_id's pooled connections, if any."""
+        with self._lock:
+            entries = list(self._by_thread.get(thread_id, {}).values())
+        for conn, _, _ in entries:
+            conn.interrupt()
+
+    def _acquire(self, db_path):
+        conns = getattr(self._local, "conns", None)
+        if conns is None:
+            conns = self._local.conns = {}
+            with self._lock:
+                self._by_thread[threading.get_ident()] = conns
+
+        entry = conns.get(db_path)
+        file_id = _file_id(db_path)
+        if entry is not None:
+            conn, opened_id, checked_at = entry
+            now = time.monotonic()
+            if opened_id != file_id:
+                self._count("reopened_after_swap")
+            elif now - checked_at < self.health_check_seconds:
+                self._count("reused")
+                return conn
+            elif self._healthy(conn):
+                conns[db_path] = (conn, opened_id, now)
+                self._count("reused")
+                return conn
+            else:
+                self._count("failed_health_checks")
+            self._discard(conn)
+
+        conn = self._open(db_path)
+        conns[db_path] = (conn, file_id, time.monotonic())
+        with self._lock:
+            self._all.append(conn)
+        return conn
+
+    def _open(self, db_path):
+        uri = f"file:{os.path.abspath(db_path)}?mode=ro"
+        if self.shared_cache:
+            uri += "&cache=shared"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute("PRAGMA query_only = 1")
+        if self.mmap_size:
+            conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        self._count("opened")
+        return conn
+
+    def _healthy(self, conn):
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def _discard(self, conn):
+        with self._lock:
+            if conn in self._all:
+                self._all.remove(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+
+def _file_id(db_path):
+    """Identity of the file currently at db_path; changes when it is replaced."""
+    try:
+        stat = os.stat(db_path)
+    except OSError:
+        return None
+    return stat.st_dev, stat.st_ino
@@ -0,0 +1,235 @@
+"""
+Exchange rates for reporting sales in one currency.
+
+The fx_rates table holds one rate per (date, currency): units of
+REPORTING_CURRENCY per unit of that currency, loaded from a CSV file with
+date,currency,rate columns. A rate applies from its date until the next
+one for the same currency; dates before a currency's first rate use that
+first rate.
+
+Ingest stores each transaction's amount converted at the rate of its UTC
+date (transactions.amount_reporting), and the rollups sum it as
+reporting_cents. A sales query for another currency converts the
+reporting totals of each UTC day at that day's rate.
+
+The metadata table records the reporting currency those amounts are in.
+Ingest and sales queries refuse a database whose currency differs from
+REPORTING_CURRENCY until its amounts are reconverted with rates in it:
+
+    python fx.py data/fx_rates.csv   # load new rates and reconvert stored amounts
+"""
+
+import argparse
+import logging
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+from config import DATABASE_PATH, FX_RATES_PATH, REPORTING_CURRENCY
+
+logger = logging.getLogger(__name__)
+
+DAY_SECONDS = 86400
+
+# The currency= value that sums amounts as stored, whatever their currencies
+RAW_CURRENCY = "raw"
+
+
+# metadata key of the reporting currency of the stored amounts
+REPORTING_CURRENCY_KEY = "reporting_currency"
+
+
+class UnknownCurrency(ValueError):
+    """A currency with no rate in fx_rates (and not the reporting currency)."""
+
+
+class ReportingCurrencyMismatch(RuntimeError):
+    """Stored amounts are in another reporting currency than REPORTING_CURRENCY."""
+
+    def __init__(self, stored, configured=REPORTING_CURRENCY):
+        super().__init__(f"Stored amounts are in {stored} but REPORTING_CURRENCY is {configured}; "
+                         f"run `python fx.py <rates in {configured}>` to reconvert them")
+        self.stored = stored
+        self.configured = configured
+
+
+class FxTable:
+    """
+    Rates as a dense (UTC day x currency) matrix, filled forward and back
+    from the given rates, so converting any number of amounts is one fancy
+    index lookup.
+    """
+
+    def __init__(self, rates, reporting_currency=REPORTING_CURRENCY):
+        """rates: DataFrame with rate_date (YYYY-MM-DD), currency and rate columns."""
+        self.reporting_currency = reporting_currency
+        rates = rates[rates["currency"] != reporting_currency]
+        days = pd.to_datetime(rates["rate_date"]).to_numpy().astype("datetime64[D]").astype("int64")
+        first = int(days.min()) if len(days) else 0
+        last = int(days.max()) if len(days) else 0
+        matrix = pd.DataFrame({"day": days - first, "currency": rates["currency"].to_numpy(),
+                               "rate": rates["rate"].to_numpy(dtype=float)})
+        matrix = matrix.pivot_table(index="day", columns="currency", values="rate", aggfunc="last")
+        matrix = matrix.reindex(range(last - first + 1)).ffill().bfill()
+        matrix[reporting_currency] = 1.0
+        self.first_day = first
+        self.currencies = matrix.columns
+        self._matrix = matrix.to_numpy()
+
+    @classmethod
+    def from_db(cls, conn, reporting_currency=REPORTING_CURRENCY):
+        rates = pd.read_sql_query("SELECT rate_date, currency, rate FROM fx_rates", conn)
+        return cls(rates, reporting_currency)
+
+    def __contains__(self, currency):
+        return currency in self.currencies
+
+    def _day_rows(self, days):
+        return np.clip(np.asarray(days, dtype="int64") - self.first_day, 0, len(self._matrix) - 1)
+
+    def rates(self, currencies, days):
+        """Reporting-currency units per unit of each currency on each UTC day number; NaN if unknown."""
+        columns = self.currencies.get_indexer(np.asarray(currencies, dtype=object))
+        rates = self._matrix[self._day_rows(days), np.maximum(columns, 0)]
+        return np.where(columns >= 0, rates, np.nan)
+
+    def to_reporting(self, amounts, currencies, epochs):
+        """amounts in their own currencies, at UTC epoch seconds `epochs` (NaN: no date), in the reporting currency."""
+        epochs = np.asarray(epochs, dtype=float)
+        days = np.where(np.isnan(epochs), 0, epochs // DAY_SECONDS)
+        converted = np.asarray(amounts, dtype=float) * self.rates(currencies, days)
+        return np.where(np.isnan(epochs), np.nan, converted)
+
+    def factors(self, currency, days):
+        """Multipliers turning reporting-currency amounts on each UTC day number into `currency`."""
+        if currency not in self:
+            raise UnknownCurrency(currency)
+        column = self.currencies.get_loc(currency)
+        return 1.0 / self._matrix[self._day_rows(days), column]
+
+
+def normalize_currency(value):
+    """The currency for a currency= request value: REPORTING_CURRENCY when blank, RAW_CURRENCY, or an upper-cased code."""
+    value = (value or "").strip()
+    if value.lower() == RAW_CURRENCY:
+        return RAW_CURRENCY
+    return value.upper() or REPORTING_CURRENCY
+
+
+def read_fx_rates(path):
+    """Rates from a date,currency,rate CSV file, validated."""
+    rates = pd.read_csv(path, dtype={"date": str, "currency": str, "rate": float})
+    rates = rates.rename(columns={"date": "rate_date"})
+    rates["rate_date"] = pd.to_datetime(rates["rate_date"], format="%Y-%m-%d").dt.strftime("%Y-%m-%d")
+    rates["currency"] = rates["currency"].str.strip().str.upper()
+    if rates["rate"].isna().any() or (rates["rate"] <= 0).any():
+        raise ValueError(f"{path}: every rate must be a positive number")
+    return rates[["rate_date", "currency", "rate"]]
+
+
+def load_fx_rates(conn, path=FX_RATES_PATH):
+    """Replace the fx_rates table with the rates in `path`, inside the caller's transaction."""
+    rates = read_fx_rates(path)
+    conn.execute("DELETE FROM fx_rates")
+    conn.executemany("INSERT OR REPLACE INTO fx_rates (rate_date, currency, rate) VALUES (?, ?, ?)",
+                     rates.itertuples(index=False, name=None))
+    logger.info("Loaded %d FX rates for %d currencies from %s", len(rates), rates["currency"].nunique(), path)
+    return len(rates)
+
+
+def stored_reporting_currency(conn):
+    """The reporting currency recorded for the amounts stored on `conn`, None when not recorded."""
+    row = conn.execute("SELECT value FROM metadata WHERE key = ?", (REPORTING_CURRENCY_KEY,)).fetchone()
+    return row[0] if row else None
+
+
+def record_reporting_currency(conn, currency=REPORTING_CURRENCY):
+    """Record `currency` as the reporting currency of the stored amounts, inside the caller's transaction."""
+    conn.execute("INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)", (REPORTING_CURRENCY_KEY, currency))
+
+
+def check_reporting_currency(conn):
+    """Raise ReportingCurrencyMismatch unless the stored amounts are in REPORTING_CURRENCY (or unrecorded)."""
+    stored = stored_reporting_currency(conn)
+    if stored is not None and stored != REPORTING_CURRENCY:
+        raise ReportingCurrencyMismatch(stored)
+
+
+def ingest_fx_table(conn):
+    """
+    The FxTable for an ingest on `conn`. An empty fx_rates table is first
+    filled from FX_RATES_PATH when that file exists. Raises
+    ReportingCurrencyMismatch when the stored amounts are in another
+    reporting currency; a database without one recorded (from before it
+    was) is taken to be in REPORTING_CURRENCY.
+    """
+    check_reporting_currency(conn)
+    record_reporting_currency(conn)
+    if conn.execute("SELECT 1 FROM fx_rates LIMIT 1").fetchone() is None:
+        try:
+            load_fx_rates(conn)
+        except FileNotFoundError:
+            logger.warning("No FX rates loaded and no %s; only %s amounts are converted",
+                           FX_RATES_PATH, REPORTING_CURRENCY)
+    return FxTable.from_db(conn)
+
+
+_cached = (None, None)  # (key, FxTable)
+_cached_lock = threading.Lock()
+
+
+def cached_fx_table(conn, key):
+    """
+    The FxTable of `conn`, rebuilt only when `key` (e.g. the data version)
+    changes. Raises ReportingCurrencyMismatch as check_reporting_currency.
+    """
+    global _cached
+    with _cached_lock:
+        if _cached[0] == key:
+            return _cached[1]
+    check_reporting_currency(conn)
+    table = FxTable.from_db(conn)
+    with _cached_lock:
+        _cached = (key, table)
+    return table
+
+
+def reconvert_amounts(conn, fx=None):
+    """
+    Recompute amount_reporting for every transaction and record fx's
+    reporting currency as theirs; returns the rows without a rate.
+    """
+    fx = fx or FxTable.from_db(conn)
+    record_reporting_currency(conn, fx.reporting_currency)
+    df = pd.read_sql_query("SELECT id, amount, currency, processed_epoch FROM transactions", conn)
+    reporting = fx.to_reporting(df["amount"], df["currency"], df["processed_epoch"].astype(float))
+    conn.executemany("UPDATE transactions SET amount_reporting = ? WHERE id = ?",
+                     zip(pd.Series(reporting).astype(object).where(~np.isnan(reporting), None), df["id"].tolist()))
+    return int(np.count_nonzero(np.isnan(reporting) & df["processed_epoch"].notna().to_numpy()))
+
+
+def main():
+    from utils import bump_data_version, refresh_parquet_snapshot, refresh_sales_rollup
+
+    parser = argparse.ArgumentParser(description="Load FX rates and reconvert stored amounts")
+    parser.add_argument("path", nargs="?", default=FX_RATES_PATH, help="CSV file with date,currency,rate columns")
+    parser.add_argument("--database", default=DATABASE_PATH)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    conn = sqlite3.connect(args.database)
+    with conn:
+        load_fx_rates(conn, args.path)
+        missing = reconvert_amounts(conn)
+        refresh_sales_rollup(conn)
+        bump_data_version(conn)
+    refresh_parquet_snapshot(conn)
+    conn.close()
+    if missing:
+        logger.warning("%d transactions have no rate for their currency", missing)
+
+
+if __name__ == "__main__":
+    main()
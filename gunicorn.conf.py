@@ -0,0 +1,47 @@
+"""
+Gunicorn settings for serving app:create_app(), read from the environment:
+
+    gunicorn -c gunicorn.conf.py "app:create_app()"
+
+WEB_CONCURRENCY      worker processes (default: 2 * CPUs + 1)
+GUNICORN_THREADS     threads per worker; >1 selects the gthread worker (default: 1)
+GUNICORN_WORKER_CLASS override the worker class (uvicorn.workers.UvicornWorker for "asgi:create_app()")
+GUNICORN_TIMEOUT     seconds before a silent worker is killed and replaced (default: 30)
+GUNICORN_MAX_REQUESTS recycle a worker after this many requests, 0 to disable (default: 1000)
+GUNICORN_ACCESS_LOG  access log file, "-" for stdout, empty to disable (default: -)
+LOG_LEVEL            level for gunicorn's and the app's loggers (default: info)
+HOST / PORT          bind address (default: 0.0.0.0:5000 under gunicorn)
+"""
+
+import logging
+import multiprocessing
+import os
+
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', '5000')}"
+
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", 1))
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread" if threads > 1 else "sync")
+
+# Import the app (and pandas/pytz with it) once in the master so workers
+# fork with the modules already loaded and share their pages.
+preload_app = True
+
+# Recycle workers gradually so caches and heap growth stay bounded; the
+# jitter keeps them from all restarting at once.
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter = max(max_requests // 10, 1) if max_requests else 0
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+
+accesslog = os.environ.get("GUNICORN_ACCESS_LOG", "-") or None
+loglevel = os.environ.get("LOG_LEVEL", "info")
+logging.basicConfig(level=loglevel.upper())
+
+
+def post_fork(server, worker):
+    # Connections must not cross a fork; start each worker with an empty pool
+    import models
+    models.read_pool.close_all()
@@ -0,0 +1,255 @@
+"""
+Process-local counters and latency histograms for the ingest pipeline and
+the query layer, rendered in the Prometheus text format by /metrics.
+
+Ingest stages are timed with ingest_stage(), which also adds the time to
+the report of the ingest running on the current thread (ingest_report()).
+Query phases are timed with query_phase(). Every process keeps its own
+registry, so under gunicorn a scrape sees the worker that answered it.
+"""
+
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "ecommerce_"
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# name -> (type, help) for every metric the registry may hold
+METRICS = {
+    "ingests_total": ("counter", "Ingest runs, by mode and outcome"),
+    "ingest_seconds": ("histogram", "Wall time of whole ingest runs"),
+    "ingest_stage_seconds": ("histogram", "Time spent in each ingest stage"),
+    "ingest_rows_total": ("counter", "Rows read, inserted, updated or flagged by ingests"),
+    "query_phase_seconds": ("histogram", "Time spent in each phase of a query function"),
+    "http_requests_total": ("counter", "API requests, by endpoint and status code"),
+    "http_request_seconds": ("histogram", "API request latency, by endpoint"),
+    "result_cache_events_total": ("counter", "Result cache hits, misses, evictions, expirations and invalidations"),
+    "result_cache_entries": ("gauge", "Entries held by the result cache"),
+    "result_cache_bytes": ("gauge", "Approximate JSON size of the cached results"),
+    "read_pool_events_total": ("counter", "Read connections opened, reused and reopened"),
+    "read_pool_open_connections": ("gauge", "Pooled read connections currently open"),
+}
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """
+    Counters and histograms keyed by metric name and label values, plus
+    collectors: callables returning (name, labels, value) samples that are
+    read at render time (e.g. ResultCache.stats()).
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = defaultdict(float)  # (name, label key) -> value
+        self._histograms = {}  # (name, label key) -> [per-bucket counts..., +Inf count, sum]
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        with self._lock:
+            self._counters[name, _label_key(labels)] += value
+
+    def observe(self, name, seconds, **labels):
+        index = bisect_left(self.buckets, seconds)
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            histogram[index] += 1
+            histogram[-1] += seconds
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def value(self, name, **labels):
+        """A counter's value, or a histogram's (count, sum); None if never recorded."""
+        key = (name, _label_key(labels))
+        with self._lock:
+            if key in self._histograms:
+                histogram = self._histograms[key]
+                return sum(histogram[:-1]), histogram[-1]
+            return self._counters.get(key)
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        samples = defaultdict(list)  # name -> [(label pairs, value)]
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                samples[name].append((labels, value))
+            histograms = [(name, labels, list(counts)) for (name, labels), counts in self._histograms.items()]
+        for collector in self._collectors:
+            for name, labels, value in collector():
+                samples[name].append((_label_key(labels), value))
+
+        lines = []
+        for name in sorted(set(samples) | {name for name, _, _ in histograms}):
+            kind, help_text = METRICS.get(name, ("untyped", ""))
+            lines.append(f"# HELP {PREFIX}{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+            for labels, value in sorted(samples.get(name, ())):
+                lines.append(f"{PREFIX}{name}{_format_labels(labels)} {_format_value(value)}")
+            for _, labels, counts in sorted(h for h in histograms if h[0] == name):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    bucket_labels = labels + (("le", _format_value(float(bound))),)
+                    lines.append(f"{PREFIX}{name}_bucket{_format_labels(bucket_labels)} {cumulative}")
+                lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {_format_value(counts[-1])}")
+                lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+@contextmanager
+def timer(name, **labels):
+    """Observe the time spent in the block in histogram `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe(name, time.perf_counter() - start, **labels)
+
+
+def query_phase(query, phase):
+    """Time one phase (fetch, to_datetime, tz_convert, groupby, serialize) of a query function."""
+    return timer("query_phase_seconds", query=query, phase=phase)
+
+
+class IngestReport:
+    """Stage timings and row counts of one ingest run."""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.started_at = time.time()
+        self.seconds = None
+        self.status = "running"
+        self.stages = defaultdict(float)  # stage -> seconds
+        self.rows = defaultdict(int)  # kind -> rows
+
+    def as_dict(self):
+        return {
+            "mode": self.mode,
+            "status": self.status,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.started_at)),
+            "seconds": round(self.seconds, 6) if self.seconds is not None else None,
+            "stages": {stage: round(seconds, 6) for stage, seconds in self.stages.items()},
+            "rows": dict(self.rows),
+        }
+
+
+_local = threading.local()
+_last_report = None
+
+
+def current_ingest_report():
+    """The report of the ingest running on this thread, or None."""
+    return getattr(_local, "report", None)
+
+
+def last_ingest_report():
+    """The report of the most recently finished ingest in this process, or None."""
+    return _last_report
+
+
+@contextmanager
+def ingest_report(mode):
+    """
+    Collect an IngestReport for the ingest run in the block; an ingest
+    function called inside another one adds to the outer report. The
+    finished report is logged as JSON at INFO.
+    """
+    report = current_ingest_report()
+    if report is not None:
+        yield report
+        return
+
+    global _last_report
+    report = _local.report = IngestReport(mode)
+    start = time.perf_counter()
+    try:
+        yield report
+        report.status = "ok"
+    except BaseException:
+        report.status = "failed"
+        raise
+    finally:
+        _local.report = None
+        report.seconds = time.perf_counter() - start
+        _last_report = report
+        registry.inc("ingests_total", mode=mode, status=report.status)
+        registry.observe("ingest_seconds", report.seconds, mode=mode)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Ingest report: %s", json.dumps(report.as_dict()))
+
+
+@contextmanager
+def ingest_stage(stage):
+    """Time an ingest stage, in the registry and in the current ingest report."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        registry.observe("ingest_stage_seconds", seconds, stage=stage)
+        report = current_ingest_report()
+        if report is not None:
+            report.stages[stage] += seconds
+
+
+def count_rows(kind, rows):
+    """Add `rows` of `kind` (read, inserted, updated, ...) to the counters and the current report."""
+    if not rows:
+        return
+    registry.inc("ingest_rows_total", rows, kind=kind)
+    report = current_ingest_report()
+    if report is not None:
+        report.rows[kind] += rows
+
+
+def timed_chunks(chunks, stage="load"):
+    """Yield from an iterator of DataFrames, timing each next() as `stage` and counting its rows."""
+    chunks = iter(chunks)
+    while True:
+        with ingest_stage(stage):
+            chunk = next(chunks, None)
+        if chunk is None:
+            return
+        count_rows("read", len(chunk))
+        yield chunk
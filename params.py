@@ -0,0 +1,45 @@
+"""
+Query-parameter parsing shared by the Flask (app.py) and FastAPI (asgi.py)
+APIs. `args` is either framework's query-parameter mapping; both have
+.get(name, default).
+"""
+
+from config import DAILY_PAGE_MAX_LIMIT
+from fx import normalize_currency
+
+# Error message for a period that does not parse at its granularity
+PERIOD_FORMATS = {
+    "day": "periods must be in YYYY-MM-DD format",
+    "week": "periods must be in YYYY-Www format",
+    "month": "period1 and period2 must be in YYYY-MM format",
+    "quarter": "periods must be in YYYY-Qn format",
+}
+
+# /api/sales/cube filter parameter -> cube dimension
+CUBE_FILTER_PARAMS = {"categories": "category", "statuses": "status", "currencies": "currency"}
+
+LIMIT_MESSAGE = f"limit must be an integer from 1 to {DAILY_PAGE_MAX_LIMIT}"
+
+
+def csv_param(args, name):
+    """A comma-separated parameter as a list, without empty items."""
+    return [value for value in args.get(name, "").split(",") if value]
+
+
+def cube_filters(args):
+    """The cube dimension -> allowed values filters given by CUBE_FILTER_PARAMS."""
+    return {dim: csv_param(args, param) for param, dim in CUBE_FILTER_PARAMS.items() if csv_param(args, param)}
+
+
+def currency_param(args):
+    """The currency= parameter (totals in that currency), REPORTING_CURRENCY when absent."""
+    return normalize_currency(args.get("currency"))
+
+
+def page_limit(value):
+    """The limit= parameter as an int, None when absent; ValueError (LIMIT_MESSAGE) when out of range."""
+    if value is None:
+        return None
+    if not value.isdigit() or not 1 <= int(value) <= DAILY_PAGE_MAX_LIMIT:
+        raise ValueError(LIMIT_MESSAGE)
+    return int(value)
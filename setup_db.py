@@ -8,6 +8,53 @@ from datetime import datetime, timedelta
 import random
 import json
 
+# Secondary indexes on transactions, by name. Bulk loads drop and rebuild them.
+SECONDARY_INDEXES = {
+    'idx_processed_epoch': 'CREATE INDEX IF NOT EXISTS idx_processed_epoch ON transactions(processed_epoch)',
+    'idx_customer_id': 'CREATE INDEX IF NOT EXISTS idx_customer_id ON transactions(customer_id)',
+    'idx_status': 'CREATE INDEX IF NOT EXISTS idx_status ON transactions(status)',
+    'idx_currency': 'CREATE INDEX IF NOT EXISTS idx_currency ON transactions(currency)',
+    'idx_category': 'CREATE INDEX IF NOT EXISTS idx_category ON transactions(product_category)',
+    # Partial: only flagged rows, which is what data-quality queries look for
+    'idx_data_quality_bits': 'CREATE INDEX IF NOT EXISTS idx_data_quality_bits ON transactions(data_quality_bits) '
+                             'WHERE data_quality_bits != 0',
+}
+
+# Data-quality issues, in the order data_quality_flags lists them; issue i
+# sets bit 1 << i of transactions.data_quality_bits
+QUALITY_ISSUES = (
+    'invalid_date_format',
+    'missing_timezone',
+    'out_of_order',
+    'duplicate_candidate',
+    'ambiguous_dst',
+    'nonexistent_dst',
+    'fuzzy_timezone_match',
+)
+
+# data_quality_flags issue -> data_quality_summary column
+DATA_QUALITY_COLUMNS = {
+    'invalid_date_format': 'invalid_dates',
+    'missing_timezone': 'missing_timezones',
+    'duplicate_candidate': 'duplicate_transactions',
+    'out_of_order': 'out_of_order_records',
+    'ambiguous_dst': 'ambiguous_dst_times',
+    'nonexistent_dst': 'nonexistent_dst_times',
+    'fuzzy_timezone_match': 'fuzzy_timezone_matches',
+}
+
+
+def _flags_json_sql(column='data_quality_bits'):
+    """SQL rendering a bitmask column as the {"issues": [...]} JSON of data_quality_flags."""
+    items = ' || '.join(
+        f"""CASE WHEN {column} & {1 << i} THEN ', "{issue}"' ELSE '' END""" for i, issue in enumerate(QUALITY_ISSUES)
+    )
+    return f"""CASE WHEN {column} = 0 THEN '{{}}' ELSE '{{"issues": [' || substr({items}, 3) || ']}}' END"""
+
+
+# data_quality_flags is derived from data_quality_bits for readers of the JSON
+FLAGS_COLUMN_SQL = f'data_quality_flags TEXT GENERATED ALWAYS AS ({_flags_json_sql()}) VIRTUAL'
+
 def create_directory_structure():
     """Create the required directory structure"""
     directories = ['data', 'tests', 'docs', 'docker']
@@ -18,26 +65,103 @@ def create_directory_structure():
     with open('data/.gitkeep', 'w') as f:
         f.write('')
 
-def create_sample_data():
-    """Generate messy sample transaction data"""
+# Vocabulary of the sample data; benchmarks/synthetic.py draws from the same lists
+SAMPLE_DATE_FORMATS = [
+    "%Y-%m-%d %H:%M:%S",    # Standard format
+    "%m/%d/%y %I:%M %p",    # US format
+    "%d-%b-%Y %H:%M",       # UK format
+    "%Y-%m-%dT%H:%M:%SZ",   # ISO with Z
+    "%Y-%m-%dT%H:%M:%S",    # ISO without timezone
+]
+
+SAMPLE_TIMEZONES = [
+    "America/New_York", "Europe/London", "Asia/Tokyo", "UTC",
+    "", "America/Los_Angeles", "Europe/Paris", "Australia/Sydney"
+]
+
+SAMPLE_CURRENCIES = ["USD", "EUR", "GBP", "JPY", "CAD", "AUD"]
+SAMPLE_CATEGORIES = ["electronics", "clothing", "home", "books", "sports", "beauty", "toys"]
+SAMPLE_STATUSES = ["completed", "pending", "failed"]
+
+# Hand-written edge cases appended to the sample data
+SAMPLE_PROBLEM_RECORDS = [
+    # Invalid date format
+    {
+        'transaction_id': 'TXN-BAD01',
+        'customer_id': 'CUST-1111',
+        'amount': 99.99,
+        'currency': 'USD',
+        'timestamp': '2024-13-45 25:99:99',  # Invalid date
+        'timezone': 'UTC',
+        'status': 'completed',
+        'product_category': 'electronics'
+    },
+    # DST transition - spring forward (this time doesn't exist)
+    {
+        'transaction_id': 'TXN-DST01',
+        'customer_id': 'CUST-2222',
+        'amount': 150.00,
+        'currency': 'USD',
+        'timestamp': '2024-03-10 02:30:00',
+        'timezone': 'America/New_York',
+        'status': 'completed',
+        'product_category': 'clothing'
+    },
+    # DST transition - fall back (this time occurs twice)
+    {
+        'transaction_id': 'TXN-DST02',
+        'customer_id': 'CUST-3333',
+        'amount': 200.00,
+        'currency': 'USD',
+        'timestamp': '2024-11-03 01:30:00',
+        'timezone': 'America/New_York',
+        'status': 'completed',
+        'product_category': 'home'
+    },
+    # Missing timezone
+    {
+        'transaction_id': 'TXN-NOTZ01',
+        'customer_id': 'CUST-4444',
+        'amount': 75.50,
+        'currency': 'EUR',
+        'timestamp': '2024-01-15 12:00:00',
+        'timezone': '',  # Empty timezone
+        'status': 'completed',
+        'product_category': 'books'
+    },
+    # Different date formats for same logical time
+    {
+        'transaction_id': 'TXN-FMT01',
+        'customer_id': 'CUST-5555',
+        'amount': 123.45,
+        'currency': 'GBP',
+        'timestamp': '15/01/2024 3:45 PM',  # US format
+        'timezone': 'Europe/London',
+        'status': 'completed',
+        'product_category': 'sports'
+    },
+    {
+        'transaction_id': 'TXN-FMT02',
+        'customer_id': 'CUST-6666',
+        'amount': 67.89,
+        'currency': 'EUR',
+        'timestamp': '15-Jan-2024 15:45',  # UK format
+        'timezone': 'Europe/Paris',
+        'status': 'completed',
+        'product_category': 'beauty'
+    }
+]
+
+def create_sample_data(seed=None):
+    """Generate messy sample transaction data (reproducible when `seed` is given)"""
+    rng = random.Random(seed)
     
     # Different date formats and timezones to simulate real-world mess
-    date_formats = [
-        "%Y-%m-%d %H:%M:%S",    # Standard format
-        "%m/%d/%y %I:%M %p",    # US format
-        "%d-%b-%Y %H:%M",       # UK format
-        "%Y-%m-%dT%H:%M:%SZ",   # ISO with Z
-        "%Y-%m-%dT%H:%M:%S",    # ISO without timezone
-    ]
-    
-    timezones = [
-        "America/New_York", "Europe/London", "Asia/Tokyo", "UTC",
-        "", "America/Los_Angeles", "Europe/Paris", "Australia/Sydney"
-    ]
-    
-    currencies = ["USD", "EUR", "GBP", "JPY", "CAD", "AUD"]
-    categories = ["electronics", "clothing", "home", "books", "sports", "beauty", "toys"]
-    statuses = ["completed", "pending", "failed"]
+    date_formats = SAMPLE_DATE_FORMATS
+    timezones = SAMPLE_TIMEZONES
+    currencies = SAMPLE_CURRENCIES
+    categories = SAMPLE_CATEGORIES
+    statuses = SAMPLE_STATUSES
     
     sample_transactions = []
     base_date = datetime(2024, 1, 1)
@@ -47,10 +171,10 @@ def create_sample_data():
     # Generate 5000 base transactions
     for i in range(5000):
         # Random date in Jan-March 2024
-        days_offset = random.randint(0, 89)
-        hours_offset = random.randint(0, 23)
-        minutes_offset = random.randint(0, 59)
-        seconds_offset = random.randint(0, 59)
+        days_offset = rng.randint(0, 89)
+        hours_offset = rng.randint(0, 23)
+        minutes_offset = rng.randint(0, 59)
+        seconds_offset = rng.randint(0, 59)
         
         trans_date = base_date + timedelta(
             days=days_offset, 
@@ -60,7 +184,7 @@ def create_sample_data():
         )
         
         # Apply different date formats to create parsing challenges
-        format_choice = random.choice(date_formats)
+        format_choice = rng.choice(date_formats)
         try:
             if format_choice == "%m/%d/%y %I:%M %p":
                 timestamp = trans_date.strftime(format_choice)
@@ -74,7 +198,7 @@ def create_sample_data():
             timestamp = trans_date.strftime("%Y-%m-%d %H:%M:%S")
         
         # Create some duplicate transactions with slight differences
-        if i > 0 and random.random() < 0.02:  # 2% chance of duplicate
+        if i > 0 and rng.random() < 0.02:  # 2% chance of duplicate
             prev_trans = sample_transactions[-1]
             # Copy previous transaction but with slight timestamp difference
             # Handle different timestamp formats from previous transaction
@@ -95,7 +219,7 @@ def create_sample_data():
                 else:
                     base_time = datetime.strptime(prev_timestamp, "%Y-%m-%d %H:%M:%S")
                 
-                duplicate_time = base_time + timedelta(seconds=random.randint(1, 5))
+                duplicate_time = base_time + timedelta(seconds=rng.randint(1, 5))
                 timestamp = duplicate_time.strftime("%Y-%m-%d %H:%M:%S")
             except ValueError:
                 # If parsing fails, just use the current transaction's timestamp
@@ -103,87 +227,19 @@ def create_sample_data():
         
         transaction = {
             'transaction_id': f"TXN-{i+1:05d}",
-            'customer_id': f"CUST-{random.randint(1000, 9999)}",
-            'amount': round(random.uniform(5.99, 999.99), 2),
-            'currency': random.choice(currencies),
+            'customer_id': f"CUST-{rng.randint(1000, 9999)}",
+            'amount': round(rng.uniform(5.99, 999.99), 2),
+            'currency': rng.choice(currencies),
             'timestamp': timestamp,
-            'timezone': random.choice(timezones),
-            'status': random.choice(statuses),
-            'product_category': random.choice(categories)
+            'timezone': rng.choice(timezones),
+            'status': rng.choice(statuses),
+            'product_category': rng.choice(categories)
         }
         
         sample_transactions.append(transaction)
     
     # Add specific problematic records for testing
-    problematic_records = [
-        # Invalid date format
-        {
-            'transaction_id': 'TXN-BAD01',
-            'customer_id': 'CUST-1111',
-            'amount': 99.99,
-            'currency': 'USD',
-            'timestamp': '2024-13-45 25:99:99',  # Invalid date
-            'timezone': 'UTC',
-            'status': 'completed',
-            'product_category': 'electronics'
-        },
-        # DST transition - spring forward (this time doesn't exist)
-        {
-            'transaction_id': 'TXN-DST01',
-            'customer_id': 'CUST-2222',
-            'amount': 150.00,
-            'currency': 'USD',
-            'timestamp': '2024-03-10 02:30:00',
-            'timezone': 'America/New_York',
-            'status': 'completed',
-            'product_category': 'clothing'
-        },
-        # DST transition - fall back (this time occurs twice)
-        {
-            'transaction_id': 'TXN-DST02',
-            'customer_id': 'CUST-3333',
-            'amount': 200.00,
-            'currency': 'USD',
-            'timestamp': '2024-11-03 01:30:00',
-            'timezone': 'America/New_York',
-            'status': 'completed',
-            'product_category': 'home'
-        },
-        # Missing timezone
-        {
-            'transaction_id': 'TXN-NOTZ01',
-            'customer_id': 'CUST-4444',
-            'amount': 75.50,
-            'currency': 'EUR',
-            'timestamp': '2024-01-15 12:00:00',
-            'timezone': '',  # Empty timezone
-            'status': 'completed',
-            'product_category': 'books'
-        },
-        # Different date formats for same logical time
-        {
-            'transaction_id': 'TXN-FMT01',
-            'customer_id': 'CUST-5555',
-            'amount': 123.45,
-            'currency': 'GBP',
-            'timestamp': '15/01/2024 3:45 PM',  # US format
-            'timezone': 'Europe/London',
-            'status': 'completed',
-            'product_category': 'sports'
-        },
-        {
-            'transaction_id': 'TXN-FMT02',
-            'customer_id': 'CUST-6666',
-            'amount': 67.89,
-            'currency': 'EUR',
-            'timestamp': '15-Jan-2024 15:45',  # UK format
-            'timezone': 'Europe/Paris',
-            'status': 'completed',
-            'product_category': 'beauty'
-        }
-    ]
-    
-    sample_transactions.extend(problematic_records)
+    sample_transactions.extend(dict(record) for record in SAMPLE_PROBLEM_RECORDS)
     
     # Write to CSV
     csv_path = 'data/transactions.csv'
@@ -198,9 +254,8 @@ def create_sample_data():
     print(f"   📁 Saved to: {csv_path}")
     return len(sample_transactions)
 
-def setup_database():
+def setup_database(db_path='data/ecommerce.db'):
     """Initialize SQLite database with proper schema and indexes"""
-    db_path = 'data/ecommerce.db'
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
@@ -217,41 +272,166 @@ def setup_database():
             original_timestamp TEXT NOT NULL,
             original_timezone TEXT,
             processed_timestamp DATETIME,
+            processed_epoch INTEGER,  -- processed_timestamp as UTC epoch seconds
             processed_timezone TEXT DEFAULT 'UTC',
             status TEXT NOT NULL,
             product_category TEXT NOT NULL,
-            data_quality_flags TEXT,  -- JSON string for tracking issues
+            data_quality_bits INTEGER NOT NULL DEFAULT 0,  -- bitmask of QUALITY_ISSUES
+            {FLAGS_COLUMN_SQL},
             created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            amount_reporting REAL  -- amount in the reporting currency (see fx.py); NULL without a rate
         )
-    ''')
+    '''.format(FLAGS_COLUMN_SQL=FLAGS_COLUMN_SQL))
     
+    # Add and backfill processed_epoch on databases created before it existed
+    columns = [row[1] for row in cursor.execute('PRAGMA table_info(transactions)')]
+    if 'processed_epoch' not in columns:
+        cursor.execute('ALTER TABLE transactions ADD COLUMN processed_epoch INTEGER')
+        cursor.execute("UPDATE transactions SET processed_epoch = CAST(strftime('%s', processed_timestamp) AS INTEGER)")
+
+    # Replace the stored JSON flags with data_quality_bits and a JSON column derived from it
+    if 'data_quality_bits' not in columns:
+        backfill = ' + '.join(
+            f"""(instr(data_quality_flags, '"{issue}"') > 0) * {1 << i}""" for i, issue in enumerate(QUALITY_ISSUES)
+        )
+        cursor.execute('ALTER TABLE transactions ADD COLUMN data_quality_bits INTEGER NOT NULL DEFAULT 0')
+        cursor.execute(f'UPDATE transactions SET data_quality_bits = {backfill} WHERE data_quality_flags IS NOT NULL')
+        cursor.execute('ALTER TABLE transactions DROP COLUMN data_quality_flags')
+        cursor.execute(f'ALTER TABLE transactions ADD COLUMN {FLAGS_COLUMN_SQL}')
+
+    # Add amount_reporting on databases created before it existed; `python fx.py` fills it
+    if 'amount_reporting' not in columns:
+        cursor.execute('ALTER TABLE transactions ADD COLUMN amount_reporting REAL')
+
     # Create indexes for query performance
-    indexes = [
-        'CREATE INDEX IF NOT EXISTS idx_processed_timestamp ON transactions(processed_timestamp)',
-        'CREATE INDEX IF NOT EXISTS idx_customer_id ON transactions(customer_id)',
-        'CREATE INDEX IF NOT EXISTS idx_status ON transactions(status)',
-        'CREATE INDEX IF NOT EXISTS idx_currency ON transactions(currency)',
-        'CREATE INDEX IF NOT EXISTS idx_category ON transactions(product_category)',
-        'CREATE INDEX IF NOT EXISTS idx_transaction_id ON transactions(transaction_id)'
-    ]
-    
-    for index_sql in indexes:
+    for index_sql in SECONDARY_INDEXES.values():
         cursor.execute(index_sql)
+
+    # transaction_id is already indexed by its UNIQUE constraint, and range
+    # scans use idx_processed_epoch
+    cursor.execute('DROP INDEX IF EXISTS idx_transaction_id')
+    cursor.execute('DROP INDEX IF EXISTS idx_processed_timestamp')
     
-    # Create data quality summary table
+    # Create pre-aggregated sales table, maintained at ingest and read by the
+    # sales endpoints instead of the raw transactions
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sales_rollup (
+            bucket_start INTEGER PRIMARY KEY,  -- UTC epoch seconds, 15-minute aligned
+            sales_cents INTEGER NOT NULL,
+            transaction_count INTEGER NOT NULL,
+            sales_cents_squared INTEGER NOT NULL,
+            reporting_cents INTEGER NOT NULL DEFAULT 0,  -- sales_cents in the reporting currency
+            unconverted_count INTEGER NOT NULL DEFAULT 0  -- transactions left out of reporting_cents
+        )
+    ''')
+
+    # Create sales cube: the rollup buckets split by category, status and
+    # currency, and the same cells rolled up to local days and months in
+    # each of SALES_CUBE_TIMEZONES; read by /api/sales/cube
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sales_cube (
+            bucket_start INTEGER NOT NULL,  -- UTC epoch seconds, 15-minute aligned
+            product_category TEXT NOT NULL,
+            status TEXT NOT NULL,
+            currency TEXT NOT NULL,
+            sales_cents INTEGER NOT NULL,
+            transaction_count INTEGER NOT NULL,
+            reporting_cents INTEGER NOT NULL DEFAULT 0,
+            unconverted_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (bucket_start, product_category, status, currency)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sales_cube_daily (
+            timezone TEXT NOT NULL,
+            local_date TEXT NOT NULL,  -- YYYY-MM-DD in timezone
+            product_category TEXT NOT NULL,
+            status TEXT NOT NULL,
+            currency TEXT NOT NULL,
+            sales_cents INTEGER NOT NULL,
+            transaction_count INTEGER NOT NULL,
+            reporting_cents INTEGER NOT NULL DEFAULT 0,
+            unconverted_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (timezone, local_date, product_category, status, currency)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sales_cube_monthly (
+            timezone TEXT NOT NULL,
+            local_month TEXT NOT NULL,  -- YYYY-MM in timezone
+            product_category TEXT NOT NULL,
+            status TEXT NOT NULL,
+            currency TEXT NOT NULL,
+            sales_cents INTEGER NOT NULL,
+            transaction_count INTEGER NOT NULL,
+            reporting_cents INTEGER NOT NULL DEFAULT 0,
+            unconverted_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (timezone, local_month, product_category, status, currency)
+        ) WITHOUT ROWID
+    ''')
+
+    # Add reporting_cents and unconverted_count to rollups created before
+    # them; `python fx.py` fills them in
+    for table in ('sales_rollup', 'sales_cube', 'sales_cube_daily', 'sales_cube_monthly'):
+        table_columns = [row[1] for row in cursor.execute(f'PRAGMA table_info({table})')]
+        for column in ('reporting_cents', 'unconverted_count'):
+            if column not in table_columns:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0')
+
+    # Create exchange rate table (see fx.py): units of the reporting
+    # currency per unit of `currency`, from rate_date until the next rate
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS fx_rates (
+            rate_date TEXT NOT NULL,  -- YYYY-MM-DD
+            currency TEXT NOT NULL,
+            rate REAL NOT NULL,
+            PRIMARY KEY (rate_date, currency)
+        ) WITHOUT ROWID
+    ''')
+
+    # Create metadata table: facts about the stored data as a whole, such as
+    # the reporting currency of amount_reporting (see fx.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS metadata (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        ) WITHOUT ROWID
+    ''')
+
+    # Create data quality summary table: one 'load' row per ingest with the
+    # counts for the rows it wrote, and one 'cumulative' row for the table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS data_quality_summary (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scope TEXT NOT NULL DEFAULT 'load',  -- 'load' or 'cumulative'
             total_records INTEGER,
             invalid_dates INTEGER DEFAULT 0,
             missing_timezones INTEGER DEFAULT 0,
             duplicate_transactions INTEGER DEFAULT 0,
             out_of_order_records INTEGER DEFAULT 0,
             other_issues INTEGER DEFAULT 0,
+            ambiguous_dst_times INTEGER DEFAULT 0,
+            nonexistent_dst_times INTEGER DEFAULT 0,
+            fuzzy_timezone_matches INTEGER DEFAULT 0,
             last_updated DATETIME DEFAULT CURRENT_TIMESTAMP
         )
     ''')
+    summary_columns = [row[1] for row in cursor.execute('PRAGMA table_info(data_quality_summary)')]
+    for column in ('ambiguous_dst_times', 'nonexistent_dst_times', 'fuzzy_timezone_matches'):
+        if column not in summary_columns:
+            cursor.execute(f'ALTER TABLE data_quality_summary ADD COLUMN {column} INTEGER DEFAULT 0')
+    # Rows from before scope existed are per-load; add the cumulative row for the table as it is
+    if 'scope' not in summary_columns:
+        cursor.execute("ALTER TABLE data_quality_summary ADD COLUMN scope TEXT NOT NULL DEFAULT 'load'")
+        counts = ', '.join(
+            f'COALESCE(SUM(data_quality_bits & {1 << QUALITY_ISSUES.index(issue)} != 0), 0)'
+            for issue in DATA_QUALITY_COLUMNS
+        )
+        cursor.execute(f"""
+            INSERT INTO data_quality_summary (scope, total_records, {', '.join(DATA_QUALITY_COLUMNS.values())})
+            SELECT 'cumulative', COUNT(*), {counts} FROM transactions
+        """)
     
     conn.commit()
     conn.close()
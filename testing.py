@@ -1,11 +1,39 @@
-from utils import load_transaction_data, clean_and_enrich_transactions, insert_clean_data_into_db, detect_near_duplicates
+import argparse
+import logging
+from config import LOG_LEVEL
+from metrics import ingest_report
+from utils import load_transaction_data, clean_and_enrich_transactions, insert_clean_data_into_db, detect_near_duplicates, ingest_csv_parallel, ingest_csv_streaming, ingest_incremental
 
-df = load_transaction_data("data/transactions.csv")
-df_clean = clean_and_enrich_transactions(df)
-insert_clean_data_into_db(df_clean)
+parser = argparse.ArgumentParser(description="Load data/transactions.csv into the database")
+parser.add_argument("--chunksize", type=int, help="stream the CSV in chunks of this many rows")
+parser.add_argument("--workers", type=int, help="clean chunks in this many processes (implies streaming)")
+parser.add_argument("--bulk", action="store_true", help="full reload with tuned PRAGMAs and indexes rebuilt at the end")
+parser.add_argument("--incremental", action="store_true", help="merge into the existing table instead of reloading it")
+args = parser.parse_args()
+logging.basicConfig(level=LOG_LEVEL, format="%(message)s")
+
+if args.incremental:
+    chunks = load_transaction_data("data/transactions.csv", chunksize=args.chunksize) if args.chunksize \
+        else [load_transaction_data("data/transactions.csv")]
+    for chunk in chunks:
+        ingest_incremental(chunk)
+    raise SystemExit
+
+if args.workers:
+    ingest_csv_parallel("data/transactions.csv", workers=args.workers, chunksize=args.chunksize or 50_000, bulk=args.bulk)
+    raise SystemExit
+
+if args.chunksize:
+    ingest_csv_streaming("data/transactions.csv", chunksize=args.chunksize, bulk=args.bulk)
+    raise SystemExit
+
+with ingest_report("full"):
+    df = load_transaction_data("data/transactions.csv")
+    df_clean = clean_and_enrich_transactions(df)
+    insert_clean_data_into_db(df_clean, bulk=args.bulk)
 dupes = detect_near_duplicates(df_clean)
 print(df.dtypes)
 
 print(f"Found {len(dupes)} potential duplicates")
 for idx in list(dupes)[:5]:
-    print(df_clean.iloc[idx][["transaction_id", "processed_timestamp"]])
\ No newline at end of file
+    print(df_clean.iloc[idx][["transaction_id", "processed_timestamp"]])
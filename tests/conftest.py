@@ -0,0 +1,35 @@
+import sqlite3
+import pytest
+
+import models
+import utils
+from setup_db import setup_database
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """Empty database with the production schema, wired into models/utils."""
+    db_path = str(tmp_path / "test.db")
+    setup_database(db_path)
+    monkeypatch.setattr(models, "DATABASE_PATH", db_path)
+    monkeypatch.setattr(utils, "DATABASE_PATH", db_path)
+    yield db_path
+    models.read_pool.close_all()
+
+
+def insert_processed_rows(db_path, rows):
+    """Insert (transaction_id, processed_timestamp, amount) rows directly and rebuild the rollup."""
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        """
+        INSERT INTO transactions (
+            transaction_id, customer_id, amount, currency, original_timestamp,
+            processed_timestamp, processed_epoch, status, product_category, amount_reporting
+        ) VALUES (?, 'CUST-0001', ?, 'USD', ?, ?, CAST(strftime('%s', ?) AS INTEGER), 'completed', 'books', ?)
+        """,
+        [(txn_id, amount, ts or "", ts, ts, amount) for txn_id, ts, amount in rows],
+    )
+    utils.refresh_sales_rollup(conn)
+    utils.bump_data_version(conn)
+    conn.commit()
+    conn.close()
@@ -1,5 +1,7 @@
+import orjson
 import pytest
 from app import app
+from tests.conftest import insert_processed_rows
 
 @pytest.fixture
 def client():
@@ -27,6 +29,75 @@ def test_sales_daily_invalid_date_format(client):
     data = response.get_json()
     assert data["error"] == "Invalid date format"
 
+def test_sales_daily_pages_and_streams(temp_db, client):
+    insert_processed_rows(temp_db, [(f"TXN-{day}", f"2024-01-{day:02d} 12:00:00", day * 1.5) for day in range(1, 13)])
+    url = "/api/sales/daily?start_date=2024-01-01&end_date=2024-01-31&timezone=UTC"
+    expected = client.get(url).get_json()["data"]
+
+    pages, cursor = [], ""
+    while cursor is not None:
+        page = client.get(f"{url}&limit=5&cursor={cursor}" if cursor else f"{url}&limit=5").get_json()
+        pages.extend(page["data"])
+        cursor = page["next_cursor"]
+    assert pages == expected
+
+    response = client.get(f"{url}&format=ndjson")
+    assert response.mimetype == "application/x-ndjson"
+    assert [orjson.loads(line) for line in response.data.splitlines()] == expected
+
+    response = client.get(f"{url}&format=csv")
+    assert response.mimetype == "text/csv"
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines[0] == "date,total_sales,transaction_count,average_order_value"
+    assert lines[1:] == [f"{r['date']},{r['total_sales']},{r['transaction_count']},{r['average_order_value']}" for r in expected]
+
+def test_sales_daily_page_errors(temp_db, client):
+    url = "/api/sales/daily?start_date=2024-01-01&end_date=2024-01-31"
+    assert client.get(f"{url}&limit=0").get_json()["error"] == "Invalid limit"
+    assert client.get(f"{url}&limit=abc").get_json()["error"] == "Invalid limit"
+    assert client.get(f"{url}&cursor=bogus").get_json()["error"] == "Invalid cursor"
+    assert client.get(f"{url}&format=xml").get_json()["error"] == "Invalid format"
+    assert client.get(f"{url}&format=csv&limit=5").status_code == 400
+    assert client.get("/api/sales/daily?start_date=2024-99-01&end_date=2024-01-31&format=ndjson").get_json()["error"] == "Invalid date format"
+
+def test_sales_cube(temp_db, client):
+    insert_processed_rows(temp_db, [("TXN-1", "2024-01-15 12:00:00", 20.0), ("TXN-2", "2024-02-03 08:30:00", 30.0)])
+    data = client.get("/api/sales/cube?start_date=2024-01-01&end_date=2024-03-31&group_by=month,status"
+                      "&categories=books,toys&currencies=USD").get_json()
+    assert [(row["month"], row["status"], row["total_sales"]) for row in data["data"]] == [
+        ("2024-01", "completed", 20.0), ("2024-02", "completed", 30.0)]
+    assert data["filters"] == {"category": ["books", "toys"], "currency": ["USD"]}
+
+    response = client.get("/api/sales/cube?start_date=2024-01-01&end_date=2024-03-31&group_by=customer")
+    assert response.status_code == 400 and response.get_json()["error"] == "Invalid cube query"
+
+def test_sales_currency_param(temp_db, client):
+    insert_processed_rows(temp_db, [("TXN-1", "2024-01-15 12:00:00", 20.0)])
+    data = client.get("/api/sales/daily?start_date=2024-01-15&end_date=2024-01-15&currency=usd").get_json()
+    assert data["currency"] == "USD"
+    assert client.get("/api/sales/daily?start_date=2024-01-15&end_date=2024-01-15").get_json()["currency"] == "USD"
+    assert client.get("/api/sales/daily?start_date=2024-01-15&end_date=2024-01-15&currency=raw").get_json()["currency"] == "raw"
+
+    for url in ("/api/sales/daily?start_date=2024-01-15&end_date=2024-01-15&currency=XYZ",
+                "/api/sales/daily?start_date=2024-01-15&end_date=2024-01-15&format=ndjson&currency=XYZ",
+                "/api/sales/hourly?date=2024-01-15&currency=XYZ",
+                "/api/sales/compare?period1=2024-01&period2=2024-02&currency=XYZ",
+                "/api/sales/cube?start_date=2024-01-01&end_date=2024-01-31&currency=XYZ"):
+        response = client.get(url)
+        assert response.status_code == 400 and response.get_json()["error"] == "Invalid currency", url
+
+def test_sales_compare_trend(client):
+    response = client.get("/api/sales/compare?periods=2024-Q1,2024-Q2&granularity=quarter&timezone=Asia/Tokyo")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert [p["period"] for p in data["data"]] == ["2024-Q1", "2024-Q2"]
+    assert data["granularity"] == "quarter"
+
+def test_sales_compare_invalid_granularity(client):
+    response = client.get("/api/sales/compare?period1=2024-01&period2=2024-02&granularity=year")
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "Invalid granularity"
+
 def test_data_quality_endpoint(client):
     response = client.get("/api/data-quality")
     assert response.status_code == 200
@@ -35,11 +106,30 @@ def test_data_quality_endpoint(client):
     assert "invalid_dates" in data["issues_found"]
 
 def test_fallback_dst(client):
-    response = client.get("/api/sales/hourly?start_date=2024-11-03&end_date=2024-11-03&timezone=America/New_York")
+    response = client.get("/api/sales/hourly?date=2024-11-03&timezone=America/New_York")
     assert response.status_code == 200
     data = response.get_json()
-    assert "data" in data
+    assert len(data["data"]) == 25
 
 def test_404_route(client):
     response = client.get("/api/unknown")
-    assert response.status_code == 404
\ No newline at end of file
+    assert response.status_code == 404
+def test_create_app_builds_independent_apps():
+    from app import create_app
+    first = create_app({"TESTING": True})
+    second = create_app()
+
+    assert first is not second
+    assert first.config["TESTING"] and not second.config["TESTING"]
+    assert first.config["DEBUG"] is False
+    assert first.test_client().get("/api/cache/stats").status_code == 200
+
+def test_metrics_endpoint(client):
+    client.get("/api/sales/daily?start_date=2024-01-01&end_date=2024-01-10&timezone=UTC")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    body = response.get_data(as_text=True)
+    assert 'ecommerce_http_requests_total{endpoint="/api/sales/daily",status="200"}' in body
+    assert 'ecommerce_query_phase_seconds_count{phase="fetch",query="daily"}' in body
+    assert "ecommerce_result_cache_events_total" in body
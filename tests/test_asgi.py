@@ -0,0 +1,88 @@
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient
+
+import asgi
+import models
+from app import app as flask_app
+from tests.conftest import insert_processed_rows
+
+
+@pytest.fixture
+def client():
+    with TestClient(asgi.app) as client:
+        yield client
+
+
+def test_matches_flask_responses(temp_db, client):
+    insert_processed_rows(temp_db, [
+        ("TXN-1", "2024-01-15 12:00:00", 20.0),
+        ("TXN-2", "2024-02-03 08:30:00", 30.0),
+    ])
+    flask_client = flask_app.test_client()
+    for path in [
+        "/api/sales/daily?start_date=2024-01-01&end_date=2024-03-31&timezone=America/New_York",
+        "/api/sales/daily?start_date=2024-01-01&end_date=2024-03-31&limit=1",
+        "/api/sales/cube?start_date=2024-01-01&end_date=2024-03-31&group_by=week,category&statuses=completed",
+        "/api/sales/hourly?date=2024-01-15&timezone=Asia/Kolkata",
+        "/api/sales/compare?period1=2024-01&period2=2024-02",
+        "/api/sales/compare?periods=2024-01,2024-02,2024-03",
+        "/api/sales/compare?periods=2024-01,2024-02&currency=USD",
+    ]:
+        response = client.get(path)
+        assert response.status_code == 200
+        assert response.json() == flask_client.get(path).get_json()
+
+
+def test_validation_errors(temp_db, client):
+    assert client.get("/api/sales/daily").json()["error"] == "Missing query parameters"
+    assert client.get("/api/sales/daily?start_date=2024-99-01&end_date=2024-01-31").json()["error"] == "Invalid date format"
+    assert client.get("/api/sales/compare?period1=2024-01&period2=2024-02&granularity=year").status_code == 400
+    assert client.get("/api/sales/hourly?date=2024-01-15&currency=XYZ").json()["error"] == "Invalid currency"
+
+
+def test_timeout_interrupts_running_query(temp_db, client, monkeypatch):
+    interrupted = threading.Event()
+
+    def slow_query(*args):
+        with models.read_pool.connection(models.DATABASE_PATH) as conn:
+            conn.create_function("slow", 0, lambda: time.sleep(0.01) or 1)
+            try:
+                conn.execute("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE slow()) SELECT count(*) FROM n").fetchone()
+            except Exception:
+                interrupted.set()
+                raise
+
+    monkeypatch.setattr(asgi, "REQUEST_TIMEOUT_SECONDS", 0.2)
+    monkeypatch.setattr(models, "get_hourly_sales_summary", slow_query)
+
+    response = client.get("/api/sales/hourly?date=2024-01-15")
+    assert response.status_code == 504
+    assert response.json()["error"] == "Request timed out"
+    assert interrupted.wait(2)
+
+
+def test_long_ranges_use_their_own_lane():
+    assert asgi._daily_lane("2024-01-01", "2024-01-31") == "short"
+    assert asgi._daily_lane("2024-01-01", "2024-12-31") == "long"
+    assert asgi._daily_lane("bad", "2024-12-31") == "short"
+
+
+def test_metrics_endpoint(temp_db, client):
+    client.get("/api/sales/hourly?date=2024-01-15")
+    body = client.get("/metrics").text
+    assert 'ecommerce_http_requests_total{endpoint="/api/sales/hourly",status="200"}' in body
+    assert 'ecommerce_http_request_seconds_bucket{endpoint="/api/sales/hourly",le="+Inf"}' in body
+
+
+def test_import_does_not_build_flask_app():
+    code = "import sys, asgi; assert 'app' not in sys.modules and 'flask' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=Path(__file__).resolve().parents[1])
@@ -0,0 +1,51 @@
+from cache import ResultCache, cached
+
+
+def test_lru_eviction_and_stats():
+    cache = ResultCache(max_entries=2)
+    cache.get("a", 1)
+    cache.put("a", 1, {"v": 1})
+    cache.put("b", 1, {"v": 2})
+    assert cache.get("a", 1) == (True, {"v": 1})
+    cache.put("c", 1, {"v": 3})  # evicts b, the least recently used
+
+    assert cache.get("b", 1) == (False, None)
+    assert cache.get("c", 1) == (True, {"v": 3})
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["entries"]) == (2, 2, 1, 2)
+
+
+def test_byte_cap_and_ttl():
+    cache = ResultCache(max_bytes=20, ttl_seconds=-1)
+    cache.get("a", 1)
+    cache.put("big", 1, {"data": "x" * 100})
+    cache.put("small", 1, [1])
+
+    assert cache.stats()["entries"] == 1
+    assert cache.get("small", 1) == (False, None)  # already expired
+    assert cache.stats()["expirations"] == 1
+
+
+def test_version_change_invalidates():
+    cache = ResultCache()
+    cache.get("a", 1)
+    cache.put("a", 1, "old")
+    assert cache.get("a", 2) == (False, None)
+    cache.put("a", 1, "stale")  # computed against version 1, discarded
+
+    assert cache.get("a", 2) == (False, None)
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_cached_decorator_normalizes_arguments():
+    cache = ResultCache()
+    calls = []
+
+    @cached(cache, "echo", lambda: 0)
+    def echo(*args):
+        calls.append(args)
+        return list(args)
+
+    assert echo(" UTC", ["a", "b"]) == [" UTC", ["a", "b"]]
+    assert echo("UTC ", ("a", "b")) == [" UTC", ["a", "b"]]
+    assert len(calls) == 1
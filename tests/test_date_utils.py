@@ -1,5 +1,10 @@
 import unittest
-from date_utils import parse_timestamp
+from datetime import date
+from date_utils import (
+    parse_timestamp, parse_timestamps, local_date_range_to_utc, local_midnight_to_utc, parse_period,
+    parse_cache_stats, reset_parse_caches, resolve_timezone
+)
+import pandas as pd
 import pytz
 
 class TestParseTimestamp(unittest.TestCase):
@@ -41,5 +46,110 @@ class TestParseTimestamp(unittest.TestCase):
         result = parse_timestamp(ts, "Mars/SpaceTime")
         self.assertIsNone(result)  # unresolvable zone
 
+
+class TestParseTimestamps(unittest.TestCase):
+
+    def assert_matches_scalar(self, rows):
+        timestamps = pd.Series([ts for ts, _ in rows])
+        timezones = pd.Series([tz for _, tz in rows])
+        result = parse_timestamps(timestamps, timezones)
+        for (ts, tz), got in zip(rows, result):
+            expected = parse_timestamp(ts, tz)
+            if expected is None:
+                self.assertTrue(pd.isna(got), (ts, tz))
+            else:
+                self.assertEqual(pd.Timestamp(expected), got, (ts, tz))
+
+    def test_known_formats(self):
+        self.assert_matches_scalar([
+            ("2024-01-15 14:30:00", "UTC"),
+            ("2024-02-07 20:32:57", "America/New_York"),  # dayfirst reads 2024-07-02
+            ("01/05/24 11:41 AM", "Europe/London"),
+            ("01/15/24 2:30 PM", "America/New_York"),
+            ("15/01/2024 3:45 PM", "Europe/London"),
+            ("15-Jan-2024 14:30", "Europe/Paris"),
+            ("2024-01-15T14:30:00Z", "Asia/Tokyo"),
+            ("2024-01-15T14:30:00", "America/New_York"),
+            ("2024-01-15 14:30:00.123456", "UTC"),
+            ("2024-01-15", "UTC"),
+        ])
+
+    def test_fallback_and_invalid(self):
+        self.assert_matches_scalar([
+            ("Jan 15 2024 10:00", "UTC"),
+            ("2024-01-15T14:30:00+05:00", "UTC"),
+            ("2024-13-45 25:99:99", "UTC"),
+            ("nan", "UTC"),
+            ("", "UTC"),
+            ("2024-01-15 12:00:00", "Mars/SpaceTime"),
+            ("2024-01-15 12:00:00", "nan"),
+        ])
+
+    def test_dst_transitions(self):
+        self.assert_matches_scalar([
+            ("2024-03-10 02:30:00", "America/New_York"),
+            ("2024-11-03 01:30:00", "America/New_York"),
+            ("2024-03-31 01:30:00", "Europe/London"),
+            ("2024-04-07 02:15:00", "Australia/Lord_Howe"),
+        ])
+
+
+class TestParseCaches(unittest.TestCase):
+
+    def setUp(self):
+        reset_parse_caches()
+
+    def test_timezone_resolution_is_memoized(self):
+        self.assertEqual(resolve_timezone("london").zone, "Europe/London")
+        self.assertIsNone(resolve_timezone("Mars/SpaceTime"))
+        self.assertEqual(resolve_timezone("london").zone, "Europe/London")
+        self.assertIsNone(resolve_timezone("Mars/SpaceTime"))
+
+        stats = parse_cache_stats()["timezone"]
+        self.assertEqual((stats["hits"], stats["misses"], stats["fuzzy_scans"]), (2, 2, 2))
+
+    def test_stage_counters(self):
+        timestamps = pd.Series(["2024-01-15 10:00:00", "2024-01-16 10:00:00", "Jan 5 2024 10:00", "garbage"])
+        parse_timestamps(timestamps, pd.Series(["UTC"] * 4))
+        parse_timestamps(timestamps, pd.Series(["UTC"] * 4))
+
+        stats = parse_cache_stats()
+        self.assertEqual(stats["rows"], {"template": 4, "dateutil": 4, "unparsed": 2, "localize_fallback": 0})
+        self.assertEqual(stats["shape"]["hits"], stats["shape"]["misses"])
+        self.assertEqual((stats["dateutil"]["hits"], stats["dateutil"]["misses"]), (2, 2))
+
+
+class TestLocalDateRangeToUtc(unittest.TestCase):
+
+    def test_utc(self):
+        bounds = local_date_range_to_utc(date(2024, 1, 1), date(2024, 1, 31), "UTC")
+        self.assertEqual(bounds, ("2024-01-01 00:00:00", "2024-02-01 00:00:00"))
+
+    def test_offset_timezone(self):
+        bounds = local_date_range_to_utc(date(2024, 1, 15), date(2024, 1, 15), "Asia/Tokyo")
+        self.assertEqual(bounds, ("2024-01-14 15:00:00", "2024-01-15 15:00:00"))
+
+    def test_dst_change_inside_range(self):
+        bounds = local_date_range_to_utc(date(2024, 3, 10), date(2024, 3, 10), "America/New_York")
+        self.assertEqual(bounds, ("2024-03-10 05:00:00", "2024-03-11 04:00:00"))
+
+
+class TestPeriods(unittest.TestCase):
+
+    def test_parse_period(self):
+        self.assertEqual(parse_period("2024-02", "month"), (date(2024, 2, 1), date(2024, 2, 29)))
+        self.assertEqual(parse_period("2024-Q4", "quarter"), (date(2024, 10, 1), date(2024, 12, 31)))
+        self.assertEqual(parse_period("2025-W01", "week"), (date(2024, 12, 30), date(2025, 1, 5)))
+        self.assertEqual(parse_period("2024-03-10", "day"), (date(2024, 3, 10), date(2024, 3, 10)))
+        for period, granularity in [("2024-13", "month"), ("2024-Q5", "quarter"), ("2024-02", "year")]:
+            with self.assertRaises(ValueError):
+                parse_period(period, granularity)
+
+    def test_local_midnight_to_utc(self):
+        self.assertEqual(local_midnight_to_utc(date(2024, 3, 10), "America/New_York"), "2024-03-10 05:00:00")
+        # Havana springs forward at midnight and falls back to a repeated midnight hour
+        self.assertEqual(local_midnight_to_utc(date(2024, 3, 10), "America/Havana"), "2024-03-10 05:00:00")
+        self.assertEqual(local_midnight_to_utc(date(2024, 11, 3), "America/Havana"), "2024-11-03 04:00:00")
+
 if __name__ == "__main__":
     unittest.main()
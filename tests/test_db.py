@@ -0,0 +1,75 @@
+import os
+import shutil
+import sqlite3
+import threading
+
+import pytest
+
+import models
+from tests.conftest import insert_processed_rows
+from db import ReadConnectionPool
+
+
+def test_connection_reused_within_thread(temp_db):
+    pool = ReadConnectionPool()
+    with pool.connection(temp_db) as first:
+        pass
+    with pool.connection(temp_db) as second:
+        pass
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(pool._acquire(temp_db)))
+    thread.start()
+    thread.join()
+
+    assert first is second
+    assert other[0] is not first
+    stats = pool.stats()
+    assert (stats["opened"], stats["reused"], stats["open"]) == (2, 1, 2)
+    pool.close_all()
+    assert pool.stats()["open"] == 0
+
+
+def test_connections_are_read_only(temp_db):
+    pool = ReadConnectionPool(mmap_size=1024 * 1024)
+    with pool.connection(temp_db) as conn:
+        assert conn.execute("PRAGMA query_only").fetchone()[0] == 1
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM transactions")
+    pool.close_all()
+
+
+def test_reopens_after_file_swap(temp_db, tmp_path):
+    insert_processed_rows(temp_db, [("TXN-1", "2023-06-01 12:00:00", 10.0)])
+    assert models.get_daily_sales_summary("2023-06-01", "2023-06-01", "UTC")["data"][0]["total_sales"] == 10.0
+
+    # An ingest builds a fresh database and moves it over the served one
+    staged = str(tmp_path / "staged.db")
+    shutil.copy(temp_db, staged)
+    insert_processed_rows(staged, [("TXN-2", "2023-06-01 13:00:00", 5.0)])
+    os.replace(staged, temp_db)
+
+    assert models.get_daily_sales_summary("2023-06-01", "2023-06-01", "UTC")["data"][0]["total_sales"] == 15.0
+    assert models.read_pool.stats()["reopened_after_swap"] == 1
+
+
+def test_health_check_replaces_broken_connection(temp_db):
+    pool = ReadConnectionPool(health_check_seconds=0)
+    with pool.connection(temp_db) as conn:
+        conn.close()
+    with pool.connection(temp_db) as fresh:
+        assert fresh.execute("SELECT 1").fetchone() == (1,)
+
+    assert fresh is not conn
+    assert pool.stats()["failed_health_checks"] == 1
+    pool.close_all()
+
+
+def test_unpooled_connections_are_closed(temp_db):
+    pool = ReadConnectionPool(pooled=False)
+    with pool.connection(temp_db) as conn:
+        conn.execute("SELECT 1")
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    assert pool.stats()["open"] == 0
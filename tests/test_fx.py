@@ -0,0 +1,173 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import models
+from fx import (
+    FxTable, ReportingCurrencyMismatch, UnknownCurrency, load_fx_rates, normalize_currency, read_fx_rates,
+    reconvert_amounts, record_reporting_currency, stored_reporting_currency
+)
+from utils import bump_data_version, ingest_csv_streaming, refresh_sales_rollup
+
+RATES_CSV = """date,currency,rate
+2024-01-01,EUR,1.10
+2024-01-16,EUR,1.20
+2024-01-01,jpy,0.0070
+"""
+
+RAW_CSV = """transaction_id,customer_id,amount,currency,timestamp,timezone,status,product_category
+TXN-1,CUST-1,10.00,USD,2024-01-15 12:00:00,UTC,completed,books
+TXN-2,CUST-2,20.00,EUR,2024-01-15 23:30:00,UTC,completed,home
+TXN-3,CUST-3,1000,JPY,2024-01-16 00:30:00,UTC,completed,toys
+TXN-4,CUST-4,30.00,EUR,2024-01-16 12:00:00,UTC,pending,books
+TXN-5,CUST-5,5.00,CHF,2024-01-16 13:00:00,UTC,completed,books
+"""
+
+
+def epoch(ts):
+    return pd.Timestamp(ts, tz="UTC").timestamp()
+
+
+def test_fx_table_applies_rates_as_of_their_date(tmp_path):
+    rates_path = tmp_path / "fx_rates.csv"
+    rates_path.write_text(RATES_CSV)
+    fx = FxTable(read_fx_rates(rates_path), reporting_currency="USD")
+
+    converted = fx.to_reporting(
+        [100, 100, 100, 100, 100, 100],
+        ["EUR", "EUR", "EUR", "USD", "JPY", "CHF"],
+        [epoch("2023-06-01"), epoch("2024-01-15 23:59:59"), epoch("2025-01-01"), epoch("2024-01-15"),
+         epoch("2024-01-15"), epoch("2024-01-15")],
+    )
+    np.testing.assert_allclose(converted[:5], [110, 110, 120, 100, 0.7])
+    assert np.isnan(converted[5])
+    assert np.isnan(fx.to_reporting([100], ["USD"], [np.nan])[0])
+
+    days = np.array([epoch("2024-01-15"), epoch("2024-01-16")], dtype="int64") // 86400
+    np.testing.assert_allclose(fx.factors("EUR", days), [1 / 1.1, 1 / 1.2])
+    np.testing.assert_allclose(fx.factors("USD", days), [1, 1])
+    with pytest.raises(UnknownCurrency):
+        fx.factors("CHF", days)
+
+
+@pytest.fixture
+def fx_db(temp_db, tmp_path):
+    """temp_db with RATES_CSV loaded and RAW_CSV ingested."""
+    rates_path = tmp_path / "fx_rates.csv"
+    rates_path.write_text(RATES_CSV)
+    conn = sqlite3.connect(temp_db)
+    with conn:
+        load_fx_rates(conn, rates_path)
+    conn.close()
+    csv_path = tmp_path / "transactions.csv"
+    csv_path.write_text(RAW_CSV)
+    ingest_csv_streaming(csv_path, chunksize=2)
+    return temp_db
+
+
+def test_ingest_stores_reporting_amounts(fx_db):
+    conn = sqlite3.connect(fx_db)
+    rows = dict(conn.execute("SELECT transaction_id, amount_reporting FROM transactions").fetchall())
+    rollup = conn.execute("SELECT SUM(sales_cents), SUM(reporting_cents) FROM sales_rollup").fetchone()
+    cube = conn.execute("SELECT SUM(reporting_cents) FROM sales_cube_monthly WHERE timezone = 'UTC'").fetchone()
+    conn.close()
+
+    assert rows == pytest.approx({"TXN-1": 10.0, "TXN-2": 22.0, "TXN-3": 7.0, "TXN-4": 36.0, "TXN-5": None})
+    assert rollup == (106500, 7500)  # CHF has no rate and adds nothing to reporting_cents
+    assert cube == (7500,)
+
+
+def test_sales_totals_in_requested_currency(fx_db):
+    as_stored = models.get_daily_sales_summary("2024-01-15", "2024-01-16", "UTC", "raw")
+    usd = models.get_daily_sales_summary("2024-01-15", "2024-01-16", "UTC")
+    eur = models.get_daily_sales_summary("2024-01-15", "2024-01-16", "UTC", "EUR")
+
+    assert as_stored["currency"] == "raw"
+    assert [day["total_sales"] for day in as_stored["data"]] == [30.0, 1035.0]
+    assert usd["currency"] == "USD"
+    assert [day["total_sales"] for day in usd["data"]] == [32.0, 43.0]
+    assert [day["total_sales"] for day in eur["data"]] == [round(32 / 1.1, 2), round(43 / 1.2, 2)]
+    assert eur["currency"] == "EUR"
+
+    trend = models.get_period_trend(["2024-01-15", "2024-01-16"], "UTC", "day", "EUR")
+    assert [p["total_sales"] for p in trend["data"]] == [day["total_sales"] for day in eur["data"]]
+    hourly = models.get_hourly_sales_summary("2024-01-16", "UTC", "EUR")
+    assert sum(hour["total_sales"] for hour in hourly["data"]) == pytest.approx(43 / 1.2, abs=0.01)
+
+    with pytest.raises(UnknownCurrency):
+        models.get_daily_sales_summary("2024-01-15", "2024-01-16", "UTC", "CHF")
+
+
+def test_average_order_value_leaves_out_unconverted_rows(fx_db):
+    # TXN-5 (CHF, no rate) counts as a transaction on 2024-01-16 but adds no sales
+    usd = models.get_daily_sales_summary("2024-01-15", "2024-01-16", "UTC")
+    assert [(day["transaction_count"], day["average_order_value"]) for day in usd["data"]] == [(2, 16.0), (3, 21.5)]
+    assert usd["summary"]["unconverted_transactions"] == 1
+    assert models.get_daily_sales_summary("2024-01-15", "2024-01-16", "UTC", "raw")["summary"]["unconverted_transactions"] == 0
+
+    cube = models.get_sales_cube("2024-01-16", "2024-01-16", "UTC", ["category"], None, "EUR")
+    assert [(row["category"], row["transaction_count"], row["average_order_value"]) for row in cube["data"]] == [
+        ("books", 2, 30.0), ("toys", 1, round(7 / 1.2, 2))]
+    assert cube["summary"]["unconverted_transactions"] == 1
+
+
+def test_refuses_amounts_in_another_reporting_currency(fx_db, tmp_path):
+    conn = sqlite3.connect(fx_db)
+    assert stored_reporting_currency(conn) == "USD"
+    with conn:
+        record_reporting_currency(conn, "EUR")
+        bump_data_version(conn)
+    conn.close()
+
+    with pytest.raises(ReportingCurrencyMismatch):
+        models.get_daily_sales_summary("2024-01-15", "2024-01-16", "UTC")
+    assert models.get_daily_sales_summary("2024-01-15", "2024-01-16", "UTC", "raw")["summary"]["total_sales"] == 1065.0
+    csv_path = tmp_path / "more.csv"
+    csv_path.write_text(RAW_CSV)
+    with pytest.raises(ReportingCurrencyMismatch):
+        ingest_csv_streaming(csv_path)
+
+    # Reconverting with rates in REPORTING_CURRENCY records it again
+    conn = sqlite3.connect(fx_db)
+    with conn:
+        reconvert_amounts(conn)
+        refresh_sales_rollup(conn)
+        bump_data_version(conn)
+    conn.close()
+    assert models.get_daily_sales_summary("2024-01-15", "2024-01-16", "UTC")["currency"] == "USD"
+
+
+def test_normalize_currency():
+    assert [normalize_currency(value) for value in (None, "", " eur ", "RAW", "raw")] == ["USD", "USD", "EUR", "raw", "raw"]
+
+
+@pytest.mark.parametrize("currency", ["USD", "EUR", "JPY"])
+def test_sales_cube_converts_each_utc_day(fx_db, currency):
+    # Asia/Kolkata's 2024-01-16 takes in TXN-2, converted at the rate of UTC 2024-01-15
+    daily = models.get_daily_sales_summary("2024-01-15", "2024-01-16", "Asia/Kolkata", currency)
+    cube = models.get_sales_cube("2024-01-15", "2024-01-16", "Asia/Kolkata", ["day"], None, currency)
+    assert [(row["day"], row["total_sales"]) for row in cube["data"]] == [
+        (day["date"], day["total_sales"]) for day in daily["data"]]
+
+    monthly = models.get_sales_cube("2024-01-01", "2024-01-31", "UTC", ["month", "category"], None, currency)
+    assert sum(row["total_sales"] for row in monthly["data"]) == pytest.approx(monthly["summary"]["total_sales"])
+    assert monthly["summary"]["total_sales"] == round(sum(day["total_sales"] for day in models.get_daily_sales_summary(
+        "2024-01-01", "2024-01-31", "UTC", currency)["data"]), 2)
+
+
+def test_reconvert_amounts_with_new_rates(fx_db, tmp_path):
+    rates_path = tmp_path / "new_rates.csv"
+    rates_path.write_text("date,currency,rate\n2024-01-01,EUR,2.0\n2024-01-01,CHF,1.5\n")
+    conn = sqlite3.connect(fx_db)
+    with conn:
+        load_fx_rates(conn, rates_path)
+        missing = reconvert_amounts(conn)
+        refresh_sales_rollup(conn)
+        bump_data_version(conn)
+    conn.close()
+
+    assert missing == 1  # JPY no longer has a rate
+    usd = models.get_daily_sales_summary("2024-01-15", "2024-01-16", "UTC", "USD")
+    assert [day["total_sales"] for day in usd["data"]] == [50.0, 67.5]
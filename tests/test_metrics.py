@@ -0,0 +1,83 @@
+import json
+import logging
+
+import pytest
+
+import models
+from metrics import Registry, ingest_report, ingest_stage, last_ingest_report, registry
+from tests.conftest import insert_processed_rows
+from tests.test_utils import RAW_CSV
+from utils import ingest_csv_streaming
+
+
+def test_render_prometheus_text():
+    reg = Registry(buckets=(0.1, 1))
+    reg.inc("http_requests_total", endpoint="/api/sales/daily", status=200)
+    reg.inc("http_requests_total", endpoint="/api/sales/daily", status=200)
+    reg.observe("http_request_seconds", 0.05, endpoint="/api/sales/daily")
+    reg.observe("http_request_seconds", 0.5, endpoint="/api/sales/daily")
+    reg.observe("http_request_seconds", 5, endpoint="/api/sales/daily")
+    reg.add_collector(lambda: [("result_cache_entries", {}, 3)])
+
+    lines = reg.render().splitlines()
+    assert "# TYPE ecommerce_http_requests_total counter" in lines
+    assert 'ecommerce_http_requests_total{endpoint="/api/sales/daily",status="200"} 2.0' in lines
+    assert 'ecommerce_http_request_seconds_bucket{endpoint="/api/sales/daily",le="0.1"} 1' in lines
+    assert 'ecommerce_http_request_seconds_bucket{endpoint="/api/sales/daily",le="1.0"} 2' in lines
+    assert 'ecommerce_http_request_seconds_bucket{endpoint="/api/sales/daily",le="+Inf"} 3' in lines
+    assert 'ecommerce_http_request_seconds_count{endpoint="/api/sales/daily"} 3' in lines
+    assert "ecommerce_result_cache_entries 3" in lines
+    assert reg.value("http_request_seconds", endpoint="/api/sales/daily") == (3, 5.55)
+
+
+def test_nested_ingest_reports_are_merged():
+    with ingest_report("full") as outer:
+        with ingest_stage("load"):
+            pass
+        with ingest_report("streaming") as inner:
+            with ingest_stage("clean"):
+                pass
+
+    assert inner is outer
+    report = last_ingest_report().as_dict()
+    assert report["mode"] == "full" and report["status"] == "ok"
+    assert set(report["stages"]) == {"load", "clean"}
+
+
+def test_ingest_report_logged_and_counted(temp_db, tmp_path, caplog):
+    csv_path = tmp_path / "transactions.csv"
+    csv_path.write_text(RAW_CSV)
+    runs = registry.value("ingests_total", mode="streaming", status="ok") or 0
+
+    with caplog.at_level(logging.INFO, logger="metrics"):
+        ingest_csv_streaming(csv_path, chunksize=2)
+
+    report = last_ingest_report().as_dict()
+    assert report["mode"] == "streaming"
+    assert report["rows"]["read"] == report["rows"]["inserted"] == 6
+    assert {"load", "clean", "near_duplicates", "insert", "rollup", "quality_scan"} <= set(report["stages"])
+    assert registry.value("ingests_total", mode="streaming", status="ok") == runs + 1
+
+    logged = [r.getMessage() for r in caplog.records if r.name == "metrics"]
+    assert json.loads(logged[-1].split(": ", 1)[1]) == report
+
+
+def test_failed_ingest_is_reported():
+    with pytest.raises(RuntimeError):
+        with ingest_report("incremental"):
+            raise RuntimeError("boom")
+    assert last_ingest_report().status == "failed"
+
+
+def test_query_phases_recorded(temp_db):
+    insert_processed_rows(temp_db, [("TXN-1", "2024-01-15 12:00:00", 20.0)])
+    models.result_cache.clear()
+    before = {
+        phase: (registry.value("query_phase_seconds", query="daily", phase=phase) or (0, 0))[0]
+        for phase in ("fetch", "to_datetime", "tz_convert", "groupby", "serialize")
+    }
+
+    models.get_daily_sales_summary("2024-01-01", "2024-01-31", "UTC")
+
+    for phase, count in before.items():
+        assert registry.value("query_phase_seconds", query="daily", phase=phase)[0] == count + 1
@@ -0,0 +1,221 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+import models
+import utils
+from models import (
+    InvalidCubeQuery, InvalidCursor, get_daily_sales_page, get_daily_sales_summary, get_hourly_sales_summary,
+    get_period_comparison, get_period_trend, get_sales_cube, iter_daily_sales
+)
+from tests.conftest import insert_processed_rows
+
+
+def test_daily_summary_uses_local_day_boundaries(temp_db):
+    insert_processed_rows(temp_db, [
+        ("TXN-1", "2024-01-15 04:59:59", 10.0),  # 2024-01-14 23:59:59 in New York
+        ("TXN-2", "2024-01-15 05:00:00", 20.0),  # 2024-01-15 00:00:00 in New York
+        ("TXN-3", "2024-01-16 04:59:59", 30.0),  # 2024-01-15 23:59:59 in New York
+        ("TXN-4", "2024-01-16 05:00:00", 40.0),  # 2024-01-16 00:00:00 in New York
+    ])
+
+    result = get_daily_sales_summary("2024-01-15", "2024-01-15", "America/New_York")
+
+    assert result["data"] == [{
+        "date": "2024-01-15",
+        "total_sales": 50.0,
+        "transaction_count": 2,
+        "average_order_value": 25.0,
+    }]
+    assert result["summary"]["total_transactions"] == 2
+
+
+def test_daily_summary_empty_range(temp_db):
+    insert_processed_rows(temp_db, [("TXN-1", "2024-01-15 12:00:00", 10.0)])
+
+    result = get_daily_sales_summary("2024-02-01", "2024-02-28", "UTC")
+
+    assert result["data"] == []
+    assert result["summary"]["total_sales"] == 0
+
+
+def test_daily_pages_and_stream_match_summary(temp_db):
+    insert_processed_rows(temp_db, [
+        (f"TXN-{day}", f"2024-01-{day:02d} 23:30:00", float(day)) for day in range(1, 32)
+    ])
+    expected = get_daily_sales_summary("2024-01-01", "2024-01-31", "Asia/Kolkata")["data"]
+
+    assert list(iter_daily_sales("2024-01-01", "2024-01-31", "Asia/Kolkata", batch_size=7)) == expected
+
+    pages, cursor = [], None
+    while True:
+        page = get_daily_sales_page("2024-01-01", "2024-01-31", "Asia/Kolkata", 10, cursor)
+        assert len(page["data"]) <= 10
+        pages.extend(page["data"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert pages == expected
+
+    with pytest.raises(InvalidCursor):
+        get_daily_sales_page("2024-02-01", "2024-02-28", "UTC", 10, get_daily_sales_page(
+            "2024-01-01", "2024-01-31", "UTC", 10)["next_cursor"])
+    with pytest.raises(InvalidCursor):
+        get_daily_sales_page("2024-01-01", "2024-01-31", "UTC", 10, "not a cursor")
+
+
+def test_hourly_summary_from_rollup_buckets(temp_db):
+    insert_processed_rows(temp_db, [
+        ("TXN-1", "2024-01-15 10:00:00", 0.1),
+        ("TXN-2", "2024-01-15 10:14:59", 0.2),  # same 15-minute bucket
+        ("TXN-3", "2024-01-15 10:45:00", 1.05),
+        ("TXN-4", "2024-01-15 11:00:00", 5.0),
+        ("TXN-5", "2024-01-15 19:00:00", 7.0),  # 2024-01-16 00:30 in Kolkata
+    ])
+
+    result = get_hourly_sales_summary("2024-01-15", "Asia/Kolkata")
+
+    assert len(result["data"]) == 24
+    assert [row for row in result["data"] if row["transaction_count"]] == [
+        {"hour": "2024-01-15 15:00:00", "utc_offset": "+05:30", "total_sales": 0.3, "transaction_count": 2},
+        {"hour": "2024-01-15 16:00:00", "utc_offset": "+05:30", "total_sales": 6.05, "transaction_count": 2},
+    ]
+
+
+def test_hourly_summary_dst_days(temp_db):
+    insert_processed_rows(temp_db, [
+        ("TXN-1", "2024-11-03 05:30:00", 10.0),  # 01:30 EDT
+        ("TXN-2", "2024-11-03 06:30:00", 20.0),  # 01:30 EST
+    ])
+
+    fall_back = get_hourly_sales_summary("2024-11-03", "America/New_York")["data"]
+    spring_forward = get_hourly_sales_summary("2024-03-10", "America/New_York")["data"]
+
+    assert len(fall_back) == 25
+    assert len(spring_forward) == 23
+    assert "2024-03-10 02:00:00" not in [row["hour"] for row in spring_forward]
+    assert fall_back[1:3] == [
+        {"hour": "2024-11-03 01:00:00", "utc_offset": "-04:00", "total_sales": 10.0, "transaction_count": 1},
+        {"hour": "2024-11-03 01:00:00", "utc_offset": "-05:00", "total_sales": 20.0, "transaction_count": 1},
+    ]
+
+
+def test_period_comparison_from_rollup_buckets(temp_db):
+    insert_processed_rows(temp_db, [
+        ("TXN-1", "2024-01-01 00:00:00", 10.0),
+        ("TXN-2", "2024-01-31 23:59:59", 15.5),
+        ("TXN-3", "2024-02-01 00:00:00", 51.0),
+    ])
+
+    result = get_period_comparison("2024-01", "2024-02", "UTC")
+
+    assert result["period1"]["total_sales"] == 25.5
+    assert result["period1"]["transaction_count"] == 2
+    assert result["period2"]["total_sales"] == 51.0
+    assert result["growth"] == {"sales_change_percent": 100.0, "transaction_change_percent": -50.0}
+
+
+def test_period_comparison_uses_local_month_bounds(temp_db):
+    insert_processed_rows(temp_db, [
+        ("TXN-1", "2024-02-01 03:00:00", 10.0),  # 2024-01-31 22:00 in New York
+        ("TXN-2", "2024-02-01 05:00:00", 20.0),  # 2024-02-01 00:00 in New York
+    ])
+
+    result = get_period_comparison("2024-01", "2024-02", "America/New_York")
+
+    assert result["period1"]["total_sales"] == 10.0
+    assert result["period2"]["total_sales"] == 20.0
+
+
+def test_period_trend_daily_across_dst(temp_db):
+    insert_processed_rows(temp_db, [
+        ("TXN-1", "2024-03-10 05:00:00", 1.0),   # 00:00 EST, start of the 23-hour day
+        ("TXN-2", "2024-03-11 03:59:59", 2.0),   # 23:59:59 EDT, end of the 23-hour day
+        ("TXN-3", "2024-03-11 04:00:00", 4.0),   # 00:00 EDT on the next day
+    ])
+
+    result = get_period_trend(["2024-03-09", "2024-03-10", "2024-03-11"], "America/New_York", "day")
+
+    assert [(p["total_sales"], p["transaction_count"]) for p in result["data"]] == [(0, 0), (3.0, 2), (4.0, 1)]
+    assert result["data"][1]["sales_change_percent"] is None
+    assert result["data"][2]["sales_change_percent"] == 33.33
+
+
+def test_cached_results_invalidated_by_new_load(temp_db):
+    insert_processed_rows(temp_db, [("TXN-1", "2024-01-15 12:00:00", 10.0)])
+    first = get_daily_sales_summary("2024-01-15", "2024-01-15", "UTC")
+    assert get_daily_sales_summary("2024-01-15", "2024-01-15", "UTC") is first
+
+    insert_processed_rows(temp_db, [("TXN-2", "2024-01-15 13:00:00", 5.0)])
+
+    assert get_daily_sales_summary("2024-01-15", "2024-01-15", "UTC")["summary"]["total_sales"] == 15.0
+
+
+def insert_cube_rows(db_path):
+    insert_processed_rows(db_path, [
+        ("TXN-1", "2024-01-31 23:30:00", 10.0),  # 2024-01-31 18:30 in New York
+        ("TXN-2", "2024-02-01 04:59:59", 20.0),  # 2024-01-31 23:59:59 in New York
+        ("TXN-3", "2024-02-01 05:00:00", 40.0),  # 2024-02-01 00:00 in New York
+        ("TXN-4", "2024-02-15 12:00:00", 80.0),
+        ("TXN-5", "2024-03-10 06:30:00", 160.0),  # 01:30 EST, the day clocks spring forward
+    ])
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE transactions SET product_category = 'toys', currency = 'EUR' WHERE transaction_id IN ('TXN-2', 'TXN-4')")
+    utils.refresh_sales_rollup(conn)
+    utils.bump_data_version(conn)
+    conn.commit()
+    conn.close()
+
+
+def test_sales_cube_groups_by_dimensions_and_local_buckets(temp_db):
+    insert_cube_rows(temp_db)
+
+    result = get_sales_cube("2024-01-01", "2024-03-31", "America/New_York", ["month", "category"])
+    assert result["data"] == [
+        {"month": "2024-01", "category": "books", "total_sales": 10.0, "transaction_count": 1, "average_order_value": 10.0},
+        {"month": "2024-01", "category": "toys", "total_sales": 20.0, "transaction_count": 1, "average_order_value": 20.0},
+        {"month": "2024-02", "category": "books", "total_sales": 40.0, "transaction_count": 1, "average_order_value": 40.0},
+        {"month": "2024-02", "category": "toys", "total_sales": 80.0, "transaction_count": 1, "average_order_value": 80.0},
+        {"month": "2024-03", "category": "books", "total_sales": 160.0, "transaction_count": 1, "average_order_value": 160.0},
+    ]
+    assert result["summary"] == {"total_sales": 310.0, "total_transactions": 5, "unconverted_transactions": 0}
+
+    # Filters, a clipped range and a bucket-free total
+    assert get_sales_cube("2024-01-31", "2024-02-29", "America/New_York", [], {"currency": ["EUR"]})["data"] == [
+        {"total_sales": 100.0, "transaction_count": 2, "average_order_value": 50.0}]
+    hours = get_sales_cube("2024-03-10", "2024-03-10", "America/New_York", ["hour"])["data"]
+    assert [row["hour"] for row in hours] == ["2024-03-10T01:00:00-05:00"]
+
+
+@pytest.mark.parametrize("grain", ["day", "week", "month", "quarter"])
+def test_sales_cube_same_from_local_cells_and_utc_cells(temp_db, monkeypatch, grain):
+    insert_cube_rows(temp_db)
+    args = ("2024-01-15", "2024-03-20", "America/New_York", [grain, "currency"])
+    from_utc_cells = get_sales_cube(*args)
+
+    # Newly configured timezones are served from UTC cells until a full refresh builds them
+    monkeypatch.setattr(utils, "SALES_CUBE_TIMEZONES", ["UTC", "America/New_York"])
+    conn = sqlite3.connect(temp_db)
+    utils.refresh_sales_rollup(conn, pd.to_datetime(["2024-02-15 12:00:00"], utc=True))
+    utils.bump_data_version(conn)
+    conn.commit()
+    assert utils.built_cube_timezones(conn) == {"UTC"}
+    assert get_sales_cube(*args) == from_utc_cells
+
+    utils.refresh_sales_rollup(conn)
+    utils.bump_data_version(conn)
+    conn.commit()
+    assert utils.built_cube_timezones(conn) == {"UTC", "America/New_York"}
+    conn.close()
+
+    assert get_sales_cube(*args) == from_utc_cells
+
+
+def test_sales_cube_rejects_bad_dimensions(temp_db):
+    with pytest.raises(InvalidCubeQuery):
+        get_sales_cube("2024-01-01", "2024-01-31", "UTC", ["customer"])
+    with pytest.raises(InvalidCubeQuery):
+        get_sales_cube("2024-01-01", "2024-01-31", "UTC", ["day", "month"])
+    with pytest.raises(InvalidCubeQuery):
+        get_sales_cube("2020-01-01", "2024-12-31", "UTC", ["hour"])
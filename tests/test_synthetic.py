@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import format_epochs, generate_transactions, write_transactions
+from setup_db import SAMPLE_DATE_FORMATS, SAMPLE_PROBLEM_RECORDS
+from utils import QUALITY_BITS, clean_and_enrich_transactions, detect_near_duplicates, load_transaction_data
+
+
+def test_format_epochs_matches_strftime():
+    epochs = np.array([0, 1704067200 + 13 * 3600 + 61, 1730597400, 1709000000])
+    for fmt in SAMPLE_DATE_FORMATS + ["%H:%M %d/%m/%Y"]:
+        expected = pd.Series(pd.to_datetime(epochs, unit="s")).dt.strftime(fmt).tolist()
+        assert format_epochs(epochs, fmt).tolist() == expected
+
+
+def test_generator_is_seeded_and_chunked():
+    first = pd.concat(generate_transactions(5000, seed=7, chunk_rows=2000), ignore_index=True)
+    second = pd.concat(generate_transactions(5000, seed=7, chunk_rows=2000), ignore_index=True)
+    other = pd.concat(generate_transactions(5000, seed=8, chunk_rows=2000), ignore_index=True)
+
+    pd.testing.assert_frame_equal(first, second)
+    assert not first["amount"].equals(other["amount"])
+    assert len(first) == 5000 + len(SAMPLE_PROBLEM_RECORDS)
+    assert first["transaction_id"].is_unique
+    assert first["transaction_id"].iloc[-1] == SAMPLE_PROBLEM_RECORDS[-1]["transaction_id"]
+
+
+def test_mix_and_rates(tmp_path):
+    csv_path = tmp_path / "transactions.csv"
+    rows = write_transactions(
+        csv_path, 4000, seed=1, formats=["%Y-%m-%dT%H:%M:%SZ"], timezones={"UTC": 3, "Asia/Tokyo": 1},
+        duplicate_rate=0.05, out_of_order_rate=0.05, problem_records=False, chunk_rows=1500,
+    )
+    raw = load_transaction_data(csv_path)
+    assert rows == len(raw) == 4000
+    assert set(raw["timezone"]) == {"UTC", "Asia/Tokyo"}
+    assert 0.65 < (raw["timezone"] == "UTC").mean() < 0.85
+
+    df = clean_and_enrich_transactions(raw[raw["timezone"] == "UTC"].reset_index(drop=True))
+    assert df["processed_timestamp"].notna().all()
+    duplicated = raw["timestamp"].str.contains(" ").to_numpy()[(raw["timezone"] == "UTC").to_numpy()]
+    assert 0.02 < duplicated.mean() < 0.08
+    assert len(detect_near_duplicates(df)) >= duplicated.sum()
+    out_of_order = df["data_quality_bits"].to_numpy() & QUALITY_BITS["out_of_order"]
+    assert 0.02 < np.count_nonzero(out_of_order) / len(df) < 0.08
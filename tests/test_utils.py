@@ -0,0 +1,384 @@
+import json
+import sqlite3
+import pandas as pd
+
+import models
+import utils
+
+from setup_db import SECONDARY_INDEXES, setup_database
+from utils import (
+    QUALITY_ISSUES,
+    bits_from_flags,
+    clean_and_enrich_transactions,
+    detect_near_duplicates,
+    detect_out_of_order,
+    ingest_csv_parallel,
+    ingest_csv_streaming,
+    ingest_incremental,
+    insert_clean_data_into_db,
+    current_quality_counts,
+    load_transaction_data,
+    flags_from_bits,
+    refresh_sales_rollup,
+)
+
+
+def make_raw(rows):
+    return pd.DataFrame(rows, columns=["transaction_id", "timestamp", "timezone"])
+
+
+def issues(df):
+    return [json.loads(flags).get("issues", []) for flags in df["data_quality_flags"]]
+
+
+def test_clean_and_enrich_flags():
+    df = make_raw([
+        ("TXN-1", "2024-01-15 12:00:00", "UTC"),
+        ("TXN-2", "2024-13-45 25:99:99", "UTC"),
+        ("TXN-3", "2024-01-15 11:00:00", float("nan")),
+    ])
+
+    result = clean_and_enrich_transactions(df)
+
+    assert str(result["processed_timestamp"].dtype) == "datetime64[ns, UTC]"
+    assert issues(result) == [
+        [],
+        ["invalid_date_format"],
+        # A missing timezone reads as "nan", which is not a fuzzy match
+        ["missing_timezone", "out_of_order"],
+    ]
+    assert result["data_quality_bits"].tolist() == [0, 1, 6]
+
+
+def test_clean_and_enrich_flags_dst_times():
+    df = make_raw([
+        ("TXN-1", "10-Mar-2024 02:30", "America/New_York"),
+        ("TXN-2", "03-Nov-2024 01:30", "America/New_York"),
+        ("TXN-3", "03-Nov-2024 03:30", "new_york"),
+    ])
+
+    assert issues(clean_and_enrich_transactions(df)) == [
+        ["nonexistent_dst"],
+        ["ambiguous_dst"],
+        ["fuzzy_timezone_match"],
+    ]
+
+
+def test_flag_bits_round_trip_json():
+    every = list(range(1 << len(QUALITY_ISSUES)))
+    flags = flags_from_bits(every)
+
+    assert flags[0] == "{}"
+    assert json.loads(flags[-1]) == {"issues": list(QUALITY_ISSUES)}
+    assert bits_from_flags(flags).tolist() == every
+    # Rows written elsewhere: missing flags and a different key layout
+    assert bits_from_flags([None, '{"issues": ["duplicate_candidate", "invalid_date_format"]}']).tolist() == [0, 9]
+
+
+def test_flags_column_is_derived_from_bits(temp_db):
+    conn = sqlite3.connect(temp_db)
+    conn.executemany(
+        "INSERT INTO transactions (transaction_id, customer_id, amount, currency, original_timestamp, "
+        "status, product_category, data_quality_bits) VALUES (?, 'C', 1, 'USD', '', 'completed', 'books', ?)",
+        [(f"TXN-{bits}", bits) for bits in range(1 << len(QUALITY_ISSUES))],
+    )
+    stored = [row[0] for row in conn.execute("SELECT data_quality_flags FROM transactions ORDER BY data_quality_bits")]
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT COUNT(*) FROM transactions WHERE data_quality_bits != 0 AND data_quality_bits & 8"
+    ).fetchall()
+    conn.close()
+
+    assert stored == flags_from_bits(range(1 << len(QUALITY_ISSUES))).tolist()
+    assert "idx_data_quality_bits" in plan[0][-1]
+
+
+def test_setup_migrates_json_flags_to_bits(tmp_path):
+    db_path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+    CREATE TABLE transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, transaction_id TEXT UNIQUE NOT NULL, customer_id TEXT NOT NULL,
+        amount DECIMAL(10,2) NOT NULL, currency TEXT NOT NULL, original_timestamp TEXT NOT NULL,
+        original_timezone TEXT, processed_timestamp DATETIME, processed_epoch INTEGER,
+        processed_timezone TEXT DEFAULT 'UTC', status TEXT NOT NULL, product_category TEXT NOT NULL,
+        data_quality_flags TEXT, created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    old_flags = ["{}", '{"issues": ["missing_timezone", "out_of_order", "duplicate_candidate"]}', None]
+    conn.executemany(
+        "INSERT INTO transactions (transaction_id, customer_id, amount, currency, original_timestamp, "
+        "status, product_category, data_quality_flags) VALUES (?, 'C', 1, 'USD', '', 'completed', 'books', ?)",
+        [(f"TXN-{i}", flags) for i, flags in enumerate(old_flags)],
+    )
+    conn.commit()
+    conn.close()
+
+    setup_database(db_path)
+
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT data_quality_bits, data_quality_flags FROM transactions ORDER BY id").fetchall()
+    conn.close()
+    assert rows == [(0, "{}"), (14, old_flags[1]), (0, "{}")]
+
+
+# The transactions and data_quality_summary tables as first released
+BASELINE_SCHEMA = """
+CREATE TABLE transactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, transaction_id TEXT UNIQUE NOT NULL, customer_id TEXT NOT NULL,
+    amount DECIMAL(10,2) NOT NULL, currency TEXT NOT NULL, original_timestamp TEXT NOT NULL,
+    original_timezone TEXT, processed_timestamp DATETIME, processed_timezone TEXT DEFAULT 'UTC',
+    status TEXT NOT NULL, product_category TEXT NOT NULL, data_quality_flags TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE data_quality_summary (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, total_records INTEGER, invalid_dates INTEGER DEFAULT 0,
+    missing_timezones INTEGER DEFAULT 0, duplicate_transactions INTEGER DEFAULT 0,
+    out_of_order_records INTEGER DEFAULT 0, other_issues INTEGER DEFAULT 0,
+    last_updated DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+
+def test_setup_upgrades_baseline_quality_summary(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "baseline.db")
+    conn = sqlite3.connect(db_path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.executemany(
+        "INSERT INTO transactions (transaction_id, customer_id, amount, currency, original_timestamp, "
+        "processed_timestamp, status, product_category, data_quality_flags) "
+        "VALUES (?, 'C', 1, 'USD', '', '2024-01-01 00:00:00', 'completed', 'books', ?)",
+        [("OLD-1", '{"issues": ["missing_timezone"]}'), ("OLD-2", "{}")],
+    )
+    conn.execute("INSERT INTO data_quality_summary (total_records, missing_timezones) VALUES (2, 1)")
+    conn.commit()
+    conn.close()
+
+    setup_database(db_path)
+
+    conn = sqlite3.connect(db_path)
+    counts = current_quality_counts(conn)
+    conn.close()
+    assert (counts["total_records"], counts["missing_timezones"]) == (2, 1)
+
+    monkeypatch.setattr(models, "DATABASE_PATH", db_path)
+    monkeypatch.setattr(utils, "DATABASE_PATH", db_path)
+    csv_path = tmp_path / "transactions.csv"
+    csv_path.write_text(RAW_CSV)
+    try:
+        assert ingest_csv_streaming(csv_path, chunksize=2) == 6
+        report = models.get_data_quality_report()
+    finally:
+        models.read_pool.close_all()
+    assert report["total_records"] == 6
+    assert report["issues_found"]["missing_timezones"] == 1
+
+
+def test_detect_out_of_order_skips_null_rows():
+    df = pd.DataFrame({"processed_timestamp": pd.to_datetime(
+        ["2024-01-02", None, "2024-01-01", "2024-01-03", "2024-01-02"], utc=True)})
+
+    assert detect_out_of_order(df) == [2, 4]
+
+
+def make_processed(rows):
+    df = pd.DataFrame(rows, columns=["customer_id", "amount", "status", "product_category", "processed_timestamp"])
+    df["processed_timestamp"] = pd.to_datetime(df["processed_timestamp"], utc=True)
+    return df
+
+
+def test_detect_near_duplicates_marks_earlier_row():
+    df = make_processed([
+        ("CUST-1", 10.0, "completed", "books", "2024-01-01 00:00:00"),
+        ("CUST-1", 10.0, "completed", "books", "2024-01-01 00:00:05"),
+        ("CUST-1", 10.0, "completed", "books", "2024-01-01 00:01:00"),  # outside threshold
+        ("CUST-1", 10.0, "pending", "books", "2024-01-01 00:01:01"),    # different status
+    ])
+
+    assert detect_near_duplicates(df) == {0}
+
+
+def test_detect_near_duplicates_across_interleaved_rows():
+    df = make_processed([
+        ("CUST-1", 10.0, "completed", "books", "2024-01-01 00:00:00"),
+        ("CUST-2", 99.0, "completed", "home", "2024-01-01 00:00:02"),
+        ("CUST-1", 10.0, "completed", "books", "2024-01-01 00:00:04"),
+        ("CUST-1", 10.0, "completed", "books", None),
+    ])
+
+    assert detect_near_duplicates(df) == {0}
+
+
+RAW_CSV = """transaction_id,customer_id,amount,currency,timestamp,timezone,status,product_category
+TXN-1,CUST-1,10.00,USD,2024-01-15 12:00:00,UTC,completed,books
+TXN-2,CUST-2,20.00,USD,2024-01-15 12:00:01,UTC,completed,home
+TXN-3,CUST-1,10.00,USD,2024-01-15 12:00:04,UTC,completed,books
+TXN-4,CUST-3,30.00,EUR,2024-01-15 11:00:00,,pending,toys
+TXN-5,CUST-4,40.00,USD,not a date,UTC,failed,beauty
+TXN-6,CUST-5,50.00,GBP,15-Jan-2024 14:30,Europe/London,completed,sports
+"""
+
+
+def load_table(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(
+        "SELECT transaction_id, processed_timestamp, original_timezone, data_quality_flags "
+        "FROM transactions ORDER BY transaction_id"
+    ).fetchall()
+    conn.close()
+    return rows
+
+
+def test_streaming_ingest_matches_whole_file_load(temp_db, tmp_path):
+    csv_path = tmp_path / "transactions.csv"
+    csv_path.write_text(RAW_CSV)
+
+    df = clean_and_enrich_transactions(load_transaction_data(csv_path))
+    insert_clean_data_into_db(df)
+    expected = load_table(temp_db)
+
+    assert ingest_csv_streaming(csv_path, chunksize=2) == 6
+    assert load_table(temp_db) == expected
+    assert json.loads(expected[0][3]) == {"issues": ["duplicate_candidate"]}
+
+
+def test_streaming_ingest_is_invisible_until_complete(temp_db, tmp_path, monkeypatch):
+    csv_path = tmp_path / "transactions.csv"
+    csv_path.write_text(RAW_CSV)
+    ingest_csv_streaming(csv_path, chunksize=2)
+    reader = sqlite3.connect(temp_db)
+    before = reader.execute("SELECT COUNT(*), (SELECT SUM(transaction_count) FROM sales_rollup), "
+                            "(SELECT user_version FROM pragma_user_version) FROM transactions").fetchone()
+
+    seen = []
+    clean = utils.clean_and_enrich_transactions
+
+    def clean_and_look(chunk, **kwargs):
+        seen.append(reader.execute("SELECT COUNT(*), (SELECT SUM(transaction_count) FROM sales_rollup), "
+                                   "(SELECT user_version FROM pragma_user_version) FROM transactions").fetchone())
+        return clean(chunk, **kwargs)
+
+    monkeypatch.setattr(utils, "clean_and_enrich_transactions", clean_and_look)
+    ingest_csv_streaming(csv_path, chunksize=2)
+
+    assert len(seen) == 3 and set(seen) == {before}
+    assert reader.execute("SELECT user_version FROM pragma_user_version").fetchone()[0] == before[2] + 1
+    reader.close()
+
+
+def test_bulk_load_rebuilds_indexes(temp_db, tmp_path):
+    csv_path = tmp_path / "transactions.csv"
+    csv_path.write_text(RAW_CSV)
+
+    ingest_csv_streaming(csv_path, chunksize=2)
+    expected = load_table(temp_db)
+    insert_clean_data_into_db(clean_and_enrich_transactions(load_transaction_data(csv_path)), bulk=True)
+
+    assert load_table(temp_db) == expected
+    conn = sqlite3.connect(temp_db)
+    indexes = {name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert set(SECONDARY_INDEXES) <= indexes
+    assert "idx_transaction_id" not in indexes
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()[0] > 0
+    conn.close()
+
+
+def test_parallel_ingest_matches_streaming(temp_db, tmp_path):
+    csv_path = tmp_path / "transactions.csv"
+    csv_path.write_text(RAW_CSV)
+
+    ingest_csv_streaming(csv_path, chunksize=2)
+    expected = load_table(temp_db)
+
+    # TXN-4 opens the second chunk and is out of order only relative to the first
+    assert ingest_csv_parallel(csv_path, workers=2, chunksize=3) == 6
+    assert load_table(temp_db) == expected
+    assert load_rollup(temp_db) != []
+
+
+def test_incremental_ingest_inserts_updates_and_reflags(temp_db, tmp_path):
+    csv_path = tmp_path / "transactions.csv"
+    csv_path.write_text(RAW_CSV)
+    raw = load_transaction_data(csv_path)
+
+    assert ingest_incremental(raw.iloc[:2]) == {"inserted": 2, "updated": 0, "unchanged": 0}
+    assert ingest_incremental(raw) == {"inserted": 4, "updated": 0, "unchanged": 2}
+    rows = {txn_id: json.loads(flags) for txn_id, _, _, flags in load_table(temp_db)}
+    assert rows["TXN-1"] == {"issues": ["duplicate_candidate"]}
+    assert rows["TXN-4"] == {"issues": ["missing_timezone", "out_of_order"]}
+
+    # Moving TXN-3 away from TXN-1 clears the duplicate flag on TXN-1
+    moved = raw[raw["transaction_id"] == "TXN-3"].copy()
+    moved["timestamp"] = "2024-01-15 13:00:00"
+    assert ingest_incremental(moved) == {"inserted": 0, "updated": 1, "unchanged": 0}
+    rows = {txn_id: (ts, json.loads(flags)) for txn_id, ts, _, flags in load_table(temp_db)}
+    assert rows["TXN-1"] == ("2024-01-15 12:00:00", {})
+    assert rows["TXN-3"][0] == "2024-01-15 13:00:00"
+
+
+def load_rollup(db_path, table="sales_rollup"):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2, 3, 4").fetchall()
+    conn.close()
+    return rows
+
+
+CUBE_TABLES = ("sales_cube", "sales_cube_daily", "sales_cube_monthly")
+
+
+def test_incremental_ingest_keeps_rollup_in_sync(temp_db, tmp_path):
+    csv_path = tmp_path / "transactions.csv"
+    csv_path.write_text(RAW_CSV)
+    raw = load_transaction_data(csv_path)
+
+    ingest_incremental(raw)
+    moved = raw[raw["transaction_id"] == "TXN-3"].copy()
+    moved["timestamp"] = "2024-01-15 13:00:00"
+    ingest_incremental(moved)
+    incremental = load_rollup(temp_db)
+    incremental_cube = [load_rollup(temp_db, table) for table in CUBE_TABLES]
+
+    conn = sqlite3.connect(temp_db)
+    refresh_sales_rollup(conn)
+    conn.commit()
+    conn.close()
+
+    assert incremental == load_rollup(temp_db)
+    assert incremental_cube == [load_rollup(temp_db, table) for table in CUBE_TABLES]
+    assert sum(row[-3] for row in incremental_cube[2]) == len(raw) - 1
+    assert sum(count for _, _, count, _, _, _ in incremental) == len(raw) - 1  # one unparseable timestamp
+
+
+def quality_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(
+        "SELECT scope, total_records, invalid_dates, missing_timezones, duplicate_transactions, "
+        "out_of_order_records FROM data_quality_summary ORDER BY id"
+    ).fetchall()
+    conn.close()
+    return rows
+
+
+def test_loads_record_data_quality_counts(temp_db, tmp_path):
+    csv_path = tmp_path / "transactions.csv"
+    csv_path.write_text(RAW_CSV)
+    raw = load_transaction_data(csv_path)
+
+    ingest_csv_streaming(csv_path, chunksize=2)
+    assert quality_rows(temp_db) == [("load", 6, 1, 1, 1, 1), ("cumulative", 6, 1, 1, 1, 1)]
+
+    # Moving TXN-3 clears the duplicate flag on TXN-1; it arrives after TXN-6, so is out of order
+    moved = raw[raw["transaction_id"] == "TXN-3"].copy()
+    moved["timestamp"] = "2024-01-15 13:00:00"
+    ingest_incremental(moved)
+    assert quality_rows(temp_db)[-2:] == [("load", 1, 0, 0, 0, 1), ("cumulative", 6, 1, 1, 0, 2)]
+
+    conn = sqlite3.connect(temp_db)
+    conn.execute("DELETE FROM data_quality_summary")
+    assert current_quality_counts(conn) == {
+        "total_records": 6, "invalid_dates": 1, "missing_timezones": 1,
+        "duplicate_transactions": 0, "out_of_order_records": 2,
+        "ambiguous_dst_times": 0, "nonexistent_dst_times": 0, "fuzzy_timezone_matches": 0,
+    }
+    conn.close()
@@ -1,47 +1,116 @@
 import pandas as pd
+import numpy as np
 import json
-from date_utils import parse_timestamp
-from collections import defaultdict
+import logging
+from date_utils import DB_TIMESTAMP_FORMAT, MISSING_TIMEZONE_VALUES, local_midnight_to_utc, parse_timestamps
+from collections import defaultdict, deque
+import os
 import sqlite3
-from config import DATABASE_PATH
-from datetime import datetime
-
-def load_transaction_data(csv_path):
-    return pd.read_csv(csv_path)
-
-def clean_and_enrich_transactions(df):
-    processed_timestamps = []
-    quality_flags = []
-
-    for _, row in df.iterrows():
-        flags = []
-
-        timestamp = str(row.get("timestamp", "")).strip()
-        timezone = str(row.get("timezone", "")).strip()
-
-        parsed_dt = parse_timestamp(timestamp, timezone)
-        if parsed_dt is None:
-            flags.append("invalid_date_format")
-
-        if timezone in ("", "nan", "NaN"):
-            flags.append("missing_timezone")
-
-        processed_timestamps.append(parsed_dt)
-        quality_flags.append(flags)
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from itertools import islice
+from config import (
+    ANALYTICS_BACKEND, DATABASE_PATH, INGEST_WORKERS, INSERT_BATCH_SIZE, PARQUET_SNAPSHOT_DIR,
+    SALES_CUBE_TIMEZONES, SALES_ROLLUP_BUCKET_SECONDS
+)
+from datetime import datetime, timedelta
+from fx import ingest_fx_table
+from metrics import count_rows, ingest_report, ingest_stage, timed_chunks
+from setup_db import DATA_QUALITY_COLUMNS, QUALITY_ISSUES, SECONDARY_INDEXES
+
+logger = logging.getLogger(__name__)
+
+# Raw CSV columns are read as strings so every chunk of a streamed file
+# gets the same dtypes regardless of which values it happens to contain.
+CSV_DTYPES = {
+    "transaction_id": str,
+    "customer_id": str,
+    "currency": str,
+    "timestamp": str,
+    "timezone": str,
+    "status": str,
+    "product_category": str,
+}
+
+# Bit each data-quality issue sets in a row's data_quality_bits
+QUALITY_BITS = {issue: 1 << i for i, issue in enumerate(QUALITY_ISSUES)}
+
+
+def _flags_json_table():
+    table = []
+    for bits in range(1 << len(QUALITY_ISSUES)):
+        issues = [issue for issue in QUALITY_ISSUES if bits & QUALITY_BITS[issue]]
+        table.append(json.dumps({"issues": issues} if issues else {}))
+    return np.array(table, dtype=object)
+
+
+# data_quality_flags JSON for every bitmask, so rows never go through json
+FLAGS_JSON = _flags_json_table()
+FLAGS_BITS = {flags_json: bits for bits, flags_json in enumerate(FLAGS_JSON)}
+
+
+def flags_from_bits(bits):
+    """data_quality_flags JSON strings for an array of bitmasks."""
+    return FLAGS_JSON[np.asarray(bits, dtype="int64")]
+
+
+def bits_from_flags(flags):
+    """Bitmasks for data_quality_flags JSON strings (None counts as no issues)."""
+    flags = pd.Series(flags, dtype=object).fillna("{}")
+    bits = flags.map(FLAGS_BITS)
+    unknown = bits.isna()
+    if unknown.any():
+        # Not written by flags_from_bits (e.g. different key order): look for each issue
+        other = flags[unknown]
+        bits[unknown] = sum(
+            other.str.contains(f'"{issue}"', regex=False).astype("int64") * bit
+            for issue, bit in QUALITY_BITS.items()
+        )
+    return bits.to_numpy(dtype="int64")
 
-    df["processed_timestamp"] = processed_timestamps
 
-    # 🔁 Detect out-of-order rows
-    out_of_order_idxs = detect_out_of_order(df)
+def _quality_bits(df):
+    if "data_quality_bits" in df:
+        return df["data_quality_bits"].to_numpy(dtype="int64")
+    return bits_from_flags(df["data_quality_flags"])
 
-    # 🔁 Add flags as JSON with combined logic
-    final_flags = []
-    for idx, flags in enumerate(quality_flags):
-        if idx in out_of_order_idxs:
-            flags.append("out_of_order")
-        final_flags.append(json.dumps({"issues": flags} if flags else {}))
+def load_transaction_data(csv_path, chunksize=None):
+    """
+    Read the raw transactions CSV. With `chunksize`, return an iterator of
+    DataFrames of at most that many rows instead of the whole file.
+    """
+    if chunksize:
+        return timed_chunks(pd.read_csv(csv_path, dtype=CSV_DTYPES, chunksize=chunksize))
+    with ingest_stage("load"):
+        df = pd.read_csv(csv_path, dtype=CSV_DTYPES)
+    count_rows("read", len(df))
+    return df
 
-    df["data_quality_flags"] = final_flags
+def clean_and_enrich_transactions(df, prev_timestamp=None):
+    with ingest_stage("clean"):
+        return _clean_and_enrich(df, prev_timestamp)
+
+
+def _clean_and_enrich(df, prev_timestamp):
+    # astype(str) can write into a column backed by a view (e.g. a frame
+    # unpickled in a worker process), so convert copies
+    timestamps = df["timestamp"].copy().astype(str).str.strip()
+    timezones = df["timezone"].copy().astype(str).str.strip()
+
+    parsed, parse_issues = parse_timestamps(timestamps, timezones, return_issues=True)
+    df["processed_timestamp"] = parsed
+
+    # 🔁 Combine the issue masks into one bitmask per row, then into JSON
+    bits = (
+        parsed.isna().to_numpy() * QUALITY_BITS["invalid_date_format"]
+        | timezones.isin(MISSING_TIMEZONE_VALUES).to_numpy() * QUALITY_BITS["missing_timezone"]
+        | _out_of_order_mask(df, prev_timestamp) * QUALITY_BITS["out_of_order"]
+    )
+    for issue, mask in parse_issues.items():
+        bits |= mask * QUALITY_BITS[issue]
+    df["data_quality_bits"] = bits
+    df["data_quality_flags"] = flags_from_bits(bits)
     return df
 
 
@@ -49,137 +118,839 @@ def detect_near_duplicates(df, threshold_seconds=10):
     """
     Detect near-duplicates based on:
     - Same customer_id
-    - Same amount
+    - Same amount (to the cent)
     - Same status & category
     - Timestamps within `threshold_seconds`
+
+    Rows are partitioned by those fields and sorted by time inside each
+    partition, so a pair is found even when unrelated transactions fall
+    between them. The earlier row of each pair is marked.
     """
-    duplicates = set()
-    df_sorted = df.sort_values(by="processed_timestamp")
+    with ingest_stage("near_duplicates"):
+        duplicates = _near_duplicates(df, threshold_seconds)
+    logger.info("🔁 Found %d near-duplicates", len(duplicates))
+    return duplicates
 
-    for i in range(1, len(df_sorted)):
-        prev = df_sorted.iloc[i - 1]
-        curr = df_sorted.iloc[i]
 
-        if pd.isnull(prev["processed_timestamp"]) or pd.isnull(curr["processed_timestamp"]):
-            continue
+def _near_duplicates(df, threshold_seconds):
+    key_columns = ["customer_id", "status", "product_category", "amount"]
+    valid = (df["processed_timestamp"].notna() & df[key_columns].notna().all(axis=1)).to_numpy()
+    if not valid.any():
+        return set()
 
-        same_fields = (
-            prev["customer_id"] == curr["customer_id"] and
-            abs(prev["amount"] - curr["amount"]) < 0.01 and
-            prev["status"] == curr["status"] and
-            prev["product_category"] == curr["product_category"]
-        )
+    cents = np.round(df["amount"].to_numpy(dtype=float)[valid] * 100).astype("int64")
+    partition = _partition_codes([pd.factorize(df[col])[0][valid] for col in key_columns[:3]]
+                                 + [pd.factorize(cents)[0]])
+    ts = pd.DatetimeIndex(df["processed_timestamp"]).asi8[valid]
 
-        time_diff = abs((curr["processed_timestamp"] - prev["processed_timestamp"]).total_seconds())
+    order = np.lexsort((ts, partition))
+    partition = partition[order]
+    ts = ts[order]
+    same_partition = partition[1:] == partition[:-1]
+    close = (ts[1:] - ts[:-1]) <= threshold_seconds * 1_000_000_000
 
-        if same_fields and time_diff <= threshold_seconds:
-            duplicates.add(df_sorted.index[i - 1])  # mark earlier one as duplicate
+    earlier = order[:-1][same_partition & close]
+    return set(df.index[np.flatnonzero(valid)[earlier]])
 
-    print(f"🔁 Found {len(duplicates)} near-duplicates")
-    return duplicates
+
+def _partition_codes(codes_list):
+    """Pack several arrays of factorized codes into one int64 key per row."""
+    key = np.zeros(len(codes_list[0]), dtype="int64")
+    capacity = 1
+    for codes in codes_list:
+        size = int(codes.max()) + 1
+        if capacity * size >= 2 ** 62:
+            # Too many combinations to pack: renumber what we have so far
+            key = pd.factorize(key)[0].astype("int64")
+            capacity = int(key.max()) + 1
+        key = key * size + codes
+        capacity *= size
+    return key
 
 
-def detect_out_of_order(df):
+def detect_out_of_order(df, prev_timestamp=None):
     """
     Identify rows where processed_timestamp is earlier than the previous row’s
     processed_timestamp (i.e., arrived later but happened earlier).
-    Assumes df is in CSV/arrival order.
+    Assumes df is in CSV/arrival order. `prev_timestamp` is the last
+    timestamp seen before df, when df continues an earlier batch.
+    """
+    return df.index[_out_of_order_mask(df, prev_timestamp)].tolist()
+
+
+def _out_of_order_mask(df, prev_timestamp=None):
+    """Boolean array form of detect_out_of_order."""
+    ts = df["processed_timestamp"]
+    prev_ts = ts.ffill().shift(1)  # last non-null timestamp before each row
+    if prev_timestamp is not None:
+        prev_ts = prev_ts.fillna(prev_timestamp)
+    return (ts.notna() & (ts < prev_ts)).to_numpy()
+
+
+
+INSERT_TRANSACTION_QUERY = """
+INSERT OR REPLACE INTO transactions (
+    transaction_id,
+    customer_id,
+    amount,
+    currency,
+    original_timestamp,
+    original_timezone,
+    processed_timestamp,
+    processed_epoch,
+    processed_timezone,
+    status,
+    product_category,
+    data_quality_bits,
+    created_at,
+    amount_reporting
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+UPSERT_TRANSACTION_QUERY = INSERT_TRANSACTION_QUERY.replace("INSERT OR REPLACE", "INSERT") + """
+ON CONFLICT(transaction_id) DO UPDATE SET
+    customer_id = excluded.customer_id,
+    amount = excluded.amount,
+    currency = excluded.currency,
+    original_timestamp = excluded.original_timestamp,
+    original_timezone = excluded.original_timezone,
+    processed_timestamp = excluded.processed_timestamp,
+    processed_epoch = excluded.processed_epoch,
+    processed_timezone = excluded.processed_timezone,
+    status = excluded.status,
+    product_category = excluded.product_category,
+    data_quality_bits = excluded.data_quality_bits,
+    amount_reporting = excluded.amount_reporting,
+    updated_at = CURRENT_TIMESTAMP
+"""
+
+
+def to_epoch_seconds(timestamps):
+    """
+    Whole UTC epoch seconds for a datetime Series, as an object array of
+    ints with None for NaT (what processed_epoch stores; the same second as
+    the processed_timestamp string).
+    """
+    index = pd.DatetimeIndex(timestamps)
+    epochs = (index.asi8 // 1_000_000_000).astype(object)
+    epochs[index.isna()] = None
+    return epochs
+
+
+def _reporting_amounts(df, epochs, fx):
+    """amount_reporting values (None without a rate or a timestamp) for the rows of a cleaned df."""
+    reporting = fx.to_reporting(df["amount"], df["currency"], np.array(epochs, dtype=float))
+    unconverted = np.isnan(reporting) & df["processed_timestamp"].notna().to_numpy()
+    if unconverted.any():
+        count_rows("unconverted", int(unconverted.sum()))
+        logger.warning("⚠️ No FX rate for %d rows (currencies: %s); they count as 0 in reporting-currency totals",
+                       unconverted.sum(), ", ".join(sorted(df["currency"][unconverted].astype(str).unique())))
+    return pd.Series(reporting, dtype=object).where(~np.isnan(reporting), None).tolist()
+
+
+def _transaction_rows(df, duplicates, created_at, fx):
+    """Yield INSERT_TRANSACTION_QUERY parameters for each row of a cleaned df, converting amounts with `fx`."""
+    processed = df["processed_timestamp"].dt.strftime(DB_TIMESTAMP_FORMAT)
+    epochs = to_epoch_seconds(df["processed_timestamp"])
+    reporting = _reporting_amounts(df, epochs, fx)
+    # ✅ Add the duplicate flag to the rows' bitmasks
+    bits = _quality_bits(df) | df.index.isin(duplicates) * QUALITY_BITS["duplicate_candidate"]
+    columns = zip(
+        df["transaction_id"], df["customer_id"], df["amount"], df["currency"],
+        df["timestamp"], df["timezone"], processed, epochs, df["status"], df["product_category"],
+        bits.tolist(), reporting,
+    )
+    for txn_id, customer_id, amount, currency, timestamp, timezone, processed_ts, epoch, \
+            status, category, flag_bits, amount_reporting in columns:
+        try:
+            yield (
+                txn_id,
+                customer_id,
+                float(amount),
+                currency,
+                timestamp,  # original raw input
+                timezone if timezone else None,
+                processed_ts if pd.notnull(processed_ts) else None,
+                epoch,
+                "UTC",
+                status,
+                category,
+                flag_bits,
+                created_at,
+                amount_reporting
+            )
+
+        except Exception as e:
+            logger.warning("⚠️ Skipping row due to error: %s", e)
+
+
+_BUCKET_START_SQL = f"""
+    processed_epoch - ((processed_epoch % {SALES_ROLLUP_BUCKET_SECONDS}) + {SALES_ROLLUP_BUCKET_SECONDS})
+        % {SALES_ROLLUP_BUCKET_SECONDS} AS bucket_start"""
+
+# Rows without amount_reporting (no FX rate) add nothing to reporting_cents
+# and are counted in unconverted_count
+_REPORTING_CENTS_SQL = """COALESCE(SUM(CAST(ROUND(amount_reporting * 100) AS INTEGER)), 0),
+    COUNT(*) - COUNT(amount_reporting)"""
+
+SALES_ROLLUP_SELECT = f"""
+SELECT{_BUCKET_START_SQL},
+    SUM(CAST(ROUND(amount * 100) AS INTEGER)),
+    COUNT(*),
+    SUM(CAST(ROUND(amount * 100) AS INTEGER) * CAST(ROUND(amount * 100) AS INTEGER)),
+    {_REPORTING_CENTS_SQL}
+FROM transactions
+"""
+
+
+def refresh_sales_rollup(conn, timestamps=None):
+    """
+    Rebuild sales_rollup buckets, and the sales_cube cells in them, from
+    the transactions table. With `timestamps` (UTC), only the buckets
+    containing them are rebuilt; otherwise the whole table is. Runs inside
+    the caller's transaction.
     """
-    out_of_order_indices = []
+    with ingest_stage("rollup"):
+        _refresh_sales_rollup(conn, timestamps)
+    with ingest_stage("cube"):
+        _refresh_sales_cube(conn, timestamps)
+
+
+def _refresh_sales_rollup(conn, timestamps):
+    if timestamps is None:
+        conn.execute("DELETE FROM sales_rollup")
+        conn.execute(f"""
+        INSERT INTO sales_rollup
+        {SALES_ROLLUP_SELECT}
+        WHERE processed_epoch IS NOT NULL
+        GROUP BY bucket_start
+        """)
+        return
+
+    epochs = pd.DatetimeIndex(timestamps).dropna().asi8 // 1_000_000_000
+    buckets = np.unique(epochs // SALES_ROLLUP_BUCKET_SECONDS * SALES_ROLLUP_BUCKET_SECONDS).tolist()
+    conn.executemany("DELETE FROM sales_rollup WHERE bucket_start = ?", [(b,) for b in buckets])
+    conn.executemany(f"""
+    INSERT INTO sales_rollup
+    {SALES_ROLLUP_SELECT}
+    WHERE processed_epoch >= ? AND processed_epoch < ?
+    GROUP BY bucket_start
+    """, [(b, b + SALES_ROLLUP_BUCKET_SECONDS) for b in buckets])
+
+
+# /api/sales/cube dimension -> sales_cube column
+CUBE_DIMENSIONS = {
+    "category": "product_category",
+    "status": "status",
+    "currency": "currency",
+}
+
+SALES_CUBE_SELECT = f"""
+SELECT{_BUCKET_START_SQL},
+    product_category, status, currency,
+    SUM(CAST(ROUND(amount * 100) AS INTEGER)),
+    COUNT(*),
+    {_REPORTING_CENTS_SQL}
+FROM transactions
+"""
+
+
+# metadata key of the timezones whose sales_cube_daily/monthly cells are complete
+CUBE_TIMEZONES_KEY = "sales_cube_timezones"
+
+
+def built_cube_timezones(conn):
+    """
+    The timezones whose sales_cube_daily and sales_cube_monthly cells cover
+    every sales_cube cell. Databases from before they were recorded always
+    had UTC built.
+    """
+    row = conn.execute("SELECT value FROM metadata WHERE key = ?", (CUBE_TIMEZONES_KEY,)).fetchone()
+    return set(row[0].split(",")) if row else {"UTC"}
+
 
-    prev_ts = None
-    for idx, row in df.iterrows():
-        curr_ts = row["processed_timestamp"]
-        if pd.isnull(curr_ts):
-            continue  # skip bad rows
-        if prev_ts is not None and curr_ts < prev_ts:
-            out_of_order_indices.append(idx)
-        prev_ts = curr_ts
+def _record_cube_timezones(conn, timezones):
+    conn.execute("INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)", (CUBE_TIMEZONES_KEY, ",".join(timezones)))
 
-    return out_of_order_indices
 
+def _refresh_sales_cube(conn, timestamps):
+    """
+    Rebuild the sales_cube cells of the same buckets as
+    _refresh_sales_rollup, then roll the local days and months containing
+    them up into sales_cube_daily and sales_cube_monthly, and record the
+    timezones that leaves complete (see built_cube_timezones). A full
+    rebuild rolls up every one of SALES_CUBE_TIMEZONES; a partial one only
+    those already built, since other timezones would get only the days
+    touched.
+    """
+    if timestamps is None:
+        conn.execute("DELETE FROM sales_cube")
+        conn.execute(f"""
+        INSERT INTO sales_cube
+        {SALES_CUBE_SELECT}
+        WHERE processed_epoch IS NOT NULL
+        GROUP BY bucket_start, product_category, status, currency
+        """)
+        conn.execute("DELETE FROM sales_cube_daily")
+        conn.execute("DELETE FROM sales_cube_monthly")
+        for tz in SALES_CUBE_TIMEZONES:
+            _roll_up_cube_days(conn, tz)
+            _roll_up_cube_months(conn, tz)
+        _record_cube_timezones(conn, SALES_CUBE_TIMEZONES)
+        return
+
+    epochs = pd.DatetimeIndex(timestamps).dropna().asi8 // 1_000_000_000
+    buckets = np.unique(epochs // SALES_ROLLUP_BUCKET_SECONDS * SALES_ROLLUP_BUCKET_SECONDS)
+    conn.executemany("DELETE FROM sales_cube WHERE bucket_start = ?", [(b,) for b in buckets.tolist()])
+    conn.executemany(f"""
+    INSERT INTO sales_cube
+    {SALES_CUBE_SELECT}
+    WHERE processed_epoch >= ? AND processed_epoch < ?
+    GROUP BY bucket_start, product_category, status, currency
+    """, [(b, b + SALES_ROLLUP_BUCKET_SECONDS) for b in buckets.tolist()])
+    built = built_cube_timezones(conn)
+    timezones = [tz for tz in SALES_CUBE_TIMEZONES if tz in built]
+    for tz in timezones:
+        days = np.unique(_local_days(buckets, tz)).tolist()
+        conn.executemany("DELETE FROM sales_cube_daily WHERE timezone = ? AND local_date = ?",
+                         [(tz, day) for day in days])
+        _roll_up_cube_days(conn, tz, days)
+        months = sorted({day[:7] for day in days})
+        conn.executemany("DELETE FROM sales_cube_monthly WHERE timezone = ? AND local_month = ?",
+                         [(tz, month) for month in months])
+        _roll_up_cube_months(conn, tz, months)
+    _record_cube_timezones(conn, timezones)
+
+
+def _local_days(epochs, timezone_str):
+    """YYYY-MM-DD local date in timezone_str of each UTC epoch second."""
+    local = pd.to_datetime(epochs, unit="s", utc=True).tz_convert(timezone_str).tz_localize(None)
+    return np.asarray(local.strftime("%Y-%m-%d"), dtype=object)
+
+
+def _roll_up_cube_days(conn, timezone_str, days=None):
+    """
+    Insert the sales_cube_daily cells of timezone_str's local `days`
+    (YYYY-MM-DD strings; every day with cells when None), summed from
+    sales_cube.
+    """
+    if days is None:
+        buckets = [row[0] for row in conn.execute("SELECT DISTINCT bucket_start FROM sales_cube")]
+    else:
+        buckets = []
+        for day in days:
+            lo, hi = (int(pd.Timestamp(local_midnight_to_utc(d, timezone_str), tz="UTC").timestamp())
+                      for d in (day, pd.Timestamp(day) + timedelta(days=1)))
+            buckets.extend(row[0] for row in conn.execute(
+                "SELECT DISTINCT bucket_start FROM sales_cube WHERE bucket_start >= ? AND bucket_start < ?", (lo, hi)))
+    if not buckets:
+        return
+
+    # Local date of every bucket, joined to the cells to group them by day
+    conn.execute("CREATE TEMP TABLE cube_days (bucket_start INTEGER PRIMARY KEY, local_date TEXT NOT NULL)")
+    conn.executemany("INSERT INTO temp.cube_days VALUES (?, ?)",
+                     zip(buckets, _local_days(np.array(buckets, dtype="int64"), timezone_str)))
+    conn.execute("""
+    INSERT INTO sales_cube_daily
+    SELECT ?, d.local_date, c.product_category, c.status, c.currency, SUM(c.sales_cents), SUM(c.transaction_count),
+           SUM(c.reporting_cents), SUM(c.unconverted_count)
+    FROM temp.cube_days d
+    JOIN sales_cube c ON c.bucket_start = d.bucket_start
+    GROUP BY d.local_date, c.product_category, c.status, c.currency
+    """, (timezone_str,))
+    conn.execute("DROP TABLE temp.cube_days")
+
+
+def _roll_up_cube_months(conn, timezone_str, months=None):
+    """
+    Insert the sales_cube_monthly cells of timezone_str's local `months`
+    (YYYY-MM strings; every month when None), summed from sales_cube_daily.
+    """
+    query = f"""
+    INSERT INTO sales_cube_monthly
+    SELECT timezone, substr(local_date, 1, 7), product_category, status, currency,
+           SUM(sales_cents), SUM(transaction_count), SUM(reporting_cents), SUM(unconverted_count)
+    FROM sales_cube_daily
+    WHERE timezone = ?{"" if months is None else " AND local_date BETWEEN ? AND ?"}
+    GROUP BY 2, product_category, status, currency
+    """
+    if months is None:
+        conn.execute(query, (timezone_str,))
+    else:
+        conn.executemany(query, [(timezone_str, f"{month}-01", f"{month}-31") for month in months])
 
 
-def insert_clean_data_into_db(df):
+def _load_quality_counts(df, duplicates):
+    """Per-issue row counts for the cleaned rows of df as they will be written."""
+    bits = _quality_bits(df)
+    counts = {"total_records": len(df)}
+    for issue, column in DATA_QUALITY_COLUMNS.items():
+        counts[column] = int(np.count_nonzero(bits & QUALITY_BITS[issue]))
+    counts["duplicate_transactions"] += len(duplicates & set(df.index))
+    return counts
+
+
+def _scan_quality_counts(conn):
+    """Per-issue row counts over the whole transactions table."""
+    columns = ", ".join(
+        f"COALESCE(SUM(data_quality_bits & {QUALITY_BITS[issue]} != 0), 0)" for issue in DATA_QUALITY_COLUMNS
+    )
+    with ingest_stage("quality_scan"):
+        total = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+        # `data_quality_bits != 0` lets SQLite read only idx_data_quality_bits
+        row = conn.execute(f"SELECT {columns} FROM transactions WHERE data_quality_bits != 0").fetchone()
+    return dict(zip(["total_records", *DATA_QUALITY_COLUMNS.values()], [total, *row]))
+
+
+def _add_counts(a, b, sign=1):
+    return {key: a[key] + sign * b.get(key, 0) for key in a}
+
+
+def record_data_quality(conn, load_counts, cumulative_counts):
+    """
+    Append this load's issue counts to data_quality_summary and replace the
+    cumulative row, inside the caller's transaction.
+    """
+    columns = list(load_counts)
+    insert = (f"INSERT INTO data_quality_summary (scope, {', '.join(columns)}) "
+              f"VALUES (?{', ?' * len(columns)})")
+    conn.execute(insert, ["load", *(load_counts[c] for c in columns)])
+    conn.execute("DELETE FROM data_quality_summary WHERE scope = 'cumulative'")
+    conn.execute(insert, ["cumulative", *(cumulative_counts[c] for c in columns)])
+
+
+def current_quality_counts(conn):
+    """
+    Per-issue row counts for the transactions table, from the cumulative
+    data_quality_summary row when a load has written one.
+    """
+    row = conn.execute(f"""
+    SELECT total_records, {', '.join(DATA_QUALITY_COLUMNS.values())}
+    FROM data_quality_summary WHERE scope = 'cumulative'
+    """).fetchone()
+    if row is None:
+        return _scan_quality_counts(conn)
+    return dict(zip(["total_records", *DATA_QUALITY_COLUMNS.values()], row))
+
+
+def bump_data_version(conn):
+    """
+    Increment the database's data version (PRAGMA user_version) inside the
+    caller's transaction. Cached query results are keyed on it, so every
+    load that changes transactions must call this before committing.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    conn.execute(f"PRAGMA user_version = {version + 1}")
+
+
+def refresh_parquet_snapshot(conn, timestamps=None):
+    """
+    With the duckdb analytics backend, bring the Parquet snapshot in line
+    with the transactions committed on conn. With `timestamps` (UTC), only
+    the days containing them are rewritten.
+    """
+    if ANALYTICS_BACKEND != "duckdb":
+        return
+    from analytics import write_parquet_snapshot
+
+    days = None
+    if timestamps is not None:
+        days = np.unique(pd.DatetimeIndex(timestamps).dropna().asi8 // 1_000_000_000 // 86400).tolist()
+    with ingest_stage("parquet_snapshot"):
+        write_parquet_snapshot(conn, PARQUET_SNAPSHOT_DIR, days)
+
+
+# Connection settings for bulk loads: WAL journal, fsync only at WAL
+# checkpoints, a 256 MB page cache and in-memory temp tables
+BULK_LOAD_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "cache_size": -256 * 1024,
+    "temp_store": "MEMORY",
+}
+
+
+@contextmanager
+def bulk_load(conn):
+    """
+    Apply BULK_LOAD_PRAGMAS and drop the secondary indexes on transactions
+    for the duration of a full reload; afterwards rebuild the indexes, run
+    ANALYZE and restore the original journal mode.
+    """
+    journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+    for name, value in BULK_LOAD_PRAGMAS.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    for name in SECONDARY_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+        with ingest_stage("index_rebuild"):
+            for index_sql in SECONDARY_INDEXES.values():
+                conn.execute(index_sql)
+            conn.execute("ANALYZE")
+        conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+
+
+def _insert_batches(conn, rows, batch_size=INSERT_BATCH_SIZE):
+    """executemany INSERT_TRANSACTION_QUERY over `rows` in batches; returns the row count."""
+    inserted = 0
+    with ingest_stage("insert"):
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            inserted += conn.executemany(INSERT_TRANSACTION_QUERY, batch).rowcount
+    count_rows("inserted", inserted)
+    return inserted
+
+
+def insert_clean_data_into_db(df, bulk=False):
     """
     Insert cleaned and validated transactions into the SQLite DB.
 
     Assumes schema:
     - original_timestamp and original_timezone from CSV
     - processed_timestamp in UTC
-    - data_quality_flags stored as JSON string
+    - data_quality_bits stored as a bitmask (data_quality_flags is its JSON form)
+
+    With bulk=True the load runs under bulk_load: tuned PRAGMAs and the
+    secondary indexes rebuilt once at the end instead of maintained per row.
+    """
+    with ingest_report("full"):
+        conn = sqlite3.connect(DATABASE_PATH)
+        start = time.perf_counter()
+        with bulk_load(conn) if bulk else nullcontext():
+            conn.execute("DELETE FROM transactions")
+
+            now = datetime.utcnow().strftime(DB_TIMESTAMP_FORMAT)
+            duplicates = detect_near_duplicates(df)
+            count_rows("near_duplicates", len(duplicates))
+
+            fx = ingest_fx_table(conn)
+            inserted = _insert_batches(conn, _transaction_rows(df, duplicates, now, fx))
+            refresh_sales_rollup(conn)
+            record_data_quality(conn, _load_quality_counts(df, duplicates), _scan_quality_counts(conn))
+            bump_data_version(conn)
+            conn.commit()
+        refresh_parquet_snapshot(conn)
+        conn.close()
+        seconds = time.perf_counter() - start
+
+    logger.info("✅ Inserted %d rows into the database (%.0f rows/s).", inserted, inserted / seconds)
+    logger.debug("Near-duplicate rows: %s", duplicates)
+
+
+def ingest_csv_streaming(csv_path, chunksize=50_000, threshold_seconds=10, bulk=False):
+    """
+    Replace the transactions table with a cleaned copy of csv_path, reading,
+    cleaning and inserting `chunksize` rows at a time. The replacement is
+    one DB transaction, so readers never see a partly loaded table.
+
+    Only two pieces of state cross chunk boundaries: the last timestamp
+    seen, for out-of-order detection, and the rows within
+    `threshold_seconds` of the newest timestamp seen, which are held back
+    and re-checked for near-duplicates with the next chunk. Pairs whose
+    later row arrives after that window has moved past them are not
+    caught; on in-order data the result matches a whole-file load.
+
+    bulk=True runs the load under bulk_load, as in insert_clean_data_into_db.
+    """
+    def cleaned_chunks():
+        last_timestamp = None
+        for chunk in load_transaction_data(csv_path, chunksize=chunksize):
+            chunk = clean_and_enrich_transactions(chunk, prev_timestamp=last_timestamp)
+            last_timestamp = _last_timestamp(chunk, last_timestamp)
+            yield chunk
+
+    with ingest_report("streaming"):
+        return _insert_cleaned_chunks(cleaned_chunks(), threshold_seconds, bulk)
+
+
+def ingest_csv_parallel(csv_path, workers=None, chunksize=50_000, threshold_seconds=10, bulk=False):
+    """
+    ingest_csv_streaming with the cleaning step spread over a process pool.
+
+    Chunks are cleaned independently by `workers` processes (default
+    INGEST_WORKERS, else one per CPU) and consumed in arrival order, at most
+    two per worker in flight. The one flag that depends on earlier chunks,
+    out_of_order on a chunk's first timestamped row, is stitched on here;
+    near-duplicates across chunk boundaries are caught by the same held-back
+    window as the streaming ingest, so the result is identical to it.
+    """
+    workers = workers or INGEST_WORKERS or os.cpu_count()
+
+    def next_cleaned(pending):
+        # Cleaning runs in the workers; this is the time spent waiting on them
+        with ingest_stage("clean_wait"):
+            return pending.popleft().result()
+
+    def cleaned_chunks(pool):
+        last_timestamp = None
+        pending = deque()
+        for chunk in load_transaction_data(csv_path, chunksize=chunksize):
+            pending.append(pool.submit(clean_and_enrich_transactions, chunk))
+            while len(pending) >= 2 * workers or (pending and pending[0].done()):
+                chunk = _stitch_out_of_order(next_cleaned(pending), last_timestamp)
+                last_timestamp = _last_timestamp(chunk, last_timestamp)
+                yield chunk
+        while pending:
+            chunk = _stitch_out_of_order(next_cleaned(pending), last_timestamp)
+            last_timestamp = _last_timestamp(chunk, last_timestamp)
+            yield chunk
+
+    with ingest_report("parallel"), ProcessPoolExecutor(max_workers=workers) as pool:
+        return _insert_cleaned_chunks(cleaned_chunks(pool), threshold_seconds, bulk)
+
+
+def _last_timestamp(df, default):
+    timestamps = df["processed_timestamp"].dropna()
+    return default if timestamps.empty else timestamps.iloc[-1]
+
+
+def _stitch_out_of_order(df, prev_timestamp):
+    """
+    Apply prev_timestamp to a chunk cleaned without it. Only the chunk's
+    first timestamped row compares against it (detect_out_of_order), so
+    at most that row gains the out_of_order flag.
+    """
+    timestamps = df["processed_timestamp"].dropna()
+    if prev_timestamp is None or timestamps.empty or not timestamps.iloc[0] < prev_timestamp:
+        return df
+    idx = timestamps.index[0]
+    bits = df.at[idx, "data_quality_bits"] | QUALITY_BITS["out_of_order"]
+    df.at[idx, "data_quality_bits"] = bits
+    df.at[idx, "data_quality_flags"] = FLAGS_JSON[bits]
+    return df
+
+
+def _insert_cleaned_chunks(chunks, threshold_seconds, bulk=False):
+    """
+    Replace the transactions table with cleaned chunks taken in arrival
+    order, in one DB transaction, holding back the rows that may still
+    pair with the next chunk as near-duplicates.
     """
     conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-
-    cursor.execute("DELETE FROM transactions")
-    
-    insert_query = """
-    INSERT OR REPLACE INTO transactions (
-        transaction_id,
-        customer_id,
-        amount,
-        currency,
-        original_timestamp,
-        original_timezone,
-        processed_timestamp,
-        processed_timezone,
-        status,
-        product_category,
-        data_quality_flags,
-        created_at
-    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """
-
-    rows_to_insert = []
-    now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
-
-    duplicates = detect_near_duplicates(df)
-
-    for idx, row in df.iterrows():
-        try:
-            processed_ts = (
-                row['processed_timestamp'].strftime("%Y-%m-%d %H:%M:%S")
-                if pd.notnull(row['processed_timestamp']) else None
-            )
+    start = time.perf_counter()
+    with bulk_load(conn) if bulk else nullcontext():
+        inserted, duplicate_count = _load_cleaned_chunks(conn, chunks, threshold_seconds)
+    refresh_parquet_snapshot(conn)
+    conn.close()
+    seconds = time.perf_counter() - start
+    count_rows("near_duplicates", duplicate_count)
 
-            # ✅ Parse and update data_quality_flags with duplicate flag if needed
-            flags_json = row['data_quality_flags']
-            if isinstance(flags_json, str):
-                flags = json.loads(flags_json).get("issues", [])
-            elif isinstance(flags_json, dict):
-                flags = flags_json.get("issues", [])
-            elif isinstance(flags_json, list):
-                flags = flags_json
-            else:
-                flags = []
+    logger.info("✅ Inserted %d rows into the database (%d near-duplicates, %.0f rows/s).",
+                inserted, duplicate_count, inserted / seconds)
+    return inserted
 
-            if idx in duplicates and "duplicate_candidate" not in flags:
-                flags.append("duplicate_candidate")
 
-            flags_json_final = json.dumps({"issues": flags} if flags else {})
+def _load_cleaned_chunks(conn, chunks, threshold_seconds):
+    """
+    Body of _insert_cleaned_chunks; returns (inserted, near-duplicates).
+    The whole load, the rollup refresh and the data version bump are one
+    DB transaction, so readers (and the result cache) keep seeing the old
+    table until the new one is complete.
+    """
+    with conn:
+        conn.execute("DELETE FROM transactions")
+        fx = ingest_fx_table(conn)
+
+        now = datetime.utcnow().strftime(DB_TIMESTAMP_FORMAT)
+        threshold = pd.Timedelta(seconds=threshold_seconds)
+        newest_timestamp = None
+        held = None
+        held_duplicates = set()
+        inserted = 0
+        duplicate_count = 0
+        load_counts = None
+
+        for chunk in chunks:
+            timestamps = chunk["processed_timestamp"].dropna()
+            if not timestamps.empty:
+                chunk_newest = timestamps.max()
+                newest_timestamp = chunk_newest if newest_timestamp is None else max(newest_timestamp, chunk_newest)
+
+            window = chunk if held is None else pd.concat([held, chunk])
+            duplicates = detect_near_duplicates(window, threshold_seconds) | held_duplicates
+
+            if newest_timestamp is None:
+                keep = pd.Series(False, index=window.index)
+            else:
+                keep = window["processed_timestamp"] >= newest_timestamp - threshold
+            flush = window[~keep]
+            held = window[keep]
+            held_duplicates = duplicates & set(held.index)
+
+            inserted += _insert_batches(conn, _transaction_rows(flush, duplicates, now, fx))
+            duplicate_count += len(duplicates - held_duplicates)
+            flush_counts = _load_quality_counts(flush, duplicates)
+            load_counts = flush_counts if load_counts is None else _add_counts(load_counts, flush_counts)
+
+        if held is not None and not held.empty:
+            inserted += _insert_batches(conn, _transaction_rows(held, held_duplicates, now, fx))
+            duplicate_count += len(held_duplicates)
+            load_counts = _add_counts(load_counts, _load_quality_counts(held, held_duplicates))
+
+        # Rebuilds sales_rollup and every sales_cube level from scratch
+        refresh_sales_rollup(conn)
+        cumulative_counts = _scan_quality_counts(conn)
+        record_data_quality(conn, load_counts or cumulative_counts, cumulative_counts)
+        bump_data_version(conn)
+    return inserted, duplicate_count
+
+
+def ingest_incremental(df, threshold_seconds=10):
+    """
+    Merge a raw (uncleaned) batch into the transactions table without
+    touching the rest of it.
+
+    Rows whose transaction_id is new are cleaned and inserted, rows whose
+    raw fields changed are cleaned and upserted in place, and identical rows
+    are skipped. The batch is treated as arriving after everything already
+    loaded for out-of-order detection. duplicate_candidate flags are then
+    recomputed only for rows within `threshold_seconds` before a timestamp
+    the batch added or moved.
+    """
+    with ingest_report("incremental"):
+        return _ingest_incremental(df, threshold_seconds)
 
-            rows_to_insert.append((
-                row['transaction_id'],
-                row['customer_id'],
-                float(row['amount']),
-                row['currency'],
-                row['timestamp'],  # original raw input
-                row['timezone'] if row['timezone'] else None,
-                processed_ts,
-                "UTC",
-                row['status'],
-                row['product_category'],
-                flags_json_final,
-                now
-            ))
 
-        except Exception as e:
-            print(f"⚠️ Skipping row due to error: {e}")
+def _ingest_incremental(df, threshold_seconds):
+    df = df.drop_duplicates("transaction_id", keep="last")
+    conn = sqlite3.connect(DATABASE_PATH)
 
-    cursor.executemany(insert_query, rows_to_insert)
-    conn.commit()
+    conn.execute("""
+    CREATE TEMP TABLE incoming (
+        transaction_id TEXT PRIMARY KEY, customer_id, amount, currency,
+        original_timestamp, original_timezone, status, product_category
+    )
+    """)
+    conn.executemany(
+        "INSERT INTO temp.incoming VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        zip(df["transaction_id"], df["customer_id"], df["amount"].astype(float), df["currency"],
+            df["timestamp"], [tz if tz else None for tz in df["timezone"]], df["status"],
+            df["product_category"]),
+    )
+    changed = conn.execute("""
+    SELECT i.transaction_id, t.id IS NULL, t.processed_timestamp, t.data_quality_bits
+    FROM temp.incoming i
+    LEFT JOIN transactions t ON t.transaction_id = i.transaction_id
+    WHERE t.id IS NULL
+       OR t.customer_id IS NOT i.customer_id
+       OR t.amount IS NOT i.amount
+       OR t.currency IS NOT i.currency
+       OR t.original_timestamp IS NOT i.original_timestamp
+       OR t.original_timezone IS NOT i.original_timezone
+       OR t.status IS NOT i.status
+       OR t.product_category IS NOT i.product_category
+    """).fetchall()
+    conn.execute("DROP TABLE temp.incoming")
+
+    new_count = sum(1 for _, is_new, _, _ in changed if is_new)
+    summary = {"inserted": new_count, "updated": len(changed) - new_count,
+               "unchanged": len(df) - len(changed)}
+    count_rows("unchanged", summary["unchanged"])
+    if not changed:
+        conn.close()
+        logger.info("✅ No new or changed rows (%d unchanged).", summary["unchanged"])
+        return summary
+
+    batch = df[df["transaction_id"].isin([txn_id for txn_id, _, _, _ in changed])].copy()
+    last_loaded = conn.execute("""
+    SELECT processed_timestamp FROM transactions
+    WHERE processed_timestamp IS NOT NULL
+    ORDER BY id DESC LIMIT 1
+    """).fetchone()
+    prev_timestamp = pd.Timestamp(last_loaded[0], tz="UTC") if last_loaded else None
+    batch = clean_and_enrich_transactions(batch, prev_timestamp=prev_timestamp)
+
+    # Timestamps whose neighbourhood changed: new positions and old ones
+    touched = pd.concat([
+        batch["processed_timestamp"].dropna(),
+        pd.to_datetime(pd.Series([ts for _, _, ts, _ in changed if ts]), utc=True),
+    ])
+
+    now = datetime.utcnow().strftime(DB_TIMESTAMP_FORMAT)
+    # Cumulative issue counts move by the rows written minus the rows they replace
+    load_counts = _load_quality_counts(batch, set())
+    replaced = pd.DataFrame({"data_quality_bits": pd.Series(
+        [bits for _, is_new, _, bits in changed if not is_new], dtype="int64")})
+    replaced_counts = _load_quality_counts(replaced, set())
+    cumulative_counts = _add_counts(current_quality_counts(conn), replaced_counts, sign=-1)
+    cumulative_counts = _add_counts(cumulative_counts, load_counts)
+
+    with conn:
+        fx = ingest_fx_table(conn)
+        with ingest_stage("insert"):
+            conn.executemany(UPSERT_TRANSACTION_QUERY, _transaction_rows(batch, set(), now, fx))
+        count_rows("inserted", summary["inserted"])
+        count_rows("updated", summary["updated"])
+        refresh_sales_rollup(conn, touched)
+    flagged, unflagged = _refresh_duplicate_flags(conn, touched, threshold_seconds)
+    load_counts["duplicate_transactions"] += flagged
+    cumulative_counts["duplicate_transactions"] += flagged - unflagged
+    with conn:
+        record_data_quality(conn, load_counts, cumulative_counts)
+        bump_data_version(conn)
+    refresh_parquet_snapshot(conn, touched)
     conn.close()
 
-    print(f"✅ Inserted {len(rows_to_insert)} rows into the database.")
-    print(duplicates)
+    logger.info("✅ Inserted %d and updated %d rows (%d unchanged, %d duplicate flags changed).",
+                summary["inserted"], summary["updated"], summary["unchanged"], flagged + unflagged)
+    return summary
+
+
+def _refresh_duplicate_flags(conn, touched, threshold_seconds):
+    """
+    Recompute duplicate_candidate for every row that could pair with a row at
+    one of the `touched` timestamps, and write back the flags that changed.
+    Returns the number of flags set and cleared.
+    """
+    if touched.empty:
+        return 0, 0
+    threshold = pd.Timedelta(seconds=threshold_seconds)
+
+    # Merge [t - threshold, t + threshold] intervals around touched timestamps
+    windows = []
+    for ts in touched.sort_values():
+        if windows and ts - threshold <= windows[-1][1]:
+            windows[-1][1] = ts + threshold
+        else:
+            windows.append([ts - threshold, ts + threshold])
+
+    conn.execute("CREATE TEMP TABLE windows (lo INTEGER, hi INTEGER)")
+    conn.executemany("INSERT INTO temp.windows VALUES (?, ?)", [
+        (lo.value // 1_000_000_000, hi.value // 1_000_000_000) for lo, hi in windows
+    ])
+    nearby = pd.read_sql_query("""
+    SELECT DISTINCT t.transaction_id, t.customer_id, t.amount, t.status, t.product_category,
+           t.processed_epoch, t.data_quality_bits
+    FROM temp.windows w
+    JOIN transactions t ON t.processed_epoch BETWEEN w.lo AND w.hi
+    """, conn)
+    conn.execute("DROP TABLE temp.windows")
+
+    nearby["processed_timestamp"] = pd.to_datetime(nearby["processed_epoch"], unit="s", utc=True)
+    duplicates = detect_near_duplicates(nearby, threshold_seconds)
+
+    # Only rows that can have their partner inside the loaded windows are decided here
+    decided = pd.Series(False, index=nearby.index)
+    for lo, hi in windows:
+        decided |= nearby["processed_timestamp"].between(lo, hi - threshold)
+
+    duplicate_bit = QUALITY_BITS["duplicate_candidate"]
+    bits = nearby["data_quality_bits"].to_numpy(dtype="int64")
+    is_duplicate = nearby.index.isin(duplicates)
+    changed = decided.to_numpy() & (is_duplicate != ((bits & duplicate_bit) != 0))
+    flagged = int(np.count_nonzero(changed & is_duplicate))
+    updates = list(zip((bits[changed] ^ duplicate_bit).tolist(), nearby["transaction_id"][changed]))
+
+    with conn:
+        conn.executemany(
+            "UPDATE transactions SET data_quality_bits = ?, updated_at = CURRENT_TIMESTAMP "
+            "WHERE transaction_id = ?",
+            updates,
+        )
+    return flagged, len(updates) - flagged